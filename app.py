@@ -3,17 +3,26 @@ Streamlit AI Assistant App
 Voice + Text Input with Long-term Memory using Gemini 2.5 Pro
 """
 
+import time
+_import_start = time.perf_counter()
+
 import streamlit as st
 import os
-import tempfile
-import whisper
 from dotenv import load_dotenv
 from assistant import AIAssistant
-import time
+from documents import DOCUMENT_EXTENSIONS
+from metrics import get_metrics
+from registry import get_registry
+
+# Heavy stacks (Whisper, embeddings, Chroma, Gemini) load on first use
+get_metrics().record_startup("import:app", time.perf_counter() - _import_start)
 
 # Load environment variables
 load_dotenv()
 
+# Messages rendered at first; "Load older messages" shows another page
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))
+
 # Page configuration
 st.set_page_config(
     page_title="AI Assistant with Memory",
@@ -191,61 +200,98 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 def initialize_assistant():
-    """Initialize the AI Assistant"""
+    """Initialize the AI Assistant (models are shared across sessions)"""
     if 'assistant' not in st.session_state:
         try:
-            st.session_state.assistant = AIAssistant()
+            # Memories are namespaced per user (?user=<id> in the URL)
+            session_id = st.query_params.get("session")
+            st.session_state.assistant = AIAssistant(
+                user_id=st.query_params.get("user", "default"), session_id=session_id
+            )
+            memory_manager = st.session_state.assistant.memory_manager
+            
+            # Keep the session in the URL so a reload or another worker resumes it
+            st.query_params["session"] = memory_manager.session_id
+            if session_id:
+                st.session_state.messages = memory_manager.get_transcript()
             st.session_state.initialized = True
         except Exception as e:
             st.error(f"Failed to initialize AI Assistant: {str(e)}")
             st.error("Please check your GOOGLE_API_KEY in the .env file")
             st.session_state.initialized = False
 
-def transcribe_audio(audio_file):
-    """Transcribe audio file to text using Whisper"""
-    try:
-        # Load Whisper model (this will download on first run)
-        model = whisper.load_model("base")
-        
-        # Transcribe the audio
-        result = model.transcribe(audio_file)
-        return result["text"]
-    except Exception as e:
-        st.error(f"Error transcribing audio: {str(e)}")
-        return None
+def start_new_chat():
+    """Start a new conversation session (stored memories are kept)"""
+    st.session_state.messages = []
+    st.session_state.visible_messages = CHAT_PAGE_SIZE
+    st.query_params["session"] = st.session_state.assistant.memory_manager.new_session()
+    invalidate_dashboard()
 
-def convert_audio_format(audio_file):
-    """Convert audio file to WAV format for Whisper"""
+def dashboard_counters():
+    """Dashboard counters, recomputed only after memory changes"""
+    if 'dashboard_counters' not in st.session_state:
+        try:
+            memory_count = len(st.session_state.assistant.get_conversation_history())
+        except Exception:
+            memory_count = None
+        st.session_state.dashboard_counters = {
+            "conversations": len(st.session_state.get('messages', [])) // 2,
+            "memories": memory_count,
+        }
+    return st.session_state.dashboard_counters
+
+def invalidate_dashboard():
+    """Drop the cached dashboard counters after a memory change"""
+    st.session_state.pop('dashboard_counters', None)
+
+def transcribe_audio(audio_file, placeholder):
+    """Transcribe an uploaded audio file, showing partial transcripts as segments finish"""
     try:
-        # For now, we'll let Whisper handle the audio conversion directly
-        # Save the uploaded file to a temporary location
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        
-        # Write the uploaded file content to temp file
-        with open(temp_file.name, "wb") as f:
-            f.write(audio_file.getvalue())
-        
-        return temp_file.name
+        # The upload is decoded in memory and cut into clips that the
+        # shared Whisper workers transcribe in parallel
+        service = get_registry().get_transcription_service("base")
+        parts = []
+        for segment in service.transcribe_stream(audio_file.getvalue()):
+            if segment["text"]:
+                parts.append(segment["text"])
+            placeholder.markdown(f"📝 {' '.join(parts)} ▌  \n*{segment['end']:.0f}s transcribed*")
+        placeholder.empty()
+        return " ".join(parts)
     except Exception as e:
-        st.error(f"Error processing audio: {str(e)}")
+        st.error(f"Error transcribing audio: {str(e)}")
         return None
 
-def display_chat_message(role, content):
-    """Display a chat message with proper styling"""
+def chat_message_html(role, content):
+    """Build the styled HTML for a chat message"""
     if role == "user":
-        st.markdown(f"""
+        return f"""
         <div class="chat-message user-message">
             <strong>You:</strong><br>
             {content}
         </div>
-        """, unsafe_allow_html=True)
-    else:
-        st.markdown(f"""
+        """
+    return f"""
         <div class="chat-message assistant-message">
             <strong>AI Assistant:</strong><br>
             {content}
         </div>
-        """, unsafe_allow_html=True)
+        """
+
+def display_chat_message(role, content):
+    """Display a chat message with proper styling"""
+    st.markdown(chat_message_html(role, content), unsafe_allow_html=True)
+
+def display_chat_history(messages, limit):
+    """Display the last `limit` messages as a single HTML block
+    
+    Each message's HTML is built once and kept on the message, so a rerun
+    only joins strings and sends one element however long the chat is.
+    """
+    visible = messages[-limit:]
+    for message in visible:
+        if "html" not in message:
+            message["html"] = chat_message_html(message["role"], message["content"])
+    st.markdown("".join(message["html"] for message in visible), unsafe_allow_html=True)
 
 def main():
     """Main Streamlit app"""
@@ -272,26 +318,43 @@ def main():
     if not st.session_state.get('initialized', False):
         return
     
+    # Optionally load models in the background before the first message
+    if os.getenv("WARM_UP", "").lower() in ("1", "true", "yes"):
+        components = os.getenv("WARM_UP_COMPONENTS", "embeddings,vectorstore,llm")
+        get_registry().warm_up([c.strip() for c in components.split(",") if c.strip()])
+    
     # Sidebar for controls
     with st.sidebar:
         st.markdown("## 🎛️ Control Panel")
         st.markdown("---")
         
         # Clear memory button
-        if st.button("🗑️ Clear Memory", help="Clear all stored conversations"):
+        if st.button("🗑️ Clear Memory", help="Clear all of your stored conversations"):
             st.session_state.assistant.clear_memory()
             st.session_state.messages = []
+            st.session_state.visible_messages = CHAT_PAGE_SIZE
+            invalidate_dashboard()
             st.success("Memory cleared!")
             st.rerun()
         
+        if st.button("🧹 Forget This Session", help="Delete only this session's stored conversations"):
+            memory_manager = st.session_state.assistant.memory_manager
+            deleted = memory_manager.delete_memories(session_id=memory_manager.session_id)
+            invalidate_dashboard()
+            st.success(f"Forgot {deleted} stored memories from this session")
+        
         st.markdown("---")
         
         # Memory search
         st.markdown("### 🔍 Search Memory")
         search_query = st.text_input("Search past conversations:", placeholder="Type your search...")
+        search_mode = st.radio(
+            "Search mode:", ["hybrid", "vector", "lexical"], horizontal=True,
+            help="Lexical matches exact names, ids and error codes without embedding the query"
+        )
         if search_query and st.button("🔎 Search"):
             with st.spinner("Searching..."):
-                results = st.session_state.assistant.search_memory(search_query)
+                results = st.session_state.assistant.search_memory(search_query, mode=search_mode)
             if results:
                 st.markdown("**Found memories:**")
                 for i, result in enumerate(results[:3]):  # Show top 3
@@ -301,6 +364,33 @@ def main():
         
         st.markdown("---")
         
+        # Long documents become searchable memory
+        st.markdown("### 📚 Add Documents")
+        documents = st.file_uploader(
+            "Manuals, notes or other text files:", type=DOCUMENT_EXTENSIONS,
+            accept_multiple_files=True, key="document_uploader"
+        )
+        if documents and st.button("📥 Add to Memory"):
+            for document in documents:
+                progress_bar = st.progress(0.0, text=f"Reading {document.name}...")
+                
+                def show_progress(stats, name=document.name):
+                    fraction = stats["bytes_read"] / stats["total_bytes"] if stats["total_bytes"] else 0.0
+                    progress_bar.progress(min(fraction, 1.0), text=f"{name}: {stats['chunks']} chunks, "
+                                          f"{stats['bytes_per_second'] / 2**20:.1f} MB/s")
+                
+                try:
+                    stats = st.session_state.assistant.ingest_document(
+                        document, name=document.name, progress=show_progress
+                    )
+                    progress_bar.progress(1.0, text=f"{document.name}: done")
+                    st.success(f"Added {document.name}: {stats['chunks']} chunks in {stats['seconds']:.1f}s")
+                except Exception as e:
+                    st.error(f"Error adding {document.name}: {str(e)}")
+            invalidate_dashboard()
+        
+        st.markdown("---")
+        
         # Quick actions
         st.markdown("### ⚡ Quick Actions")
         
@@ -308,7 +398,7 @@ def main():
             st.rerun()
         
         if st.button("📝 New Chat"):
-            st.session_state.messages = []
+            start_new_chat()
             st.rerun()
         
         st.markdown("---")
@@ -338,19 +428,33 @@ def main():
         # Initialize messages
         if 'messages' not in st.session_state:
             st.session_state.messages = []
+        if 'visible_messages' not in st.session_state:
+            st.session_state.visible_messages = CHAT_PAGE_SIZE
         
-        # Display chat history
-        if st.session_state.messages:
-            for message in st.session_state.messages:
-                display_chat_message(message["role"], message["content"])
+        # Display the most recent page of the chat history
+        messages = st.session_state.messages
+        welcome = None
+        if messages:
+            hidden = len(messages) - st.session_state.visible_messages
+            if hidden > 0:
+                st.caption(f"{hidden} older messages hidden")
+                if st.button("⬆️ Load older messages"):
+                    st.session_state.visible_messages += CHAT_PAGE_SIZE
+                    st.rerun()
+            display_chat_history(messages, st.session_state.visible_messages)
         else:
-            st.markdown("""
+            welcome = st.empty()
+            welcome.markdown("""
             <div style="text-align: center; padding: 2rem; color: #666;">
                 <h3>👋 Welcome to your AI Assistant!</h3>
                 <p>Start a conversation by typing a message below or uploading an audio file.</p>
             </div>
             """, unsafe_allow_html=True)
         
+        # New messages stream in here, at the end of the transcript and
+        # above the input widgets
+        live_messages = st.container()
+        
         st.markdown("---")
         
         # Text input
@@ -366,68 +470,99 @@ def main():
             key="audio_uploader"
         )
         
-        # Process voice input
+        # Process voice input (each upload is transcribed once, not on every rerun)
         if audio_file is not None:
-            with st.spinner("Processing audio..."):
-                # Convert audio to WAV format
-                temp_audio_path = convert_audio_format(audio_file)
-                
-                if temp_audio_path:
-                    # Transcribe audio
-                    transcribed_text = transcribe_audio(temp_audio_path)
-                    
-                    if transcribed_text:
-                        st.success(f"Transcribed: {transcribed_text}")
-                        user_input = transcribed_text
-                        
-                        # Clean up temporary file
-                        os.unlink(temp_audio_path)
+            transcripts = st.session_state.setdefault('transcripts', {})
+            if audio_file.file_id not in transcripts:
+                queue_depth = get_registry().get_transcription_service("base").stats()["queue_depth"]
+                with st.spinner(f"Processing audio... ({queue_depth} job(s) ahead in queue)"):
+                    transcribed_text = transcribe_audio(audio_file, st.empty())
+                if transcribed_text is not None:
+                    transcripts.clear()
+                    transcripts[audio_file.file_id] = transcribed_text
+            transcribed_text = transcripts.get(audio_file.file_id)
+            
+            if transcribed_text:
+                st.success(f"Transcribed: {transcribed_text}")
+                user_input = transcribed_text
         
         # Send button
         if st.button("Send Message", disabled=not user_input):
             if user_input:
                 # Add user message to chat
                 st.session_state.messages.append({"role": "user", "content": user_input})
+                if welcome is not None:
+                    welcome.empty()
                 
-                # Get AI response
-                with st.spinner("AI is thinking..."):
-                    response = st.session_state.assistant.process_message(user_input)
+                with live_messages:
+                    display_chat_message("user", user_input)
+                    
+                    # Stream the AI response into the assistant bubble as it arrives
+                    placeholder = st.empty()
+                placeholder.markdown(chat_message_html("assistant", '<span class="loading"></span>'), unsafe_allow_html=True)
+                response = ""
+                for chunk in st.session_state.assistant.process_message_stream(user_input):
+                    response += chunk
+                    placeholder.markdown(chat_message_html("assistant", response + " ▌"), unsafe_allow_html=True)
+                placeholder.markdown(chat_message_html("assistant", response), unsafe_allow_html=True)
                 
                 # Add AI response to chat
                 st.session_state.messages.append({"role": "assistant", "content": response})
+                invalidate_dashboard()
                 
-                # Rerun to update the display
-                st.rerun()
+                # Export metrics for scraping (e.g. node_exporter textfile collector)
+                if os.getenv("METRICS_FILE"):
+                    get_metrics().write_prometheus(os.getenv("METRICS_FILE"))
+                
+                # The new messages are already in place in the transcript and
+                # the dashboard below is drawn in this run, so no rerun is needed
     
     with col2:
         st.markdown("### 📊 Status Dashboard")
         
-        # Show conversation count
-        conversation_count = len(st.session_state.messages) // 2
+        # Show conversation and memory counts (cached until memory changes)
+        counters = dashboard_counters()
         st.markdown(f"""
         <div class="metric-card">
             <h3>💬 Conversations</h3>
-            <h2>{conversation_count}</h2>
+            <h2>{counters['conversations']}</h2>
         </div>
         """, unsafe_allow_html=True)
         
-        # Show memory status
-        try:
-            history = st.session_state.assistant.get_conversation_history()
-            memory_count = len(history)
-            st.markdown(f"""
-            <div class="metric-card">
-                <h3>🧠 Stored Memories</h3>
-                <h2>{memory_count}</h2>
-            </div>
-            """, unsafe_allow_html=True)
-        except:
-            st.markdown(f"""
-            <div class="metric-card">
-                <h3>🧠 Stored Memories</h3>
-                <h2>N/A</h2>
-            </div>
-            """, unsafe_allow_html=True)
+        memory_count = counters['memories'] if counters['memories'] is not None else "N/A"
+        st.markdown(f"""
+        <div class="metric-card">
+            <h3>🧠 Stored Memories</h3>
+            <h2>{memory_count}</h2>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # Latency of the last response
+        timings = st.session_state.assistant.last_timings
+        if timings:
+            st.caption(f"⏱️ Last response: first chunk {timings['first_chunk']:.2f}s, "
+                       f"total {timings['total']:.2f}s")
+        usage = st.session_state.assistant.last_context_usage
+        if usage:
+            st.caption(f"🧾 Context tokens: {usage['memories']} memories + "
+                       f"{usage['history']} history = {usage['total']}")
+        
+        # Rolling latency percentiles per stage
+        with st.expander("⏱️ Stage Latency (ms)"):
+            stage_stats = get_metrics().snapshot()
+            if stage_stats:
+                rows = ["| Stage | n | p50 | p95 | p99 |", "|---|---|---|---|---|"]
+                for stage, summary in stage_stats.items():
+                    rows.append(f"| {stage} | {summary['count']} | {summary['p50'] * 1000:.0f} | "
+                                f"{summary['p95'] * 1000:.0f} | {summary['p99'] * 1000:.0f} |")
+                st.markdown("\n".join(rows))
+            else:
+                st.markdown("No measurements yet.")
+            errors = get_metrics().counters()
+            if errors:
+                st.markdown("**Errors:** " + ", ".join(f"{stage}: {count:g}" for stage, count in errors.items()))
+            st.download_button("📥 Export (Prometheus)", get_metrics().render_prometheus(),
+                               file_name="metrics.prom", mime="text/plain")
         
         # AI Status
         st.markdown(f"""
@@ -446,11 +581,84 @@ def main():
             st.rerun()
         
         if st.button("📝 New Chat"):
-            st.session_state.messages = []
+            start_new_chat()
             st.rerun()
         
         if st.button("📱 Share Link"):
             st.info("Share this link: http://localhost:8502")
+        
+        # Transcription queue and latency (sizing the Whisper worker)
+        with st.expander("🎤 Transcription Queue"):
+            stats = get_registry().get_transcription_service("base").stats()
+            st.markdown(f"**Queue depth:** {stats['queue_depth']} (in flight: {stats['in_flight']})")
+            st.markdown(f"**Jobs:** {stats['completed']} done, {stats['failed']} failed")
+            st.markdown(f"**Latency p50/p95:** {stats['latency_p50']:.2f}s / {stats['latency_p95']:.2f}s")
+            st.markdown(f"**Queue wait p50/p95:** {stats['wait_p50']:.2f}s / {stats['wait_p95']:.2f}s")
+        
+        # Semantic answer cache effectiveness (when enabled)
+        response_cache = st.session_state.assistant.response_cache
+        if response_cache is not None:
+            with st.expander("♻️ Answer Cache"):
+                stats = response_cache.stats()
+                st.markdown(f"**Hits/misses:** {stats['hits']} / {stats['misses']} ({stats['hit_rate']:.0%})")
+                st.markdown(f"**Cached answers:** {stats['entries']} (invalidated: {stats['invalidations']})")
+                st.markdown(f"**Latency saved:** {stats['saved_seconds']:.1f}s")
+        
+        # Import and model load times of lazily loaded components
+        with st.expander("🚀 Startup Report"):
+            startup = get_metrics().startup_report()
+            for component, seconds in startup.items():
+                st.markdown(f"- `{component}`: {seconds:.2f}s")
+            if not any(name.startswith("load:") for name in startup):
+                st.markdown("Models load on the first message or audio upload.")
+        
+        # Memory usage of shared models vs. per-session state
+        with st.expander("💾 Memory Usage"):
+            report = get_registry().memory_report()
+            st.markdown(f"**Process RSS:** {report['process_rss'] / 2**20:.1f} MB")
+            st.markdown(f"**Shared resources:** {report['shared_total'] / 2**20:.1f} MB")
+            for name, size in report["shared"].items():
+                st.markdown(f"- `{name}`: {size / 2**20:.1f} MB")
+            embeddings = get_registry().get_loaded("embeddings")
+            if embeddings is not None:
+                cache = embeddings.stats()
+                st.markdown(f"**Embedding cache:** {cache['hits'] + cache['disk_hits']} hits, "
+                            f"{cache['misses']} misses ({cache['hit_rate']:.0%})")
+            persist_directory = os.path.abspath(st.session_state.assistant.memory_manager.persist_directory)
+            ingestion = get_registry().get_loaded(f"ingestion:{persist_directory}")
+            if ingestion is not None:
+                writes = ingestion.stats()
+                st.markdown(f"**Memory writes:** {writes['documents_written']} stored, "
+                            f"{writes['documents_deduplicated']} near-duplicates merged")
+            hot_tier = get_registry().get_loaded(f"hot_tier:{persist_directory}")
+            if hot_tier is not None:
+                hot = hot_tier.stats()
+                st.markdown(f"**Hot tier:** {hot['entries']}/{hot['capacity']} recent chunks "
+                            f"({hot['bytes'] / 2**20:.1f} MB {hot['dtype']}), "
+                            f"answered {hot['hit_rate']:.0%} of searches")
+            ingestor = get_registry().get_loaded(f"documents:{persist_directory}")
+            if ingestor is not None:
+                loaded = ingestor.stats()
+                st.markdown(f"**Documents:** {loaded['documents_ingested']} added as "
+                            f"{loaded['chunks_written']} chunks ({loaded['bytes_read'] / 2**20:.1f} MB)")
+            sweeper = get_registry().get_loaded(f"retention:{persist_directory}")
+            if sweeper is not None:
+                retention = sweeper.stats()
+                st.markdown(f"**Retention:** {retention['chunks_deleted']} chunks deleted "
+                            f"in {retention['sweeps']} sweeps")
+            compactor = get_registry().get_loaded(f"compaction:{persist_directory}")
+            if compactor is not None:
+                compaction = compactor.stats()
+                st.markdown(f"**Compaction:** {compaction['chunks_archived']} chunks archived into "
+                            f"{compaction['summaries_created']} summaries")
+            scheduler = get_registry().get_loaded(f"llm_scheduler:{st.session_state.assistant.model_name}")
+            if scheduler is not None:
+                llm = scheduler.stats()
+                st.markdown(f"**LLM calls:** {llm['calls']} sent, {llm['retries']} retried, "
+                            f"{llm['running']}/{llm['max_concurrency']} running, {llm['waiting']} waiting")
+            st.markdown(f"**Active sessions:** {report['sessions']}")
+            st.markdown(f"**Per-session state:** {report['per_session_total'] / 2**10:.1f} KB "
+                        f"(avg {report['per_session_avg'] / 2**10:.1f} KB)")
 
 if __name__ == "__main__":
     main()
@@ -4,80 +4,266 @@ Handles Gemini 2.5 Pro integration and conversation logic
 """
 
 import os
-import google.generativeai as genai
-from typing import List, Dict, Any
+import time
+from typing import BinaryIO, Callable, Iterator, List, Dict, Any, Optional, Union
+from context import ContextAssembler
+from llm_scheduler import INTERACTIVE
 from memory import MemoryManager
+from metrics import ERROR_METRIC, get_metrics, span
+from registry import ResourceRegistry, get_registry
+
+RESPONSE_CACHE_METRIC = "assistant_response_cache_lookups_total"
 
 class AIAssistant:
     """
     Core AI Assistant using Gemini 2.5 Pro with memory integration
     """
     
-    def __init__(self):
+    def __init__(self, registry: Optional[ResourceRegistry] = None,
+                 context_token_budget: Optional[int] = None,
+                 persist_directory: str = "./chroma_db",
+                 use_response_cache: Optional[bool] = None,
+                 user_id: str = "default", session_id: Optional[str] = None):
         """
         Initialize the AI Assistant
+        
+        Args:
+            registry: Shared resource registry (defaults to the process-wide one)
+            context_token_budget: Token budget for memories and recent history
+                (defaults to CONTEXT_TOKEN_BUDGET or 1500)
+            persist_directory: Directory to store ChromaDB data
+            use_response_cache: Answer repeated questions from the shared
+                semantic cache (defaults to RESPONSE_CACHE_ENABLED)
+            user_id: Namespace for memories and cached answers
+            session_id: Conversation session (defaults to a new random id)
         """
-        # Configure Gemini API
-        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        self.registry = registry or get_registry()
         
-        # Initialize Gemini model
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        # Shared Gemini model (configured and loaded on first use)
+        self.model_name = 'gemini-2.0-flash-exp'
+        self._model = None
         
-        # Initialize memory manager
-        self.memory_manager = MemoryManager()
+        # Initialize memory manager (per-session conversation window)
+        self.memory_manager = MemoryManager(
+            persist_directory, registry=self.registry, user_id=user_id, session_id=session_id
+        )
+        self.registry.register_session(self)
         
         # System prompt for the assistant
         self.system_prompt = """You are a helpful AI assistant with long-term memory. 
         You can remember previous conversations and provide contextually relevant responses.
         Be friendly, helpful, and informative in your responses."""
+        
+        # Assembles memory context within a token budget
+        if context_token_budget is None:
+            context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+        self.context_assembler = ContextAssembler(token_budget=context_token_budget)
+        
+        # Opt-in semantic answer cache shared by every session on this store
+        if use_response_cache is None:
+            use_response_cache = os.getenv("RESPONSE_CACHE_ENABLED", "").lower() in ("1", "true", "yes")
+        self.response_cache = (
+            self.registry.get_response_cache(persist_directory) if use_response_cache else None
+        )
+        
+        # Latency of the last response: time to first chunk and total (seconds)
+        self.last_timings: Dict[str, float] = {}
+        
+        # Context tokens used by the last prompt, per section
+        self.last_context_usage: Dict[str, int] = {}
     
-    def process_message(self, user_input: str) -> str:
+    @property
+    def model(self):
         """
-        Process user message and generate response
+        Shared Gemini model, scheduled ahead of background work
+        """
+        if self._model is None:
+            self._model = self.registry.get_llm_scheduler(self.model_name).client(INTERACTIVE)
+        return self._model
+    
+    def build_prompt(self, user_input: str) -> str:
+        """
+        Build the full Gemini prompt with memory context
         
         Args:
             user_input: User's message
             
         Returns:
-            Assistant's response
+            Prompt text
         """
-        try:
-            # Search for relevant past conversations
-            relevant_memories = self.memory_manager.search_memory(user_input, k=3)
-            
-            # Get recent conversation history
+        # Search for relevant past conversations (over-fetch: duplicates of
+        # recent turns are dropped by the assembler)
+        with span("search_memory"):
+            relevant_memories = self.memory_manager.search_memory(
+                user_input, k=self.context_assembler.max_memories * 2
+            )
+        
+        # Get recent conversation history
+        with span("get_conversation_history"):
             recent_history = self.memory_manager.get_conversation_history()
+        
+        # Fit memories and recent history into the context token budget
+        with span("build_prompt"):
+            context = self.context_assembler.assemble(relevant_memories, recent_history)
+        self.last_context_usage = context["tokens"]
+        
+        # Create the full prompt
+        return f"{self.system_prompt}\n\n{context['text']}\n\nCurrent user message: {user_input}"
+    
+    def _lookup_cached_answer(self, user_input: str):
+        """
+        Look for a cached answer to a similar question
+        
+        Args:
+            user_input: User's message
             
-            # Build context from memories
-            context = ""
-            if relevant_memories:
-                context += "\n\nRelevant past conversations:\n"
-                for memory in relevant_memories:
-                    context += f"- {memory['content']}\n"
+        Returns:
+            Tuple of (cached answer or None, query embedding or None)
+        """
+        if self.response_cache is None:
+            return None, None
+        with span("response_cache.lookup"):
+            query_vector = self.memory_manager.embeddings.embed_query(user_input)
+            answer = self.response_cache.lookup(query_vector, namespace=self.memory_manager.user_id)
+        get_metrics().increment(RESPONSE_CACHE_METRIC, "miss" if answer is None else "hit")
+        return answer, query_vector
+    
+    def _answer_from_cache(self, user_input: str, answer: str, start_time: float) -> None:
+        """
+        Record a cached answer in the conversation window and timings
+        
+        The exchange is not stored in long-term memory again.
+        
+        Args:
+            user_input: User's message
+            answer: Cached answer
+            start_time: perf_counter() value when the turn started
+        """
+        self.memory_manager.add_conversation(user_input, answer, long_term=False)
+        total_time = time.perf_counter() - start_time
+        self.last_timings = {"first_chunk": total_time, "total": total_time}
+    
+    def generate_response(self, user_input: str) -> str:
+        """
+        Generate a response and store the exchange, raising on failure
+        
+        For callers that must tell failures from answers (e.g. the HTTP
+        server); errors are counted by the "process_message" span.
+        
+        Args:
+            user_input: User's message
             
-            # Build recent conversation context
-            if recent_history:
-                context += "\n\nRecent conversation:\n"
-                for exchange in recent_history[-3:]:  # Last 3 exchanges
-                    context += f"User: {exchange['user']}\nAssistant: {exchange['assistant']}\n"
+        Returns:
+            Assistant's response
+        """
+        start_time = time.perf_counter()
+        with span("process_message"):
+            # Repeated question: answer from the semantic cache
+            cached_answer, query_vector = self._lookup_cached_answer(user_input)
+            if cached_answer is not None:
+                self._answer_from_cache(user_input, cached_answer, start_time)
+                return cached_answer
             
-            # Create the full prompt
-            full_prompt = f"{self.system_prompt}\n\n{context}\n\nCurrent user message: {user_input}"
+            full_prompt = self.build_prompt(user_input)
             
             # Generate response using Gemini
-            response = self.model.generate_content(full_prompt)
-            assistant_response = response.text
+            with span("generate_content"):
+                response = self.model.generate_content(full_prompt)
+                assistant_response = response.text
+            total_time = time.perf_counter() - start_time
+            self.last_timings = {"first_chunk": total_time, "total": total_time}
             
             # Store the conversation in memory
-            self.memory_manager.add_conversation(user_input, assistant_response)
+            with span("add_conversation"):
+                self.memory_manager.add_conversation(user_input, assistant_response)
             
-            return assistant_response
+            if query_vector is not None:
+                self.response_cache.store(query_vector, assistant_response, total_time,
+                                          namespace=self.memory_manager.user_id)
+        
+        return assistant_response
+    
+    def process_message(self, user_input: str) -> str:
+        """
+        Process user message and generate response
+        
+        Args:
+            user_input: User's message
             
+        Returns:
+            Assistant's response, or an apology if it could not be generated
+        """
+        try:
+            return self.generate_response(user_input)
         except Exception as e:
             error_message = f"Sorry, I encountered an error: {str(e)}"
             print(f"Error in process_message: {e}")
             return error_message
     
+    def process_message_stream(self, user_input: str) -> Iterator[str]:
+        """
+        Process user message and yield the response as it is generated
+        
+        The exchange is saved to memory once the stream has finished.
+        Time to first chunk and total time are stored in last_timings.
+        
+        Args:
+            user_input: User's message
+            
+        Yields:
+            Response text chunks
+        """
+        metrics = get_metrics()
+        start_time = time.perf_counter()
+        first_chunk_time = None
+        chunks = []
+        try:
+            # Repeated question: answer from the semantic cache
+            cached_answer, query_vector = self._lookup_cached_answer(user_input)
+            if cached_answer is not None:
+                self._answer_from_cache(user_input, cached_answer, start_time)
+                metrics.observe("process_message", time.perf_counter() - start_time)
+                yield cached_answer
+                return
+            
+            full_prompt = self.build_prompt(user_input)
+            
+            # Stream the response from Gemini
+            generate_start = time.perf_counter()
+            for chunk in self.model.generate_content(full_prompt, stream=True):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. finish metadata)
+                    continue
+                if not text:
+                    continue
+                if first_chunk_time is None:
+                    first_chunk_time = time.perf_counter() - start_time
+                    metrics.observe("first_chunk", first_chunk_time)
+                chunks.append(text)
+                yield text
+            
+            metrics.observe("generate_content", time.perf_counter() - generate_start)
+            total_time = time.perf_counter() - start_time
+            self.last_timings = {
+                "first_chunk": total_time if first_chunk_time is None else first_chunk_time,
+                "total": total_time,
+            }
+            
+            # Store the finished conversation in memory
+            with span("add_conversation"):
+                self.memory_manager.add_conversation(user_input, "".join(chunks))
+            if query_vector is not None:
+                self.response_cache.store(query_vector, "".join(chunks), total_time,
+                                          namespace=self.memory_manager.user_id)
+            metrics.observe("process_message", time.perf_counter() - start_time)
+            
+        except Exception as e:
+            metrics.increment(ERROR_METRIC, "process_message")
+            print(f"Error in process_message_stream: {e}")
+            yield f"Sorry, I encountered an error: {str(e)}"
+    
     def get_conversation_history(self) -> List[Dict[str, str]]:
         """
         Get conversation history
@@ -93,14 +279,39 @@ class AIAssistant:
         """
         self.memory_manager.clear_memory()
     
-    def search_memory(self, query: str) -> List[Dict[str, Any]]:
+    def search_memory(self, query: str, mode: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Search stored memories
         
         Args:
             query: Search query
+            mode: "hybrid", "vector" or "lexical" (defaults to SEARCH_MODE)
             
         Returns:
             List of relevant memories
         """
-        return self.memory_manager.search_memory(query)
+        return self.memory_manager.search_memory(query, mode=mode)
+    
+    def ingest_document(self, source: Union[str, BinaryIO], name: Optional[str] = None,
+                        progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Store a text document as long-term memory
+        
+        Args:
+            source: File path or binary file object
+            name: Source name recorded on each chunk
+            progress: Called after each written batch with the running stats
+            
+        Returns:
+            Ingestion stats
+        """
+        return self.memory_manager.ingest_document(source, name=name, progress=progress)
+    
+    def session_footprint(self) -> int:
+        """
+        Estimate memory held by this session (excluding shared resources)
+        
+        Returns:
+            Approximate size in bytes
+        """
+        return self.memory_manager.session_footprint()
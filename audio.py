@@ -0,0 +1,223 @@
+"""
+Audio Decoding for AI Assistant
+Decodes uploads in memory and splits long recordings at quiet points
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import wave
+from typing import IO, Iterator, Optional, Tuple
+
+import numpy as np
+
+# Whisper expects 16 kHz mono float32
+SAMPLE_RATE = 16000
+
+
+class AudioDecodeError(RuntimeError):
+    """
+    The upload could not be decoded as audio
+    """
+
+
+def decode_audio(data: bytes, sample_rate: int = SAMPLE_RATE,
+                 block_seconds: float = 10.0) -> Iterator[np.ndarray]:
+    """
+    Decode an encoded audio file held in memory, block by block
+
+    ffmpeg reads the bytes from a pipe and writes PCM to a pipe, so nothing
+    touches the disk and only one block of samples is produced at a time.
+    MP4/M4A files whose index sits at the end cannot be decoded from a pipe;
+    those are retried through a temporary file. Without ffmpeg, PCM WAV
+    files are still decoded with the standard library.
+
+    Args:
+        data: File contents (any format ffmpeg understands)
+        sample_rate: Output sample rate
+        block_seconds: Audio per yielded block
+
+    Yields:
+        Mono float32 samples in [-1, 1]
+    """
+    block_samples = int(sample_rate * block_seconds)
+    if shutil.which("ffmpeg") is None:
+        yield from _decode_wav(data, sample_rate, block_samples)
+        return
+
+    decoded = False
+    try:
+        for block in _ffmpeg_blocks(["pipe:0"], data, sample_rate, block_samples):
+            decoded = True
+            yield block
+        return
+    except RuntimeError:
+        if decoded:
+            raise
+
+    with tempfile.NamedTemporaryFile(delete=False) as f:
+        f.write(data)
+    try:
+        yield from _ffmpeg_blocks([f.name], None, sample_rate, block_samples)
+    finally:
+        os.unlink(f.name)
+
+
+def _ffmpeg_blocks(inputs: list, data: Optional[bytes], sample_rate: int,
+                   block_samples: int) -> Iterator[np.ndarray]:
+    """
+    Run ffmpeg and read its PCM output in blocks
+
+    Args:
+        inputs: ffmpeg input argument ("pipe:0" or a path)
+        data: Bytes to feed on stdin, if reading from the pipe
+        sample_rate: Output sample rate
+        block_samples: Samples per yielded block
+
+    Yields:
+        Mono float32 samples
+    """
+    command = ["ffmpeg", "-nostdin", "-threads", "0", "-i", *inputs,
+               "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "pipe:1"]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE if data is not None else subprocess.DEVNULL,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    feeder = None
+    if data is not None:
+        # Feed stdin from another thread so a full stdout pipe cannot deadlock us
+        feeder = threading.Thread(target=_feed, args=(process.stdin, data), daemon=True)
+        feeder.start()
+    try:
+        while True:
+            raw = process.stdout.read(block_samples * 2)
+            if not raw:
+                break
+            yield np.frombuffer(raw[:len(raw) // 2 * 2], dtype=np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+        if feeder is not None:
+            feeder.join()
+    if returncode != 0:
+        raise AudioDecodeError(f"ffmpeg could not decode the audio (exit code {returncode})")
+
+
+def _feed(stdin: IO[bytes], data: bytes) -> None:
+    """
+    Write bytes to a process's stdin and close it
+
+    Args:
+        stdin: Process input pipe
+        data: Bytes to write
+    """
+    try:
+        stdin.write(data)
+    except (BrokenPipeError, OSError):
+        pass
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+
+def _decode_wav(data: bytes, sample_rate: int, block_samples: int) -> Iterator[np.ndarray]:
+    """
+    Decode a PCM WAV file with the standard library
+
+    Args:
+        data: WAV file contents
+        sample_rate: Output sample rate (resampled linearly if different)
+        block_samples: Output samples per yielded block (approximately)
+
+    Yields:
+        Mono float32 samples
+    """
+    try:
+        reader = wave.open(io.BytesIO(data))
+    except (wave.Error, EOFError) as e:
+        raise AudioDecodeError(f"ffmpeg is not installed and the audio is not a PCM WAV file: {e}")
+    with reader:
+        width, channels, rate = reader.getsampwidth(), reader.getnchannels(), reader.getframerate()
+        if width not in (1, 2, 4):
+            raise AudioDecodeError(f"Unsupported WAV sample width: {width} bytes")
+        frames_per_block = max(1, int(block_samples * rate / sample_rate))
+        position = 0.0
+        while True:
+            raw = reader.readframes(frames_per_block)
+            if not raw:
+                return
+            if width == 1:
+                samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128.0
+            else:
+                dtype = np.int16 if width == 2 else np.int32
+                samples = np.frombuffer(raw, dtype=dtype).astype(np.float32) / float(2 ** (8 * width - 1))
+            samples = samples.reshape(-1, channels).mean(axis=1)
+            if rate != sample_rate:
+                # Sample the block at output times, carrying the phase across blocks
+                times = np.arange(position, len(samples), rate / sample_rate)
+                position = times[-1] + rate / sample_rate - len(samples) if len(times) else position - len(samples)
+                samples = np.interp(times, np.arange(len(samples)), samples).astype(np.float32)
+            yield samples
+
+
+def split_on_silence(blocks: Iterator[np.ndarray], sample_rate: int = SAMPLE_RATE,
+                     max_seconds: float = 30.0, min_seconds: float = 10.0,
+                     frame_seconds: float = 0.05,
+                     silence_threshold: float = 0.005) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Cut a stream of samples into segments at low-energy points
+
+    Once max_seconds of audio are buffered, the segment ends at the quietest
+    frame between min_seconds and max_seconds, so words are rarely cut in
+    half and every segment fits one Whisper window. Segments whose overall
+    level is below silence_threshold are dropped.
+
+    Args:
+        blocks: Mono float32 sample blocks
+        sample_rate: Sample rate of the blocks
+        max_seconds: Longest segment
+        min_seconds: Shortest segment before the quietest point is looked for
+        frame_seconds: Length of the frames whose energy is compared
+        silence_threshold: RMS level below which a segment counts as silence
+
+    Yields:
+        (first sample index, samples) per segment
+    """
+    max_samples = int(max_seconds * sample_rate)
+    min_samples = min(int(min_seconds * sample_rate), max_samples - 1)
+    frame = max(1, int(frame_seconds * sample_rate))
+    buffer = np.zeros(0, dtype=np.float32)
+    start = 0
+
+    for block in blocks:
+        buffer = np.concatenate([buffer, block])
+        while len(buffer) >= max_samples:
+            region = buffer[min_samples:max_samples]
+            frames = len(region) // frame
+            energies = np.sqrt(np.mean(region[:frames * frame].reshape(frames, frame) ** 2, axis=1))
+            # The latest of equally quiet frames keeps segments long
+            quietest = frames - 1 - int(np.argmin(energies[::-1]))
+            cut = min_samples + quietest * frame + frame // 2
+            segment, buffer = buffer[:cut], buffer[cut:]
+            if _rms(segment) >= silence_threshold:
+                yield start, segment
+            start += cut
+
+    if len(buffer) and _rms(buffer) >= silence_threshold:
+        yield start, buffer
+
+
+def _rms(samples: np.ndarray) -> float:
+    """
+    Root mean square level of samples
+
+    Args:
+        samples: float32 samples
+
+    Returns:
+        RMS level
+    """
+    return float(np.sqrt(np.mean(samples ** 2))) if len(samples) else 0.0
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Performance Benchmark Suite for AI Assistant
+Reproducible offline measurements of chat latency, ingestion and retrieval
+
+Usage:
+    python benchmark.py                          # quick run, writes benchmark_results.json
+    python benchmark.py --sizes 1000,10000,100000,1000000
+    python benchmark.py --only quantization      # float32 vs float16 vs int8 vectors
+    python benchmark.py --compare baseline.json  # exit 1 on regressions
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import numpy as np
+
+from assistant import AIAssistant
+from hot_tier import HotTier
+from memory import MemoryManager
+from registry import ResourceRegistry
+from stubs import HashEmbeddings, StubLLM
+
+SEED = 1234
+SEED_BATCH_SIZE = 5000
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """
+    Summarize latency samples in milliseconds
+
+    Args:
+        latencies: Samples in seconds
+
+    Returns:
+        Count, mean and percentiles in milliseconds
+    """
+    samples = np.array(latencies) * 1000
+    return {
+        "count": len(latencies),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "max_ms": float(samples.max()),
+    }
+
+
+def make_vocabulary(rng: random.Random, size: int = 5000) -> List[str]:
+    """
+    Build a deterministic synthetic vocabulary
+
+    Args:
+        rng: Seeded random generator
+        size: Number of words
+
+    Returns:
+        List of distinct pseudo-words
+    """
+    syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "qua", "bri", "den", "fol", "gar"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_exchange(rng: random.Random, vocabulary: List[str], words: int = 40) -> str:
+    """
+    Build one synthetic conversation exchange
+
+    Args:
+        rng: Seeded random generator
+        vocabulary: Word list
+        words: Approximate number of words
+
+    Returns:
+        Exchange text in the format stored by MemoryManager
+    """
+    # Each exchange draws mostly from one topic so neighbours are meaningful
+    topic = rng.randrange(0, len(vocabulary) - 200)
+    pick = lambda n: " ".join(vocabulary[topic + rng.randrange(200)] for _ in range(n))
+    return f"User: {pick(words // 4)}\nAssistant: {pick(words - words // 4)}"
+
+
+def make_registry(args: argparse.Namespace) -> ResourceRegistry:
+    """
+    Build an isolated registry with offline stand-ins
+
+    Args:
+        args: Parsed command line arguments
+
+    Returns:
+        ResourceRegistry using the stub LLM and the selected embeddings
+    """
+    embedding_factory = None
+    if args.embeddings == "hash":
+        embedding_factory = lambda: HashEmbeddings(latency=args.embedding_latency)
+    return ResourceRegistry(
+        embedding_factory=embedding_factory,
+        llm_factory=lambda name: StubLLM(
+            first_chunk_latency=args.llm_latency, chunk_latency=args.llm_chunk_latency
+        )
+    )
+
+
+def bench_process_message(args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    """
+    Measure end-to-end process_message latency against the stub LLM
+
+    Args:
+        args: Parsed command line arguments
+        workdir: Scratch directory
+
+    Returns:
+        Latency summary
+    """
+    rng = random.Random(SEED)
+    vocabulary = make_vocabulary(rng)
+    registry = make_registry(args)
+    assistant = AIAssistant(registry=registry, persist_directory=os.path.join(workdir, "chat_db"))
+
+    latencies = []
+    for _ in range(args.turns):
+        message = make_exchange(rng, vocabulary, 12).split("\n")[0][len("User: "):]
+        start_time = time.perf_counter()
+        assistant.process_message(message)
+        latencies.append(time.perf_counter() - start_time)
+
+    registry.shutdown()
+    return summarize(latencies)
+
+
+def bench_ingestion(args: argparse.Namespace, workdir: str) -> Dict[str, Any]:
+    """
+    Measure add_conversation throughput including the final flush
+
+    Args:
+        args: Parsed command line arguments
+        workdir: Scratch directory
+
+    Returns:
+        Throughput and per-call latency
+    """
+    rng = random.Random(SEED + 1)
+    vocabulary = make_vocabulary(rng)
+    registry = make_registry(args)
+    memory_manager = MemoryManager(os.path.join(workdir, "ingest_db"), registry=registry)
+    exchanges = [make_exchange(rng, vocabulary, 300).split("\nAssistant: ") for _ in range(args.exchanges)]
+
+    latencies = []
+    start_time = time.perf_counter()
+    for user_input, assistant_response in exchanges:
+        call_start = time.perf_counter()
+        memory_manager.add_conversation(user_input, assistant_response)
+        latencies.append(time.perf_counter() - call_start)
+    memory_manager.ingestion.flush()
+    elapsed = time.perf_counter() - start_time
+
+    chunks = memory_manager.vectorstore._collection.count()
+    registry.shutdown()
+    return {
+        "exchanges": len(exchanges),
+        "chunks": chunks,
+        "seconds": elapsed,
+        "exchanges_per_s": len(exchanges) / elapsed,
+        "chunks_per_s": chunks / elapsed,
+        "add_conversation": summarize(latencies),
+    }
+
+
+def exact_top_k(matrix: np.ndarray, queries: np.ndarray, k: int, block: int = 100000) -> np.ndarray:
+    """
+    Brute-force top-k by cosine similarity, streamed over the corpus
+
+    Args:
+        matrix: Normalized corpus vectors (may be a memmap)
+        queries: Normalized query vectors
+        k: Results per query
+
+    Returns:
+        Indices of the top-k corpus rows for every query
+    """
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), k), dtype=np.int64)
+    for start in range(0, len(matrix), block):
+        scores = queries @ np.asarray(matrix[start:start + block]).T
+        ids = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        all_scores = np.concatenate([best_scores, scores], axis=1)
+        all_ids = np.concatenate([best_ids, ids], axis=1)
+        order = np.argsort(-all_scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(all_scores, order, axis=1)
+        best_ids = np.take_along_axis(all_ids, order, axis=1)
+    return best_ids
+
+
+def bench_search(args: argparse.Namespace, workdir: str) -> List[Dict[str, Any]]:
+    """
+    Measure search_memory latency and recall@k as the corpus grows
+
+    The corpus is seeded straight into the Chroma collection with
+    precomputed vectors, which are also kept in a memory-mapped file for
+    brute-force ground truth.
+
+    Each query runs once ranked by relevance only and once re-ranked by
+    maximal marginal relevance (--mmr-lambda). MMR trades some recall
+    against the exact top-k for diversity, so its recall is reported
+    separately; its pass reuses the cached query embeddings.
+
+    Args:
+        args: Parsed command line arguments
+        workdir: Scratch directory
+
+    Returns:
+        One result per corpus size
+    """
+    rng = random.Random(SEED + 2)
+    vocabulary = make_vocabulary(rng)
+    registry = make_registry(args)
+    memory_manager = MemoryManager(os.path.join(workdir, "search_db"), registry=registry)
+    collection = memory_manager.vectorstore._collection
+    embed_texts = lambda texts: np.asarray(registry.get_embeddings().embed_documents(texts), dtype=np.float32)
+
+    sizes = sorted(args.sizes)
+    dimensions = embed_texts(["probe"]).shape[1]
+    vectors = np.lib.format.open_memmap(
+        os.path.join(workdir, "corpus_vectors.npy"), mode="w+", dtype=np.float32,
+        shape=(sizes[-1], dimensions)
+    )
+    texts: List[str] = []
+
+    results = []
+    seeded = 0
+    for size in sizes:
+        seed_start = time.perf_counter()
+        while seeded < size:
+            batch = [make_exchange(rng, vocabulary) for _ in range(min(SEED_BATCH_SIZE, size - seeded))]
+            embeddings = embed_texts(batch)
+            vectors[seeded:seeded + len(batch)] = embeddings
+            collection.add(
+                ids=[f"bench-{seeded + i}" for i in range(len(batch))],
+                embeddings=embeddings,
+                documents=batch,
+                metadatas=[{"corpus_index": seeded + i, "user_id": memory_manager.user_id}
+                           for i in range(len(batch))]
+            )
+            # Keep only what the query generator needs
+            texts.extend(text.split("\n")[0] for text in batch)
+            seeded += len(batch)
+        seed_seconds = time.perf_counter() - seed_start
+
+        # Queries are fragments of stored exchanges
+        query_rng = random.Random(SEED + size)
+        query_ids = [query_rng.randrange(size) for _ in range(args.queries)]
+        queries = [" ".join(texts[i].split()[1:7]) for i in query_ids]
+        truth = exact_top_k(vectors[:size], embed_texts(queries), args.k)
+
+        result = {"corpus_size": size, "seed_seconds": seed_seconds, "k": args.k,
+                  "mmr_lambda": args.mmr_lambda}
+        for prefix, mmr_lambda in [("", 1.0), ("mmr_", args.mmr_lambda)]:
+            memory_manager.mmr_lambda = mmr_lambda
+            latencies, recalls = [], []
+            for query, expected in zip(queries, truth):
+                start_time = time.perf_counter()
+                hits = memory_manager.search_memory(query, k=args.k)
+                latencies.append(time.perf_counter() - start_time)
+                found = {hit["metadata"].get("corpus_index") for hit in hits}
+                recalls.append(len(found & set(expected.tolist())) / args.k)
+            result[f"{prefix}recall_at_k"] = float(np.mean(recalls))
+            result.update({f"{prefix}{key}": value for key, value in summarize(latencies).items()})
+        results.append(result)
+        print(f"  {size:>9} chunks: p50 {result['p50_ms']:.1f} ms, "
+              f"p95 {result['p95_ms']:.1f} ms, recall@{args.k} {result['recall_at_k']:.3f} | "
+              f"MMR {args.mmr_lambda}: p50 {result['mmr_p50_ms']:.1f} ms, "
+              f"recall@{args.k} {result['mmr_recall_at_k']:.3f}")
+
+    del vectors
+    registry.shutdown()
+    return results
+
+
+def bench_quantization(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    Compare vector storage types: matrix size, search latency and recall@k
+
+    Each configuration holds the same corpus in a HotTier, which ranks by
+    the quantized scores directly.
+
+    Args:
+        args: Parsed command line arguments
+
+    Returns:
+        One result per storage configuration
+    """
+    rng = random.Random(SEED + 3)
+    vocabulary = make_vocabulary(rng)
+    registry = make_registry(args)
+    embed_texts = lambda texts: np.asarray(registry.get_embeddings().embed_documents(texts), dtype=np.float32)
+
+    texts = [make_exchange(rng, vocabulary) for _ in range(args.quant_size)]
+    vectors = np.concatenate([embed_texts(texts[start:start + SEED_BATCH_SIZE])
+                              for start in range(0, len(texts), SEED_BATCH_SIZE)])
+    ids = [f"quant-{i}" for i in range(len(texts))]
+    metadatas = [{"corpus_index": i} for i in range(len(texts))]
+
+    queries = [" ".join(texts[rng.randrange(len(texts))].split()[1:7]) for _ in range(args.queries)]
+    query_vectors = embed_texts(queries)
+    truth = exact_top_k(vectors, query_vectors, args.k)
+
+    results = []
+    baseline_bytes = None
+    for dtype in ["float32", "float16", "int8"]:
+        tier = HotTier(max_entries=len(texts), dtype=dtype)
+        tier.add(ids, vectors, texts, metadatas)
+        matrix_bytes = tier.stats()["bytes"]
+        baseline_bytes = baseline_bytes or matrix_bytes
+
+        latencies, recalls = [], []
+        for query_vector, expected in zip(query_vectors, truth):
+            start_time = time.perf_counter()
+            hits = tier.search(query_vector, k=args.k)
+            latencies.append(time.perf_counter() - start_time)
+            found = {hit["metadata"]["corpus_index"] for hit in hits}
+            recalls.append(len(found & set(expected.tolist())) / args.k)
+
+        result = {"dtype": dtype, "corpus_size": len(texts),
+                  "matrix_bytes": matrix_bytes, "compression": baseline_bytes / matrix_bytes,
+                  "recall_at_k": float(np.mean(recalls)), "k": args.k}
+        result.update(summarize(latencies))
+        results.append(result)
+        print(f"  {dtype:>7}: "
+              f"{matrix_bytes / 2**20:6.1f} MB ({result['compression']:.1f}x), "
+              f"p50 {result['p50_ms']:.2f} ms, recall@{args.k} {result['recall_at_k']:.3f}")
+
+    registry.shutdown()
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Find metrics that regressed beyond a tolerance
+
+    Args:
+        results: Current results
+        baseline: Previous results file contents
+        tolerance: Allowed relative slowdown (0.2 = 20%)
+
+    Returns:
+        Human readable regression descriptions
+    """
+    regressions = []
+
+    def check(name, current, previous, higher_is_better=False):
+        if current is None or previous is None or previous == 0:
+            return
+        change = (previous - current) / previous if higher_is_better else (current - previous) / previous
+        if change > tolerance:
+            regressions.append(f"{name}: {previous:.4g} -> {current:.4g} ({change:+.0%})")
+
+    current, previous = results["results"], baseline.get("results", {})
+    if "process_message" in current and "process_message" in previous:
+        check("process_message p95_ms", current["process_message"]["p95_ms"],
+              previous["process_message"]["p95_ms"])
+    if "ingestion" in current and "ingestion" in previous:
+        check("ingestion exchanges_per_s", current["ingestion"]["exchanges_per_s"],
+              previous["ingestion"]["exchanges_per_s"], higher_is_better=True)
+    previous_search = {row["corpus_size"]: row for row in previous.get("search", [])}
+    for row in current.get("search", []):
+        old = previous_search.get(row["corpus_size"])
+        if old:
+            check(f"search[{row['corpus_size']}] p95_ms", row["p95_ms"], old["p95_ms"])
+            check(f"search[{row['corpus_size']}] recall_at_k", row["recall_at_k"],
+                  old["recall_at_k"], higher_is_better=True)
+    # Older baselines also have rows re-ranked at full precision; compare like with like
+    previous_quantization = {row["dtype"]: row for row in previous.get("quantization", [])
+                             if not row.get("rescore")}
+    for row in current.get("quantization", []):
+        old = previous_quantization.get(row["dtype"])
+        if old:
+            check(f"quantization[{row['dtype']}] recall_at_k", row["recall_at_k"], old["recall_at_k"],
+                  higher_is_better=True)
+    return regressions
+
+
+def git_commit() -> str:
+    """
+    Current git commit of the checkout, if available
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    """Run the selected benchmarks and write machine-readable results"""
+    parser = argparse.ArgumentParser(description="Offline performance benchmarks for the AI Assistant")
+    parser.add_argument("--output", default="benchmark_results.json", help="Results JSON file")
+    parser.add_argument("--only", choices=["chat", "ingest", "search", "quantization"], action="append",
+                        help="Run only these benchmarks (repeatable)")
+    parser.add_argument("--turns", type=int, default=50, help="process_message calls")
+    parser.add_argument("--exchanges", type=int, default=500, help="add_conversation calls")
+    parser.add_argument("--sizes", type=lambda v: [int(x) for x in v.split(",")],
+                        default=[1000, 10000], help="Corpus sizes in chunks, e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=100, help="Queries per corpus size")
+    parser.add_argument("--k", type=int, default=5, help="Results per search")
+    parser.add_argument("--mmr-lambda", type=float, default=0.5,
+                        help="Diversity setting for the re-ranked search pass (1 is relevance only)")
+    parser.add_argument("--quant-size", type=int, default=20000,
+                        help="Corpus size for the quantization comparison")
+    parser.add_argument("--embeddings", choices=["hash", "minilm"], default="hash",
+                        help="Deterministic hash stub or the real all-MiniLM-L6-v2 model")
+    parser.add_argument("--embedding-latency", type=float, default=0.0,
+                        help="Simulated seconds per embedded text (hash stub only)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Stub LLM time to first chunk")
+    parser.add_argument("--llm-chunk-latency", type=float, default=0.0, help="Stub LLM delay per chunk")
+    parser.add_argument("--compare", help="Baseline results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory")
+    args = parser.parse_args()
+    selected = set(args.only or ["chat", "ingest", "search", "quantization"])
+
+    workdir = tempfile.mkdtemp(prefix="assistant_bench_")
+    results: Dict[str, Any] = {
+        "schema": 1,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("compare", "keep")},
+        "results": {},
+    }
+
+    try:
+        if "chat" in selected:
+            print("🔄 Benchmarking process_message...")
+            results["results"]["process_message"] = bench_process_message(args, workdir)
+        if "ingest" in selected:
+            print("🔄 Benchmarking add_conversation ingestion...")
+            results["results"]["ingestion"] = bench_ingestion(args, workdir)
+        if "search" in selected:
+            print("🔄 Benchmarking search_memory...")
+            results["results"]["search"] = bench_search(args, workdir)
+        if "quantization" in selected:
+            print("🔄 Benchmarking quantized vector storage...")
+            results["results"]["quantization"] = bench_quantization(args)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ Regressions found:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print("✅ No regressions beyond tolerance")
+
+
+if __name__ == "__main__":
+    main()
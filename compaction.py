@@ -0,0 +1,311 @@
+"""
+Memory Compaction for AI Assistant
+Rolls old conversation chunks up into summaries and archives the originals
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import get_metrics, span
+
+SUMMARY_TIER = "summary"
+CHUNK_TIER = "chunk"
+ARCHIVE_TIER = "archive"
+COMPACTED_METRIC = "assistant_memory_chunks_compacted_total"
+
+SUMMARY_PROMPT = """Summarize the following excerpts from earlier conversations with the user.
+Keep every fact, preference and decision the user shared; drop small talk.
+Write at most {max_words} words as plain sentences.
+
+{excerpts}"""
+
+
+def extractive_summary(texts: List[str], max_chars: int = 1200) -> str:
+    """
+    Summarize chunks locally by keeping the user's side of each exchange
+
+    Args:
+        texts: Chunk texts in chronological order
+        max_chars: Maximum summary length
+
+    Returns:
+        Summary text
+    """
+    lines = []
+    for text in texts:
+        first_line = text.strip().splitlines()[0] if text.strip() else ""
+        if first_line and first_line not in lines:
+            lines.append(first_line[:200])
+    summary = f"Summary of {len(texts)} earlier exchanges:\n" + "\n".join(lines)
+    return summary[:max_chars]
+
+
+class LLMSummarizer:
+    """
+    Summarizes chunks with the configured LLM, falling back to extraction
+    """
+
+    def __init__(self, model_getter: Callable[[], Any], max_words: int = 150):
+        """
+        Args:
+            model_getter: Callable returning a model with generate_content()
+            max_words: Target summary length
+        """
+        self.model_getter = model_getter
+        self.max_words = max_words
+
+    def __call__(self, texts: List[str]) -> str:
+        """
+        Summarize chunks
+
+        Args:
+            texts: Chunk texts in chronological order
+
+        Returns:
+            Summary text
+        """
+        prompt = SUMMARY_PROMPT.format(max_words=self.max_words, excerpts="\n\n".join(texts))
+        try:
+            summary = self.model_getter().generate_content(prompt).text.strip()
+            if summary:
+                return summary
+        except Exception as e:
+            print(f"Error summarizing memories, using extractive summary: {e}")
+        return extractive_summary(texts)
+
+
+class MemoryCompactor:
+    """
+    Background job that replaces old chunks with summary documents
+
+    Chunks older than min_age are grouped in time order, group_size at a
+    time and per user. Each group becomes one summary in the hot collection (tier
+    "summary", with the original ids in source_ids) and the originals move to
+    the archive collection, tagged with their summary_id so searches can
+    drill down to them. Only full groups are compacted, so recent leftovers
+    wait for the next run. Candidates are paged through by their metadata
+    alone, so users with few old chunks cannot hide later ones from a run.
+    """
+
+    def __init__(self, vectorstore_getter: Callable[[], Any], archive_getter: Callable[[], Any],
+                 summarizer: Callable[[List[str]], str], min_age: float = 86400.0,
+                 group_size: int = 8, interval: float = 3600.0, max_chunks_per_run: int = 512,
+                 hot_tier: Optional[Any] = None, lexical_index: Optional[Any] = None,
+                 on_change: Optional[Callable[[Optional[str]], None]] = None):
+        """
+        Initialize the compactor (the background thread starts on start())
+
+        Args:
+            vectorstore_getter: Callable returning the hot vector store
+            archive_getter: Callable returning the archive vector store
+            summarizer: Turns a list of chunk texts into one summary
+            min_age: Seconds before a chunk may be compacted
+            group_size: Chunks rolled into each summary
+            interval: Seconds between background runs (0 disables them)
+            max_chunks_per_run: Upper bound on chunks compacted per run
+            hot_tier: HotTier to drop compacted chunks from
+            lexical_index: LexicalIndex to swap compacted chunks for their summary in
+            on_change: Called with the user id of each compacted group
+        """
+        self.vectorstore_getter = vectorstore_getter
+        self.archive_getter = archive_getter
+        self.summarizer = summarizer
+        self.min_age = min_age
+        self.group_size = max(2, group_size)
+        self.interval = interval
+        self.max_chunks_per_run = max_chunks_per_run
+        self.hot_tier = hot_tier
+        self.lexical_index = lexical_index
+        self.on_change = on_change
+
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self.runs = 0
+        self.summaries_created = 0
+        self.chunks_archived = 0
+        self.last_run: Optional[float] = None
+
+    def start(self) -> None:
+        """
+        Start the background thread if it is enabled and not running yet
+        """
+        if self.interval <= 0:
+            return
+        with self._lock:
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(target=self._run, name="memory-compaction", daemon=True)
+            self._worker.start()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the background thread
+
+        Args:
+            timeout: Seconds to wait for a run in progress
+        """
+        self._stop.set()
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def _run(self) -> None:
+        """
+        Worker loop: compact every interval seconds until closed
+        """
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error compacting memory: {e}")
+
+    def run_once(self, now: Optional[float] = None) -> int:
+        """
+        Compact chunks that are old enough
+
+        Args:
+            now: Reference time (defaults to the current time)
+
+        Returns:
+            Number of summaries created
+        """
+        now = time.time() if now is None else now
+        with self._run_lock, span("memory.compact"):
+            collection = self.vectorstore_getter()._collection
+            created = 0
+            for group in self._select_groups(collection, now):
+                result = collection.get(ids=group, include=["documents", "metadatas", "embeddings"])
+                if len(result["ids"]) < len(group):
+                    # Deleted since the scan
+                    continue
+                position = {doc_id: i for i, doc_id in enumerate(result["ids"])}
+                rows = [position[doc_id] for doc_id in group]
+                self._compact_group(
+                    collection,
+                    group,
+                    [result["documents"][i] for i in rows],
+                    [result["metadatas"][i] for i in rows],
+                    np.asarray([result["embeddings"][i] for i in rows], dtype=np.float32)
+                )
+                created += 1
+
+            with self._lock:
+                self.runs += 1
+                self.summaries_created += created
+                self.chunks_archived += created * self.group_size
+                self.last_run = now
+        if created:
+            get_metrics().increment(COMPACTED_METRIC, "compaction", created * self.group_size)
+        return created
+
+    def _select_groups(self, collection, now: float, page_size: int = 1000) -> List[List[str]]:
+        """
+        Pick the oldest full groups of old-enough chunks
+
+        Chroma returns rows in no particular order, so every candidate's
+        metadata is paged through before groups are formed.
+
+        Args:
+            collection: Hot chromadb Collection
+            now: Reference time
+            page_size: Rows read per call
+
+        Returns:
+            Chunk id groups in chronological order, at most
+            max_chunks_per_run chunks in total
+        """
+        where = {"$and": [{"tier": CHUNK_TIER}, {"created_at": {"$lt": now - self.min_age}}]}
+        candidates = []
+        offset = 0
+        while True:
+            page = collection.get(where=where, limit=page_size, offset=offset, include=["metadatas"])
+            candidates.extend((metadata["created_at"], doc_id, metadata.get("user_id"))
+                              for doc_id, metadata in zip(page["ids"], page["metadatas"]))
+            if len(page["ids"]) < page_size:
+                break
+            offset += page_size
+        candidates.sort()
+
+        # Summaries never mix users
+        by_user: Dict[Any, List[Tuple[float, str]]] = {}
+        for created_at, doc_id, user_id in candidates:
+            by_user.setdefault(user_id, []).append((created_at, doc_id))
+        groups = []
+        for chunks in by_user.values():
+            for start in range(0, len(chunks) - self.group_size + 1, self.group_size):
+                groups.append(chunks[start:start + self.group_size])
+        groups.sort()
+        limit = max(1, self.max_chunks_per_run // self.group_size)
+        return [[doc_id for _, doc_id in group] for group in groups[:limit]]
+
+    def _compact_group(self, collection, ids: List[str], texts: List[str],
+                       metadatas: List[Dict[str, Any]], vectors: np.ndarray) -> None:
+        """
+        Replace one group of chunks with a summary
+
+        The originals are archived before they are deleted, so an
+        interrupted run leaves duplicates rather than losing memories.
+
+        Args:
+            collection: Hot chromadb Collection
+            ids: Chunk ids in chronological order
+            texts: Chunk texts
+            metadatas: Chunk metadata
+            vectors: Chunk embeddings
+        """
+        vectorstore = self.vectorstore_getter()
+        summary_text = self.summarizer(texts)
+        summary_id = f"summary-{ids[0]}"
+        summary_vector = vectorstore.embeddings.embed_documents([summary_text])[0]
+
+        self.archive_getter()._collection.upsert(
+            ids=ids,
+            embeddings=vectors,
+            documents=texts,
+            metadatas=[dict(metadata, tier=ARCHIVE_TIER, summary_id=summary_id) for metadata in metadatas]
+        )
+        summary_metadata = {
+            "tier": SUMMARY_TIER,
+            "source_ids": ",".join(ids),
+            "created_at": min(metadata["created_at"] for metadata in metadatas),
+            "last_seen": max(metadata.get("last_seen", metadata["created_at"]) for metadata in metadatas),
+            "hit_count": sum(metadata.get("hit_count", 1) for metadata in metadatas),
+        }
+        for key in ("user_id", "session_id"):
+            values = {metadata.get(key) for metadata in metadatas}
+            if len(values) == 1 and None not in values:
+                summary_metadata[key] = values.pop()
+        collection.upsert(
+            ids=[summary_id],
+            embeddings=[summary_vector],
+            documents=[summary_text],
+            metadatas=[summary_metadata]
+        )
+        collection.delete(ids=ids)
+        if self.hot_tier is not None:
+            self.hot_tier.remove(ids)
+        if self.lexical_index is not None:
+            self.lexical_index.delete(ids)
+            self.lexical_index.add([summary_id], [summary_text], [summary_metadata])
+        if self.on_change is not None:
+            self.on_change(summary_metadata.get("user_id"))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report compaction activity
+
+        Returns:
+            Dictionary of runs, summaries created and chunks archived
+        """
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "summaries_created": self.summaries_created,
+                "chunks_archived": self.chunks_archived,
+                "last_run": self.last_run,
+            }
@@ -0,0 +1,172 @@
+"""
+Context Assembly Module for AI Assistant
+Fits retrieved memories and recent history into a prompt token budget
+"""
+
+import re
+from typing import Any, Dict, List, Tuple
+
+# Gemini averages roughly four characters of English text per token
+CHARS_PER_TOKEN = 4
+
+MEMORY_HEADER = "\n\nRelevant past conversations:\n"
+HISTORY_HEADER = "\n\nRecent conversation:\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a text
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Approximate token count
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _normalize(text: str) -> str:
+    """
+    Collapse whitespace and case so near-identical texts compare equal
+    """
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _trim(text: str, max_tokens: int) -> str:
+    """
+    Cut a text down to roughly max_tokens, ending on a word boundary
+
+    Args:
+        text: Text to trim
+        max_tokens: Token allowance including the ellipsis
+
+    Returns:
+        Trimmed text
+    """
+    max_chars = max(0, (max_tokens - 1) * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut + " …"
+
+
+class ContextAssembler:
+    """
+    Builds the memory context for a prompt within a token budget
+
+    Recent history is filled first (newest exchange first) from its share of
+    the budget; retrieved memories, in retrieval rank order, get the rest.
+    Memories that repeat a recent exchange, or each other, are dropped. An
+    item that does not fit is trimmed if at least min_item_tokens remain.
+    """
+
+    def __init__(self, token_budget: int = 1500, history_share: float = 0.5,
+                 max_memories: int = 3, max_history: int = 3, min_item_tokens: int = 32):
+        """
+        Initialize the assembler
+
+        Args:
+            token_budget: Maximum tokens for the whole context block
+            history_share: Fraction of the budget reserved for recent history
+            max_memories: Maximum retrieved memories to include
+            max_history: Maximum recent exchanges to include
+            min_item_tokens: Smallest trimmed item worth including
+        """
+        self.token_budget = token_budget
+        self.history_share = history_share
+        self.max_memories = max_memories
+        self.max_history = max_history
+        self.min_item_tokens = min_item_tokens
+
+    def _fill(self, items: List[str], budget: int) -> Tuple[List[str], int, int]:
+        """
+        Take items in order until the budget runs out
+
+        Args:
+            items: Rendered items in priority order
+            budget: Tokens available
+
+        Returns:
+            Selected items, tokens used and number of trimmed items
+        """
+        selected, used, trimmed = [], 0, 0
+        for item in items:
+            remaining = budget - used
+            cost = estimate_tokens(item)
+            if cost > remaining:
+                if remaining < self.min_item_tokens:
+                    break
+                item = _trim(item.rstrip("\n"), remaining) + "\n"
+                cost = estimate_tokens(item)
+                trimmed += 1
+            selected.append(item)
+            used += cost
+        return selected, used, trimmed
+
+    def assemble(self, memories: List[Dict[str, Any]],
+                 history: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Assemble the context block
+
+        Args:
+            memories: Retrieved memories, best first (dicts with "content")
+            history: Conversation exchanges, oldest first (dicts with
+                "user" and "assistant")
+
+        Returns:
+            Dictionary with the context "text", per-section "tokens" and
+            counts of "duplicates" dropped and items "trimmed"
+        """
+        recent = history[-self.max_history:] if self.max_history else []
+        exchanges = [
+            f"User: {exchange['user']}\nAssistant: {exchange['assistant']}\n"
+            for exchange in recent
+        ]
+
+        # Drop memories already covered by recent history or by a better hit
+        seen_history = [_normalize(exchange) for exchange in exchanges]
+        seen_memories: List[str] = []
+        unique_memories, duplicates = [], 0
+        for memory in memories:
+            content = _normalize(memory["content"])
+            if any(content in text or text in content for text in seen_history + seen_memories):
+                duplicates += 1
+                continue
+            seen_memories.append(content)
+            unique_memories.append(f"- {memory['content']}\n")
+        unique_memories = unique_memories[:self.max_memories]
+
+        # Recent history first (newest first), then memories with what is left
+        history_budget = int(self.token_budget * self.history_share)
+        history_budget -= estimate_tokens(HISTORY_HEADER) if exchanges else 0
+        history_items, history_tokens, history_trimmed = self._fill(
+            list(reversed(exchanges)), history_budget
+        )
+        if history_items:
+            history_tokens += estimate_tokens(HISTORY_HEADER)
+
+        memory_budget = self.token_budget - history_tokens
+        memory_budget -= estimate_tokens(MEMORY_HEADER) if unique_memories else 0
+        memory_items, memory_tokens, memory_trimmed = self._fill(unique_memories, memory_budget)
+        if memory_items:
+            memory_tokens += estimate_tokens(MEMORY_HEADER)
+
+        text = ""
+        if memory_items:
+            text += MEMORY_HEADER + "".join(memory_items)
+        if history_items:
+            text += HISTORY_HEADER + "".join(reversed(history_items))
+
+        return {
+            "text": text,
+            "tokens": {
+                "memories": memory_tokens,
+                "history": history_tokens,
+                "total": memory_tokens + history_tokens,
+            },
+            "duplicates": duplicates,
+            "trimmed": history_trimmed + memory_trimmed,
+        }
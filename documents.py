@@ -0,0 +1,327 @@
+"""
+Document Ingestion for AI Assistant
+Streams long text files into long-term memory with parallel embedding
+"""
+
+import codecs
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+
+from metrics import get_metrics, span
+
+DOCUMENT_TIER = "document"
+DOCUMENT_CHUNKS_METRIC = "assistant_document_chunks_total"
+DOCUMENT_EXTENSIONS = ["txt", "md", "markdown", "rst", "csv", "log", "json", "html"]
+
+
+class DocumentIngestor:
+    """
+    Chunks, embeds and stores documents of any size in bounded memory
+
+    The file is read block_size bytes at a time and split as it arrives; only
+    the unfinished tail of a block is carried into the next one. Chunks are
+    embedded batch_size at a time on a pool of workers, and at most
+    max_pending batches are in flight, so peak memory depends on these
+    settings and not on the file size. Batches are written in file order.
+
+    Document chunks get tier "document", so compaction leaves them alone.
+    They are added to the lexical index but not to the hot tier, and they
+    bypass the embedding cache, so a large upload does not evict recent chat.
+
+    Every chunk is tagged with the ingest's document_id. If ingestion fails
+    partway, the chunks already written are deleted again, so a document is
+    stored completely or not at all and retrying it cannot leave duplicates.
+    """
+
+    def __init__(self, vectorstore_getter: Callable[[], Any], embeddings: Any,
+                 lexical_index: Optional[Any] = None, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 batch_size: int = 64, workers: int = 4, max_pending: Optional[int] = None,
+                 block_size: int = 2**20):
+        """
+        Initialize the ingestor
+
+        Args:
+            vectorstore_getter: Callable returning the main vector store
+            embeddings: Embedding model (a CachedEmbeddings is unwrapped)
+            lexical_index: LexicalIndex to keep in step
+            chunk_size: Characters per chunk
+            chunk_overlap: Characters shared by neighbouring chunks
+            batch_size: Chunks embedded and written per batch
+            workers: Batches embedded in parallel
+            max_pending: Batches in flight before the reader waits (defaults to 2 * workers)
+            block_size: Bytes read from the file at a time
+        """
+        self.vectorstore_getter = vectorstore_getter
+        self.embeddings = getattr(embeddings, "base", embeddings)
+        self.lexical_index = lexical_index
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_pending = max_pending or 2 * workers
+        self.block_size = max(block_size, 4 * chunk_size)
+        self._splitter = None
+
+        self._lock = threading.Lock()
+        self.documents_ingested = 0
+        self.documents_failed = 0
+        self.chunks_written = 0
+        self.bytes_read = 0
+
+    @property
+    def splitter(self):
+        """
+        Text splitter that records where each chunk starts
+        """
+        if self._splitter is None:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            self._splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                add_start_index=True
+            )
+        return self._splitter
+
+    def ingest(self, source: Union[str, BinaryIO], metadata: Optional[Dict[str, Any]] = None,
+               name: Optional[str] = None, encoding: str = "utf-8",
+               progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Store one document as memory chunks
+
+        Args:
+            source: File path or binary file object
+            metadata: Added to every chunk (e.g. user_id, session_id, created_at)
+            name: Source name recorded on each chunk (defaults to the file name)
+            encoding: Text encoding (undecodable bytes are replaced)
+            progress: Called after each written batch with the running stats
+
+        Returns:
+            Dictionary of document id, chunks, bytes, seconds and throughput
+        """
+        if isinstance(source, str):
+            name = name or os.path.basename(source)
+            with open(source, "rb") as stream:
+                return self._ingest(stream, os.path.getsize(source), metadata, name, encoding, progress)
+        return self._ingest(source, _remaining_size(source), metadata,
+                            name or getattr(source, "name", "document"), encoding, progress)
+
+    def _ingest(self, stream: BinaryIO, total_bytes: Optional[int], metadata: Optional[Dict[str, Any]],
+                name: str, encoding: str,
+                progress: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+        """
+        Read, chunk, embed and write a stream
+
+        Args:
+            stream: Binary stream positioned at the start of the document
+            total_bytes: Size of the document, if known
+            metadata: Added to every chunk
+            name: Source name recorded on each chunk
+            encoding: Text encoding
+            progress: Called after each written batch with the running stats
+
+        Returns:
+            Final stats
+        """
+        document_id = uuid.uuid4().hex
+        base_metadata = dict(metadata or {}, tier=DOCUMENT_TIER, source=name, document_id=document_id)
+        base_metadata.setdefault("created_at", time.time())
+        stats = {"document_id": document_id, "source": name, "chunks": 0, "bytes_read": 0,
+                 "total_bytes": total_bytes, "seconds": 0.0, "chunks_per_second": 0.0,
+                 "bytes_per_second": 0.0}
+        start_time = time.perf_counter()
+        counter = {"bytes": 0}
+        written_ids: List[str] = []
+
+        def write(batch: List[Dict[str, Any]], future) -> None:
+            vectors = future.result()
+            written_ids.extend(chunk["id"] for chunk in batch)
+            self._write(batch, vectors)
+            stats["chunks"] += len(batch)
+            stats["bytes_read"] = counter["bytes"]
+            elapsed = time.perf_counter() - start_time
+            stats["seconds"] = elapsed
+            stats["chunks_per_second"] = stats["chunks"] / elapsed if elapsed else 0.0
+            stats["bytes_per_second"] = stats["bytes_read"] / elapsed if elapsed else 0.0
+            if progress is not None:
+                progress(dict(stats))
+
+        try:
+            with span("documents.ingest"), ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="document-embed"
+            ) as pool:
+                pending = deque()
+                for batch in self._batches(self._chunks(stream, encoding, counter), base_metadata):
+                    pending.append((batch, pool.submit(self._embed, [chunk["text"] for chunk in batch])))
+                    # Backpressure: the reader waits once max_pending batches are in flight
+                    if len(pending) >= self.max_pending:
+                        write(*pending.popleft())
+                while pending:
+                    write(*pending.popleft())
+        except Exception:
+            with self._lock:
+                self.documents_failed += 1
+            self._rollback(document_id, written_ids)
+            raise
+
+        stats["bytes_read"] = counter["bytes"]
+        stats["seconds"] = time.perf_counter() - start_time
+        with self._lock:
+            self.documents_ingested += 1
+            self.chunks_written += stats["chunks"]
+            self.bytes_read += stats["bytes_read"]
+        return stats
+
+    def _chunks(self, stream: BinaryIO, encoding: str, counter: Dict[str, int]) -> Iterator[Dict[str, Any]]:
+        """
+        Split a stream into chunks as it is read
+
+        Each block is split together with the carried tail. Every chunk but
+        the last is final; the last may continue in the next block, so it is
+        carried and split again.
+
+        Args:
+            stream: Binary stream
+            encoding: Text encoding
+            counter: Receives the number of bytes read under "bytes"
+
+        Yields:
+            Chunks with text and start_index (character offset in the document)
+        """
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        buffer, offset = "", 0
+        while True:
+            raw = stream.read(self.block_size)
+            counter["bytes"] += len(raw)
+            buffer += decoder.decode(raw, final=not raw)
+            if raw and len(buffer) < self.block_size:
+                continue
+
+            with span("documents.split"):
+                pieces = self.splitter.create_documents([buffer]) if buffer.strip() else []
+            if not raw:
+                for piece in pieces:
+                    yield {"text": piece.page_content, "start_index": offset + piece.metadata["start_index"]}
+                return
+            if len(pieces) < 2:
+                continue
+            for piece in pieces[:-1]:
+                yield {"text": piece.page_content, "start_index": offset + piece.metadata["start_index"]}
+            tail_start = pieces[-1].metadata["start_index"]
+            if tail_start < 0:
+                tail_start = len(buffer) - len(pieces[-1].page_content)
+            buffer = buffer[tail_start:]
+            offset += tail_start
+
+    def _batches(self, chunks: Iterator[Dict[str, Any]],
+                 base_metadata: Dict[str, Any]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Group chunks into batches with ids and metadata
+
+        Args:
+            chunks: Chunks from _chunks()
+            base_metadata: Metadata shared by every chunk
+
+        Yields:
+            Lists of chunks with id, text and metadata
+        """
+        batch = []
+        for index, chunk in enumerate(chunks):
+            batch.append({
+                "id": f"{base_metadata['document_id']}-{index}",
+                "text": chunk["text"],
+                "metadata": dict(base_metadata, chunk_index=index, start_index=chunk["start_index"]),
+            })
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed one batch (runs on a worker)
+
+        Args:
+            texts: Chunk texts
+
+        Returns:
+            float32 matrix with one row per chunk
+        """
+        with span("documents.embed"):
+            return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+
+    def _write(self, batch: List[Dict[str, Any]], vectors: np.ndarray) -> None:
+        """
+        Store one embedded batch
+
+        Args:
+            batch: Chunks with id, text and metadata
+            vectors: Their embeddings
+        """
+        ids = [chunk["id"] for chunk in batch]
+        texts = [chunk["text"] for chunk in batch]
+        metadatas = [chunk["metadata"] for chunk in batch]
+        with span("documents.write"):
+            self.vectorstore_getter()._collection.upsert(ids=ids, embeddings=vectors, documents=texts,
+                                                         metadatas=metadatas)
+            if self.lexical_index is not None:
+                self.lexical_index.add(ids, texts, metadatas)
+        get_metrics().increment(DOCUMENT_CHUNKS_METRIC, "documents", len(batch))
+
+    def _rollback(self, document_id: str, ids: List[str]) -> None:
+        """
+        Delete the chunks of a document whose ingestion failed
+
+        Args:
+            document_id: The failed ingest's document id
+            ids: Chunk ids that were (or may have been) written
+        """
+        try:
+            with span("documents.rollback"):
+                self.vectorstore_getter()._collection.delete(where={"document_id": document_id})
+                if self.lexical_index is not None and ids:
+                    self.lexical_index.delete(ids)
+            print(f"Document {document_id} failed; removed the chunks already stored")
+        except Exception as e:
+            print(f"Error removing chunks of failed document {document_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report ingestion totals
+
+        Returns:
+            Dictionary of documents ingested and failed, chunks and bytes
+        """
+        with self._lock:
+            return {
+                "documents_ingested": self.documents_ingested,
+                "documents_failed": self.documents_failed,
+                "chunks_written": self.chunks_written,
+                "bytes_read": self.bytes_read,
+            }
+
+
+def _remaining_size(stream: BinaryIO) -> Optional[int]:
+    """
+    Bytes left in a seekable stream
+
+    Args:
+        stream: Binary stream
+
+    Returns:
+        Remaining size, or None if the stream cannot seek
+    """
+    try:
+        position = stream.tell()
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(position)
+        return size - position
+    except (AttributeError, OSError, ValueError):
+        return getattr(stream, "size", None)
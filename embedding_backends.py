@@ -0,0 +1,72 @@
+"""
+Embedding Backends for AI Assistant
+Builds the configured embedding model behind the LangChain Embeddings interface
+"""
+
+from typing import Any, Callable, Dict, Optional
+
+from metrics import startup_span
+
+
+def huggingface_backend(model_name: str, batch_size: int = 32, threads: Optional[int] = None,
+                        device: str = "cpu", **_: Any):
+    """
+    Sentence-transformers model through langchain_huggingface
+
+    Args:
+        model_name: Hugging Face model id
+        batch_size: Texts encoded per forward pass
+        threads: Torch intra-op threads (None keeps the default)
+        device: Torch device, e.g. "cpu" or "cuda"
+
+    Returns:
+        HuggingFaceEmbeddings instance
+    """
+    if threads:
+        with startup_span("import:torch"):
+            import torch
+        torch.set_num_threads(threads)
+    with startup_span("import:langchain_huggingface"):
+        from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs={'device': device},
+        encode_kwargs={'normalize_embeddings': True, 'batch_size': batch_size}
+    )
+
+
+def hash_backend(dimensions: int = 384, **_: Any):
+    """
+    Tiny deterministic local model for tests and offline runs
+
+    Args:
+        dimensions: Vector size
+
+    Returns:
+        HashEmbeddings instance
+    """
+    from stubs import HashEmbeddings
+    return HashEmbeddings(dimensions=dimensions)
+
+
+EMBEDDING_BACKENDS: Dict[str, Callable[..., Any]] = {
+    "huggingface": huggingface_backend,
+    "hash": hash_backend,
+}
+
+
+def create_embeddings(backend: str = "huggingface", **options: Any):
+    """
+    Build an embedding model by backend name
+
+    Args:
+        backend: Key of EMBEDDING_BACKENDS
+        **options: Backend options (model_name, batch_size, threads, device, dimensions)
+
+    Returns:
+        LangChain Embeddings instance
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; "
+                         f"choose one of {', '.join(EMBEDDING_BACKENDS)}")
+    return EMBEDDING_BACKENDS[backend](**options)
@@ -0,0 +1,242 @@
+"""
+Embedding Cache for AI Assistant
+Content-hash keyed LRU cache in front of the embedding model
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that computes each distinct text only once
+
+    Vectors are keyed by a SHA-256 of the model name and text. A bounded
+    in-memory LRU answers most lookups; an optional SQLite file keeps vectors
+    across restarts and is itself capped at max_disk_entries.
+    """
+
+    def __init__(self, base: Embeddings, model_name: str = "", max_entries: int = 10000,
+                 persist_path: Optional[str] = None, max_disk_entries: int = 200000,
+                 symmetric: bool = True):
+        """
+        Initialize the cache
+
+        Args:
+            base: Embedding model to wrap
+            model_name: Model identifier mixed into cache keys
+            max_entries: Maximum vectors kept in memory
+            persist_path: Optional SQLite file for on-disk persistence
+            max_disk_entries: Maximum vectors kept on disk
+            symmetric: Whether the model embeds queries and documents the same
+                way (true for all-MiniLM-L6-v2), so both can share entries
+        """
+        self.base = base
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.symmetric = symmetric
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        self._disk_count = 0
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+            self._db.commit()
+            self._disk_count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _key(self, text: str, kind: str) -> str:
+        """
+        Build the cache key for a text
+
+        Args:
+            text: Text to embed
+            kind: "query" or "document"
+
+        Returns:
+            Hex digest key
+        """
+        if self.symmetric:
+            kind = "any"
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        """
+        Find a vector in memory, then on disk (caller holds the lock)
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached vector or None
+        """
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+        if self._db is not None:
+            row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                vector = array("f", row[0]).tolist()
+                self._db.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+                self._remember(key, vector)
+                self.disk_hits += 1
+                return vector
+
+        return None
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        """
+        Insert a vector into the in-memory LRU (caller holds the lock)
+
+        Args:
+            key: Cache key
+            vector: Embedding vector
+        """
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _persist(self, items: Dict[str, List[float]]) -> None:
+        """
+        Write new vectors to disk and trim the oldest (caller holds the lock)
+
+        Args:
+            items: Newly computed vectors by key
+        """
+        if self._db is None or not items:
+            return
+
+        now = time.time()
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+        )
+        self._disk_count += len(items)
+        if self._disk_count > self.max_disk_entries:
+            # Evict in chunks so trimming is not paid on every insert
+            excess = self._disk_count - self.max_disk_entries + self.max_disk_entries // 10
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+            )
+            self._disk_count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._db.commit()
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        """
+        Embed texts, computing only the ones not already cached
+
+        Args:
+            texts: Texts to embed
+            kind: "query" or "document"
+
+        Returns:
+            One vector per text
+        """
+        keys = [self._key(text, kind) for text in texts]
+        vectors: Dict[str, List[float]] = {}
+        missing: Dict[str, str] = {}
+
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in vectors or key in missing:
+                    continue
+                vector = self._lookup(key)
+                if vector is None:
+                    missing[key] = text
+                else:
+                    vectors[key] = vector
+
+        if missing:
+            # Compute outside the lock so other sessions can keep hitting the cache
+            if kind == "query" and len(missing) == 1:
+                computed = [self.base.embed_query(next(iter(missing.values())))]
+            else:
+                computed = self.base.embed_documents(list(missing.values()))
+            new_items = dict(zip(missing.keys(), computed))
+
+            with self._lock:
+                self.misses += len(new_items)
+                for key, vector in new_items.items():
+                    self._remember(key, vector)
+                self._persist(new_items)
+            vectors.update(new_items)
+
+        return [vectors[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a list of documents
+
+        Args:
+            texts: Documents to embed
+
+        Returns:
+            One vector per document
+        """
+        return self._embed(list(texts), "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a search query
+
+        Args:
+            text: Query text
+
+        Returns:
+            Query vector
+        """
+        return self._embed([text], "query")[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache effectiveness
+
+        Returns:
+            Dictionary of hit/miss counters and sizes
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "disk_entries": self._disk_count,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        """
+        Drop every cached vector, in memory and on disk
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+                self._disk_count = 0
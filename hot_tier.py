@@ -0,0 +1,272 @@
+"""
+Hot Tier for AI Assistant
+Keeps recent chunk embeddings in one NumPy matrix for vectorized search
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from vectors import dequantize, quantize
+
+# Rows converted to float32 at a time when scoring a quantized matrix
+SCORE_BLOCK_ROWS = 4096
+
+
+class HotTier:
+    """
+    In-memory ring buffer of the most recently written chunks
+
+    Embeddings live in a contiguous matrix, so a search is a single
+    matrix-vector product plus masks for the filters. When the buffer is
+    full the oldest chunk is overwritten. Capacity is max_entries, lowered
+    if needed so the matrix stays under max_bytes. A capacity of 0 disables
+    the tier.
+
+    The matrix can be stored as float16 or int8 to fit 2-4x more chunks in
+    the same memory; recall@k stays on par with float32 for normalized
+    embeddings, so results are ranked by the quantized scores as they are.
+    int8 scores about as fast as float32, while float16 is slower because
+    NumPy converts it to float32 block by block. Only this tier is
+    quantized; the persistent store keeps float32 vectors.
+    """
+
+    def __init__(self, max_entries: int = 2000, max_bytes: Optional[int] = None,
+                 dtype: str = "float32"):
+        """
+        Initialize an empty tier (the matrix is allocated on the first add)
+
+        Args:
+            max_entries: Maximum chunks kept
+            max_bytes: Maximum size of the embedding matrix
+            dtype: Storage type, "float32", "float16" or "int8"
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.capacity = max_entries
+        self.dtype = dtype
+
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._next = 0
+        self._filled = 0
+        self._slots: Dict[str, int] = {}
+        self.hits = 0
+        self.fallbacks = 0
+        self.evictions = 0
+
+    def _allocate(self, dimensions: int) -> None:
+        """
+        Allocate storage once the embedding size is known (caller holds the lock)
+
+        Args:
+            dimensions: Embedding size
+        """
+        row_bytes = dimensions * np.dtype(self.dtype).itemsize + (4 if self.dtype == "int8" else 0)
+        if self.max_bytes is not None:
+            self.capacity = min(self.max_entries, self.max_bytes // row_bytes)
+        self._matrix = np.zeros((self.capacity, dimensions), dtype=self.dtype)
+        self._scales = np.ones(self.capacity, dtype=np.float32)
+        self._valid = np.zeros(self.capacity, dtype=bool)
+        self._created_at = np.zeros(self.capacity, dtype=np.float64)
+        self._users = np.empty(self.capacity, dtype=object)
+        self._sessions = np.empty(self.capacity, dtype=object)
+        self._ids: List[Optional[str]] = [None] * self.capacity
+        self._contents: List[Optional[str]] = [None] * self.capacity
+        self._metadatas: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+
+    def add(self, ids: List[str], vectors: np.ndarray, texts: List[str],
+            metadatas: List[Dict[str, Any]]) -> None:
+        """
+        Add freshly written chunks, evicting the oldest when full
+
+        Args:
+            ids: Chunk ids (shared with the vector store)
+            vectors: Normalized embeddings, one row per chunk
+            texts: Chunk texts
+            metadatas: Chunk metadata
+        """
+        if self.capacity <= 0 or not ids:
+            return
+        codes, scales = quantize(vectors, self.dtype)
+        with self._lock:
+            if self._matrix is None:
+                self._allocate(codes.shape[1])
+                if self.capacity <= 0:
+                    return
+
+            for row, (doc_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+                self._remove(doc_id)
+                slot = self._next
+                evicted = self._ids[slot]
+                if evicted is not None:
+                    del self._slots[evicted]
+                    self.evictions += 1
+
+                self._matrix[slot] = codes[row]
+                if scales is not None:
+                    self._scales[slot] = scales[row]
+                self._valid[slot] = True
+                self._created_at[slot] = metadata.get("created_at", 0.0)
+                self._users[slot] = metadata.get("user_id")
+                self._sessions[slot] = metadata.get("session_id")
+                self._ids[slot] = doc_id
+                self._contents[slot] = text
+                self._metadatas[slot] = metadata
+                self._slots[doc_id] = slot
+
+                self._next = (slot + 1) % self.capacity
+                self._filled = max(self._filled, slot + 1)
+
+    def remove(self, ids: List[str]) -> None:
+        """
+        Drop chunks that were deleted or compacted
+
+        Args:
+            ids: Chunk ids
+        """
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        """
+        Drop one chunk (caller holds the lock)
+
+        Args:
+            doc_id: Chunk id
+        """
+        slot = self._slots.pop(doc_id, None)
+        if slot is None:
+            return
+        self._valid[slot] = False
+        self._ids[slot] = None
+        self._contents[slot] = None
+        self._metadatas[slot] = None
+
+    def clear(self) -> None:
+        """
+        Drop every chunk (keeps the allocated matrix)
+        """
+        with self._lock:
+            for slot in self._slots.values():
+                self._valid[slot] = False
+                self._ids[slot] = None
+                self._contents[slot] = None
+                self._metadatas[slot] = None
+            self._slots.clear()
+
+    def search(self, query_vector: List[float], k: int = 5, user_id: Optional[str] = None,
+               session_id: Optional[str] = None, since: Optional[float] = None,
+               until: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Find the most similar recent chunks
+
+        Args:
+            query_vector: Normalized query embedding
+            k: Number of results
+            user_id: Only this user's chunks
+            session_id: Only chunks from this session
+            since: Only chunks created at or after this Unix time
+            until: Only chunks created before this Unix time
+
+        Returns:
+            Results with id, content, metadata, cosine score and the stored
+            vector, best first
+        """
+        query = np.asarray(query_vector, dtype=np.float32)
+        with self._lock:
+            if not self._slots:
+                return []
+            n = self._filled
+            mask = self._valid[:n].copy()
+            if user_id is not None:
+                mask &= self._users[:n] == user_id
+            if session_id is not None:
+                mask &= self._sessions[:n] == session_id
+            if since is not None:
+                mask &= self._created_at[:n] >= since
+            if until is not None:
+                mask &= self._created_at[:n] < until
+            matches = int(mask.sum())
+            count = min(k, matches)
+            if count == 0:
+                return []
+
+            scores = np.where(mask, self._scores(n, query), -np.inf)
+            top = np.argpartition(-scores, count - 1)[:count]
+            top = top[np.argsort(-scores[top])]
+            vectors = dequantize(self._matrix[top], self._scales[top] if self.dtype == "int8" else None)
+            results = [
+                {"id": self._ids[slot], "content": self._contents[slot],
+                 "metadata": self._metadatas[slot], "score": float(scores[slot]), "vector": vector}
+                for slot, vector in zip(top, vectors)
+            ]
+        return results
+
+    def _scores(self, n: int, query: np.ndarray) -> np.ndarray:
+        """
+        Approximate cosine scores of the first n slots (caller holds the lock)
+
+        Args:
+            n: Number of slots to score
+            query: Normalized float32 query
+
+        Returns:
+            float32 scores
+        """
+        if self.dtype == "float32":
+            return self._matrix[:n] @ query
+        # Convert block by block so scoring never materializes a float32 copy
+        scores = np.empty(n, dtype=np.float32)
+        for start in range(0, n, SCORE_BLOCK_ROWS):
+            block = self._matrix[start:min(start + SCORE_BLOCK_ROWS, n)].astype(np.float32)
+            scores[start:start + len(block)] = block @ query
+        if self.dtype == "int8":
+            scores *= self._scales[:n]
+        return scores
+
+    def record(self, hit: bool) -> None:
+        """
+        Count whether a search was answered by the hot tier alone
+
+        Args:
+            hit: True if the persistent store was skipped
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.fallbacks += 1
+
+    def _matrix_bytes(self) -> int:
+        """
+        Size of the embedding storage, including int8 scales (caller holds the lock)
+
+        Returns:
+            Size in bytes
+        """
+        if self._matrix is None:
+            return 0
+        return self._matrix.nbytes + (self._scales.nbytes if self.dtype == "int8" else 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report size and effectiveness
+
+        Returns:
+            Dictionary of entries, capacity, bytes, hits, fallbacks and evictions
+        """
+        with self._lock:
+            searches = self.hits + self.fallbacks
+            return {
+                "entries": len(self._slots),
+                "capacity": self.capacity,
+                "dtype": self.dtype,
+                "bytes": self._matrix_bytes(),
+                "hits": self.hits,
+                "fallbacks": self.fallbacks,
+                "hit_rate": self.hits / searches if searches else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,382 @@
+"""
+Ingestion Queue for AI Assistant
+Write-behind pipeline that batches vector store inserts off the request path
+"""
+
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from compaction import CHUNK_TIER
+from metrics import get_metrics, span
+from vectors import distance_space, distance_to_similarity
+
+WRITES_AVOIDED_METRIC = "assistant_memory_writes_avoided_total"
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+
+class IngestionQueue:
+    """
+    Background writer that coalesces documents into batched inserts
+
+    submit() returns immediately with a ticket. A worker thread writes
+    pending documents once batch_size of them are waiting or the oldest has
+    waited max_wait seconds, whichever comes first. Tickets are written in
+    order, so flush(ticket) returning True means that submission and every
+    earlier one can be read back from the vector store.
+
+    A batch that fails to write is retried max_retries times with doubling
+    delays. If it still fails its tickets are recorded as failed, and
+    flush() returns False for them instead of reporting them stored.
+    Writes are idempotent: document ids are fixed at submit(), chunks are
+    upserted, and a retry ignores copies of its own chunks stored by an
+    earlier attempt, so every step is redone without duplicating anything.
+
+    With a dedup_threshold, a chunk whose nearest stored neighbour (or an
+    earlier chunk in the same batch) is at least that similar is not
+    written; the neighbour's hit_count and last_seen metadata are bumped.
+    Only raw chunks of the same user are merged, but across sessions, so a
+    greeting or question repeated the next day is stored once; the repeat
+    is then found through the earlier session's chunk.
+    Stored chunks are also added to the lexical index and hot tier, if given.
+    """
+
+    def __init__(self, vectorstore_getter: Callable[[], Any], batch_size: int = 32,
+                 max_wait: float = 0.5, dedup_threshold: Optional[float] = None,
+                 lexical_index: Optional[Any] = None, hot_tier: Optional[Any] = None,
+                 max_retries: int = 3, retry_delay: float = 0.5):
+        """
+        Initialize the queue (the worker starts on first submit)
+
+        Args:
+            vectorstore_getter: Callable returning the current vector store
+            batch_size: Number of documents that triggers a write
+            max_wait: Maximum seconds a document waits before being written
+            dedup_threshold: Cosine similarity at which a chunk counts as a
+                near-duplicate (None disables deduplication)
+            lexical_index: LexicalIndex kept in step with the vector store
+            hot_tier: HotTier that receives every stored chunk
+            max_retries: Extra attempts for a batch whose write fails
+            retry_delay: Seconds before the first retry, doubled each time
+        """
+        self.vectorstore_getter = vectorstore_getter
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.dedup_threshold = dedup_threshold
+        self.lexical_index = lexical_index
+        self.hot_tier = hot_tier
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._cond = threading.Condition()
+        # Entries are (ticket, document id, document)
+        self._pending: List[Tuple[int, str, "Document"]] = []
+        self._oldest_at = 0.0
+        self._submitted = 0
+        # Highest ticket up to which every submission is stored or has failed
+        self._written = 0
+        self._failed_tickets: Set[int] = set()
+        self._flush_requested = False
+        self._writing = False
+        self._closed = False
+        self._worker: Optional[threading.Thread] = None
+
+        self.batches_written = 0
+        self.documents_written = 0
+        self.documents_failed = 0
+        self.batches_retried = 0
+        self.documents_deduplicated = 0
+
+    def submit(self, documents: List["Document"]) -> int:
+        """
+        Queue documents for insertion
+
+        Args:
+            documents: Documents to store
+
+        Returns:
+            Ticket to pass to flush() for read-your-writes
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Ingestion queue is closed")
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="memory-ingestion", daemon=True
+                )
+                self._worker.start()
+
+            self._submitted += 1
+            ticket = self._submitted
+            if not documents:
+                # Nothing to write, but keep tickets contiguous
+                if not self._pending and not self._writing:
+                    self._written = ticket
+                return ticket
+
+            if not self._pending:
+                self._oldest_at = time.monotonic()
+            for document in documents:
+                self._pending.append((ticket, str(uuid.uuid4()), document))
+            self._cond.notify_all()
+            return ticket
+
+    def flush(self, ticket: Optional[int] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Write pending documents now and wait until they are stored
+
+        Args:
+            ticket: Wait only until this submission is stored (default: all)
+            timeout: Seconds to wait
+
+        Returns:
+            True if the requested documents are stored, False if the wait
+            timed out or a write failed after its retries
+        """
+        with self._cond:
+            target = self._submitted if ticket is None else ticket
+            start = 0 if ticket is not None else self._written
+            if self._written < target:
+                self._flush_requested = True
+                self._cond.notify_all()
+                if not self._cond.wait_for(lambda: self._written >= target, timeout):
+                    return False
+            if ticket is not None:
+                return ticket not in self._failed_tickets
+            return not any(start < failed <= target for failed in self._failed_tickets)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Write everything still pending and stop the worker
+
+        Args:
+            timeout: Seconds to wait for the worker to finish
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def pending(self) -> int:
+        """
+        Number of documents waiting to be written
+
+        Returns:
+            Pending document count
+        """
+        with self._cond:
+            return len(self._pending)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report pipeline counters
+
+        Returns:
+            Dictionary of pending, written and failed counts
+        """
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "batches_written": self.batches_written,
+                "documents_written": self.documents_written,
+                "documents_failed": self.documents_failed,
+                "batches_retried": self.batches_retried,
+                "documents_deduplicated": self.documents_deduplicated,
+            }
+
+    def _next_batch(self) -> List[Tuple[int, str, "Document"]]:
+        """
+        Wait for a full batch, the time window, a flush or close
+
+        Returns:
+            Entries to write, or an empty list when the queue is closed
+        """
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return []
+
+            deadline = self._oldest_at + self.max_wait
+            while (len(self._pending) < self.batch_size
+                   and not self._flush_requested and not self._closed):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            self._writing = True
+            if self._pending:
+                self._oldest_at = time.monotonic()
+            else:
+                self._flush_requested = False
+            return batch
+
+    def _run(self) -> None:
+        """
+        Worker loop: write batches until closed and drained
+        """
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            stored, failed = self._write_with_retries(batch), 0
+            if stored is None:
+                stored, failed = 0, len(batch)
+
+            with self._cond:
+                if failed:
+                    self._failed_tickets.update(ticket for ticket, _, _ in batch)
+                # Everything before the first still-pending ticket is stored or failed
+                self._written = self._pending[0][0] - 1 if self._pending else self._submitted
+                self._writing = False
+                self.batches_written += 1
+                self.documents_written += stored
+                self.documents_failed += failed
+                self._cond.notify_all()
+
+    def _write_with_retries(self, batch: List[Tuple[int, str, "Document"]]) -> Optional[int]:
+        """
+        Write a batch, retrying failures with doubling delays
+
+        Args:
+            batch: Entries to write
+
+        Returns:
+            Number of documents stored, or None if every attempt failed
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with span("memory.ingest_batch"):
+                    return self._write(batch)
+            except Exception as e:
+                print(f"Error writing memory batch (attempt {attempt + 1}): {e}")
+                if attempt == self.max_retries:
+                    return None
+                with self._cond:
+                    self.batches_retried += 1
+                time.sleep(self.retry_delay * 2 ** attempt)
+        return None
+
+    def _write(self, batch: List[Tuple[int, str, "Document"]]) -> int:
+        """
+        Embed a batch in one call, drop near-duplicates and store the rest
+
+        The store and the indexes are written before neighbours' hit counts
+        are bumped, so a retry after any failure repeats only idempotent
+        steps.
+
+        Args:
+            batch: Entries to write
+
+        Returns:
+            Number of documents stored
+        """
+        vectorstore = self.vectorstore_getter()
+        ids = [doc_id for _, doc_id, _ in batch]
+        texts = [document.page_content for _, _, document in batch]
+        vectors = np.asarray(vectorstore.embeddings.embed_documents(texts), dtype=np.float32)
+
+        now = time.time()
+        metadatas = []
+        for _, _, document in batch:
+            # Keep the caller's created_at so time filters see submission time
+            created_at = document.metadata.get("created_at", now)
+            metadatas.append(dict(document.metadata, tier=CHUNK_TIER, created_at=created_at,
+                                  last_seen=created_at, hit_count=1))
+
+        keep, merged, avoided = list(range(len(batch))), {}, 0
+        if self.dedup_threshold is not None:
+            keep, merged, avoided = self._deduplicate(vectorstore._collection, ids, vectors, metadatas, now)
+
+        if keep:
+            ids, texts, metadatas = [ids[i] for i in keep], [texts[i] for i in keep], [metadatas[i] for i in keep]
+            vectorstore._collection.upsert(ids=ids, embeddings=vectors[keep], documents=texts, metadatas=metadatas)
+            if self.lexical_index is not None:
+                self.lexical_index.add(ids, texts, metadatas)
+            if self.hot_tier is not None:
+                self.hot_tier.add(ids, vectors[keep], texts, metadatas)
+        # Hit counts are bumped last, so a retry cannot count them twice
+        if merged:
+            vectorstore._collection.update(ids=list(merged), metadatas=list(merged.values()))
+        if avoided:
+            with self._cond:
+                self.documents_deduplicated += avoided
+            get_metrics().increment(WRITES_AVOIDED_METRIC, "dedup", avoided)
+        return len(keep)
+
+    def _deduplicate(self, collection, ids: List[str], vectors: np.ndarray, metadatas: List[Dict[str, Any]],
+                     now: float) -> Tuple[List[int], Dict[str, Dict[str, Any]], int]:
+        """
+        Find the chunks of a batch worth writing, merging the rest
+
+        Args:
+            collection: chromadb Collection being written to
+            ids: Document ids of the batch (stored copies of them are not neighbours)
+            vectors: Normalized embeddings of the batch
+            metadatas: Metadata of the batch (hit counts are updated in place)
+            now: Timestamp for last_seen
+
+        Returns:
+            Indices of the chunks to write, updated metadata of the stored
+            neighbours they merged into, and the number of chunks avoided
+        """
+        # Near-duplicates inside the batch fold into their first occurrence;
+        # chunks of different users never merge
+        scopes = [metadata.get("user_id") for metadata in metadatas]
+        similarities = vectors @ vectors.T
+        keep: List[int] = []
+        for i in range(len(vectors)):
+            first = next((j for j in keep
+                          if scopes[j] == scopes[i] and similarities[i, j] >= self.dedup_threshold), None)
+            if first is None:
+                keep.append(i)
+            else:
+                metadatas[first]["hit_count"] += metadatas[i]["hit_count"]
+        avoided = len(vectors) - len(keep)
+
+        # Then compare each survivor with its nearest stored raw chunk of the same
+        # user (never a summary or a document chunk)
+        merged: Dict[str, Dict[str, Any]] = {}
+        stored = collection.count() if keep else 0
+        if stored > 0:
+            space = distance_space(collection)
+            # A retry finds what an earlier attempt of this batch stored; skip past those copies
+            own_ids = set(collection.get(ids=ids, include=[])["ids"])
+            survivors = []
+            for user_id in dict.fromkeys(scopes[i] for i in keep):
+                group = [i for i in keep if scopes[i] == user_id]
+                where = {"tier": CHUNK_TIER}
+                if user_id is not None:
+                    where = {"$and": [where, {"user_id": user_id}]}
+                result = collection.query(
+                    query_embeddings=vectors[group], n_results=min(stored, 1 + len(own_ids)), where=where,
+                    include=["metadatas", "distances"]
+                )
+                for i, neighbour_ids, distances, neighbour_metadatas in zip(
+                    group, result["ids"], result["distances"], result["metadatas"]
+                ):
+                    nearest = next((n for n, neighbour_id in enumerate(neighbour_ids)
+                                    if neighbour_id not in own_ids), None)
+                    if nearest is None or distance_to_similarity(distances[nearest], space) < self.dedup_threshold:
+                        survivors.append(i)
+                        continue
+                    neighbour_id = neighbour_ids[nearest]
+                    metadata = merged.get(neighbour_id) or dict(neighbour_metadatas[nearest] or {})
+                    metadata["hit_count"] = metadata.get("hit_count", 1) + metadatas[i]["hit_count"]
+                    metadata["last_seen"] = now
+                    merged[neighbour_id] = metadata
+            avoided += len(keep) - len(survivors)
+            keep = sorted(survivors)
+
+        return keep, merged, avoided
@@ -0,0 +1,236 @@
+"""
+Lexical Index for AI Assistant
+Incrementally maintained BM25 inverted index stored in SQLite
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# Words, plus compound tokens such as "err-404", "v1.2.3" or "a/b" kept whole
+TOKEN_PATTERN = re.compile(r"\w+(?:[-.:/]\w+)*")
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into index terms
+
+    Compound tokens are indexed both whole and as their parts, so an exact
+    id matches strongly and its pieces still match on their own.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        Lowercased terms (repeated terms are kept for term frequency)
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        parts = WORD_PATTERN.findall(token)
+        terms.extend(parts)
+        if len(parts) > 1:
+            terms.append(token)
+    return terms
+
+
+class LexicalIndex:
+    """
+    BM25 search over stored chunks without any embedding work
+
+    Each chunk's terms go into a postings table as it is written, so the
+    index never needs rebuilding. Documents keep their text, user_id,
+    session_id and created_at, so filtered lookups are answered from SQLite
+    alone. Terms found in more than max_df of all chunks (such as the
+    "User:" and "Assistant:" labels) are ignored unless nothing else matches.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75, max_df: float = 0.5):
+        """
+        Open or create the index
+
+        Args:
+            path: SQLite file
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+            max_df: Document frequency share above which a term is ignored
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_df = max_df
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                id TEXT PRIMARY KEY, content TEXT, metadata TEXT, length INTEGER,
+                user_id TEXT, session_id TEXT, created_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_docs_user ON docs (user_id, created_at);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT, doc_id TEXT, tf INTEGER, PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings (doc_id);
+        """)
+        self._db.commit()
+        count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+        self._doc_count = count
+        self._total_length = total
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """
+        Index chunks (re-indexing any id that is already present)
+
+        Args:
+            ids: Chunk ids (shared with the vector store)
+            texts: Chunk texts
+            metadatas: Chunk metadata
+        """
+        with self._lock:
+            self._delete(ids)
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                self._db.execute(
+                    "INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (doc_id, text, json.dumps(metadata), length, metadata.get("user_id"),
+                     metadata.get("session_id"), metadata.get("created_at"))
+                )
+                self._db.executemany(
+                    "INSERT INTO postings VALUES (?, ?, ?)",
+                    [(term, doc_id, tf) for term, tf in counts.items()]
+                )
+                self._doc_count += 1
+                self._total_length += length
+            self._db.commit()
+
+    def delete(self, ids: List[str]) -> None:
+        """
+        Remove chunks from the index
+
+        Args:
+            ids: Chunk ids
+        """
+        with self._lock:
+            self._delete(ids)
+            self._db.commit()
+
+    def _delete(self, ids: List[str]) -> None:
+        """
+        Remove chunks without committing (caller holds the lock)
+
+        Args:
+            ids: Chunk ids
+        """
+        for doc_id in ids:
+            row = self._db.execute("SELECT length FROM docs WHERE id = ?", (doc_id,)).fetchone()
+            if row is None:
+                continue
+            self._db.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            self._db.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+            self._doc_count -= 1
+            self._total_length -= row[0]
+
+    def clear(self) -> None:
+        """
+        Remove every chunk
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM postings")
+            self._db.execute("DELETE FROM docs")
+            self._db.commit()
+            self._doc_count = 0
+            self._total_length = 0
+
+    def count(self) -> int:
+        """
+        Number of indexed chunks
+
+        Returns:
+            Chunk count
+        """
+        return self._doc_count
+
+    def search(self, query: str, k: int = 5, user_id: Optional[str] = None,
+               session_id: Optional[str] = None, since: Optional[float] = None,
+               until: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Rank chunks by BM25
+
+        Args:
+            query: Search query
+            k: Number of results
+            user_id: Only this user's chunks
+            session_id: Only chunks from this session
+            since: Only chunks created at or after this Unix time
+            until: Only chunks created before this Unix time
+
+        Returns:
+            Results with id, content, metadata and score, best first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        filters, params = [], []
+        for clause, value in (("d.user_id = ?", user_id), ("d.session_id = ?", session_id),
+                              ("d.created_at >= ?", since), ("d.created_at < ?", until)):
+            if value is not None:
+                filters.append(clause)
+                params.append(value)
+
+        with self._lock:
+            if not self._doc_count:
+                return []
+            doc_count = self._doc_count
+            average_length = self._total_length / doc_count
+
+            placeholders = ",".join("?" * len(terms))
+            frequencies = dict(self._db.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term",
+                terms
+            ).fetchall())
+            selective = [term for term in frequencies if frequencies[term] <= self.max_df * doc_count]
+            terms = selective or list(frequencies)
+            if not terms:
+                return []
+
+            placeholders = ",".join("?" * len(terms))
+            where = " AND ".join([f"p.term IN ({placeholders})"] + filters)
+            rows = self._db.execute(
+                f"SELECT p.doc_id, p.term, p.tf, d.length FROM postings p "
+                f"JOIN docs d ON d.id = p.doc_id WHERE {where}",
+                terms + params
+            ).fetchall()
+
+            scores: Dict[str, float] = {}
+            for doc_id, term, tf, length in rows:
+                df = frequencies[term]
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                norm = tf + self.k1 * (1 - self.b + self.b * length / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            results = []
+            for doc_id, score in best:
+                content, metadata = self._db.execute(
+                    "SELECT content, metadata FROM docs WHERE id = ?", (doc_id,)
+                ).fetchone()
+                results.append({"id": doc_id, "content": content,
+                                "metadata": json.loads(metadata), "score": score})
+            return results
+
+    def close(self) -> None:
+        """
+        Close the database
+        """
+        with self._lock:
+            self._db.close()
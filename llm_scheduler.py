@@ -0,0 +1,383 @@
+"""
+LLM Scheduler for AI Assistant
+Concurrency cap, rate limiting, retries and priorities around the model client
+"""
+
+import heapq
+import inspect
+import itertools
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from metrics import get_metrics
+
+# Lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 10
+
+RETRY_METRIC = "assistant_llm_retries_total"
+# Errors worth retrying: rate limits, overload and transient server failures
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+                    "DeadlineExceeded", "GatewayTimeout", "BadGateway"}
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """
+    A request could not finish before its deadline
+    """
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Whether an error is transient (rate limit, overload, network)
+
+    Args:
+        error: Exception raised by the model client
+
+    Returns:
+        True if the request may succeed when retried
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)) and not isinstance(error, LLMDeadlineExceeded):
+        return True
+    code = getattr(error, "code", None)
+    code = getattr(code, "value", code)
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        return True
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+class TokenBucket:
+    """
+    Allows rate requests per second on average, with bursts up to capacity
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens saved up (defaults to one second's worth, at least 1)
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        """
+        Take one token, waiting for it if needed
+
+        Args:
+            deadline: time.monotonic() value to give up at
+
+        Returns:
+            True if a token was taken, False if the deadline came first
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class LLMScheduler:
+    """
+    Shares one model client fairly between interactive and background work
+
+    At most max_concurrency requests run at once. Waiting requests are served
+    by priority, then arrival, and background ones never hold more than
+    max_background of the slots, so a compaction run cannot crowd out a
+    user's turn. A token bucket keeps the request rate under the provider
+    quota. Retryable errors are retried with jittered exponential backoff
+    while the request's deadline allows.
+
+    Each attempt takes its rate token before queueing for a slot and gives
+    the slot back before any backoff, so slots are only held by requests
+    that are talking to the model.
+    """
+
+    def __init__(self, model: Any, max_concurrency: int = 4, max_background: Optional[int] = None,
+                 requests_per_second: Optional[float] = None, burst: Optional[float] = None,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0,
+                 timeout: Optional[float] = 60.0):
+        """
+        Initialize the scheduler
+
+        Args:
+            model: Client with generate_content(prompt, stream=False)
+            max_concurrency: Requests in flight at once
+            max_background: Slots background requests may hold (defaults to half, at least 1)
+            requests_per_second: Rate limit (None disables it)
+            burst: Requests allowed back to back under the rate limit
+            max_retries: Retries per request after the first attempt
+            base_delay: Backoff before the first retry, doubled each time (seconds)
+            max_delay: Longest backoff (seconds)
+            timeout: Default seconds from submission to the deadline (None waits forever)
+        """
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_background = max_background or max(1, max_concurrency // 2)
+        self.bucket = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        try:
+            self._accepts_request_options = "request_options" in inspect.signature(model.generate_content).parameters
+        except (TypeError, ValueError):
+            self._accepts_request_options = False
+
+        self._cond = threading.Condition()
+        self._waiting: list = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._running_background = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.deadline_misses = 0
+
+    def client(self, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> "ScheduledModel":
+        """
+        Model-like view whose calls go through the scheduler
+
+        Args:
+            priority: INTERACTIVE, BACKGROUND or any int (lower first)
+            timeout: Seconds per request (defaults to the scheduler's)
+
+        Returns:
+            Object with generate_content(prompt, stream=False)
+        """
+        return ScheduledModel(self, priority, timeout)
+
+    def generate_content(self, prompt: str, stream: bool = False, priority: int = INTERACTIVE,
+                         timeout: Optional[float] = None):
+        """
+        Call the model within the concurrency, rate and retry policy
+
+        Args:
+            prompt: Full prompt text
+            stream: Return an iterator of chunks instead of one response
+            priority: INTERACTIVE, BACKGROUND or any int (lower first)
+            timeout: Seconds until the deadline (defaults to the scheduler's)
+
+        Returns:
+            The model's response, or an iterator of chunks when streaming
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        if stream:
+            return self._stream(prompt, priority, deadline)
+        return self._with_retries(lambda options: self.model.generate_content(prompt, **options),
+                                  priority, deadline)
+
+    def _stream(self, prompt: str, priority: int, deadline: Optional[float]) -> Iterator[Any]:
+        """
+        Stream a response, holding a slot until it is consumed
+
+        Only opening the stream and its first chunk are retried; once text
+        has been yielded, errors are raised to the caller. The slot taken by
+        the successful attempt is kept until the stream ends.
+
+        Args:
+            prompt: Full prompt text
+            priority: Request priority
+            deadline: time.monotonic() value to give up at
+
+        Yields:
+            Response chunks
+        """
+        def start(options):
+            chunks = iter(self.model.generate_content(prompt, stream=True, **options))
+            return chunks, next(chunks, None)
+
+        chunks, first = self._with_retries(start, priority, deadline, hold=True)
+        try:
+            if first is None:
+                return
+            yield first
+            for chunk in chunks:
+                yield chunk
+        finally:
+            self._release(priority)
+
+    def _with_retries(self, call, priority: int, deadline: Optional[float], hold: bool = False):
+        """
+        Run a model call, retrying transient errors with jittered backoff
+
+        Every attempt waits for a rate token, then for a slot, and frees the
+        slot when the call returns or fails, before any backoff sleep.
+
+        Args:
+            call: Callable taking extra keyword arguments for generate_content
+            priority: Request priority
+            deadline: time.monotonic() value to give up at
+            hold: Keep the slot after a successful call (the caller releases it)
+
+        Returns:
+            The call's result
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.bucket is not None and not self.bucket.acquire(deadline):
+                self._miss_deadline("waiting for the rate limit")
+            self._acquire(priority, deadline)
+            options = {}
+            if deadline is not None and self._accepts_request_options:
+                options["request_options"] = {"timeout": max(0.1, deadline - time.monotonic())}
+            with self._cond:
+                self.calls += 1
+            try:
+                result = call(options)
+            except Exception as e:
+                self._release(priority)
+                if attempt == self.max_retries or not is_retryable(e):
+                    with self._cond:
+                        self.failures += 1
+                    raise
+                # Full jitter keeps sessions that failed together from retrying together
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                if deadline is not None and time.monotonic() + delay > deadline:
+                    with self._cond:
+                        self.failures += 1
+                    raise
+                with self._cond:
+                    self.retries += 1
+                get_metrics().increment(RETRY_METRIC, type(e).__name__)
+                time.sleep(delay)
+                continue
+            if not hold:
+                self._release(priority)
+            return result
+
+    def _acquire(self, priority: int, deadline: Optional[float]) -> None:
+        """
+        Wait for a slot in priority order
+
+        Args:
+            priority: Request priority
+            deadline: time.monotonic() value to give up at
+        """
+        background = priority > INTERACTIVE
+        entry = (priority, next(self._sequence))
+        start_time = time.perf_counter()
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while not self._can_run(entry, background):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._miss_deadline("waiting for a free slot")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+            self._running += 1
+            if background:
+                self._running_background += 1
+        get_metrics().observe("llm.queue_wait", time.perf_counter() - start_time)
+
+    def _can_run(self, entry: tuple, background: bool) -> bool:
+        """
+        Whether a waiting request may take a slot now (caller holds the lock)
+
+        Args:
+            entry: The request's (priority, sequence) heap entry
+            background: Whether it is a background request
+
+        Returns:
+            True if a slot is free, the request is first in line and within its class limit
+        """
+        if self._running >= self.max_concurrency:
+            return False
+        if background and self._running_background >= self.max_background:
+            return False
+        # Requests ahead in line go first, unless they are background ones at their limit
+        for ahead in self._waiting:
+            if ahead < entry and not (ahead[0] > INTERACTIVE
+                                      and self._running_background >= self.max_background):
+                return False
+        return True
+
+    def _release(self, priority: int) -> None:
+        """
+        Free a slot
+
+        Args:
+            priority: Priority the slot was acquired with
+        """
+        with self._cond:
+            self._running -= 1
+            if priority > INTERACTIVE:
+                self._running_background -= 1
+            self._cond.notify_all()
+
+    def _miss_deadline(self, stage: str) -> None:
+        """
+        Count and raise a missed deadline
+
+        Args:
+            stage: What the request was doing
+        """
+        with self._cond:
+            self.deadline_misses += 1
+        raise LLMDeadlineExceeded(f"LLM request deadline passed while {stage}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report load and reliability
+
+        Returns:
+            Dictionary of running, waiting, calls, retries, failures and deadline misses
+        """
+        with self._cond:
+            return {
+                "running": self._running,
+                "waiting": len(self._waiting),
+                "max_concurrency": self.max_concurrency,
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "deadline_misses": self.deadline_misses,
+            }
+
+
+class ScheduledModel:
+    """
+    Drop-in stand-in for the model client with a fixed priority
+    """
+
+    def __init__(self, scheduler: LLMScheduler, priority: int = INTERACTIVE, timeout: Optional[float] = None):
+        """
+        Args:
+            scheduler: Scheduler the calls go through
+            priority: Priority of every call
+            timeout: Seconds per request (defaults to the scheduler's)
+        """
+        self.scheduler = scheduler
+        self.priority = priority
+        self.timeout = timeout
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        """
+        Generate a reply like genai.GenerativeModel.generate_content
+
+        Args:
+            prompt: Full prompt text
+            stream: Return an iterator of chunks instead of one response
+
+        Returns:
+            The model's response, or an iterator of chunks when streaming
+        """
+        return self.scheduler.generate_content(prompt, stream=stream, priority=self.priority,
+                                               timeout=self.timeout)
@@ -4,95 +4,525 @@ Handles ChromaDB vector storage and LangChain memory integration
 """
 
 import os
-from typing import List, Dict, Any
-from langchain.memory import ConversationBufferWindowMemory
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import chromadb
-from chromadb.config import Settings
+import time
+import uuid
+from typing import BinaryIO, Callable, List, Dict, Any, Optional, Union
+
+import numpy as np
+
+from compaction import SUMMARY_TIER
+from metrics import span, startup_span
+from registry import ResourceRegistry, estimate_size, get_registry
+from vectors import distance_space, distance_to_similarity, maximal_marginal_relevance
+
+
+def metadata_filter(user_id: Optional[str] = None, session_id: Optional[str] = None,
+                    since: Optional[float] = None, until: Optional[float] = None,
+                    **extra: Any) -> Optional[Dict[str, Any]]:
+    """
+    Build a Chroma where clause so the store filters before ranking
+    
+    Args:
+        user_id: Only this user's chunks
+        session_id: Only chunks from this session
+        since: Only chunks created at or after this Unix time
+        until: Only chunks created before this Unix time
+        **extra: Further clauses, e.g. summary_id={"$in": [...]}
+        
+    Returns:
+        Where clause, or None when nothing is filtered
+    """
+    clauses = [{key: value} for key, value in extra.items()]
+    if user_id is not None:
+        clauses.append({"user_id": user_id})
+    if session_id is not None:
+        clauses.append({"session_id": session_id})
+    if since is not None:
+        clauses.append({"created_at": {"$gte": since}})
+    if until is not None:
+        clauses.append({"created_at": {"$lt": until}})
+    
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def reciprocal_rank_fusion(rankings: List[List[Dict[str, Any]]], k: int,
+                           constant: int = 60) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists by reciprocal rank fusion
+    
+    Each result scores sum(1 / (constant + rank)) over the lists it appears
+    in, so raw scores on different scales never need to be compared.
+    
+    Args:
+        rankings: Result lists (dicts with an "id"), best first
+        k: Number of results to keep
+        constant: Damping constant (60 is the usual choice)
+        
+    Returns:
+        Fused results with the fused score, best first
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, start=1):
+            entry = fused.setdefault(result["id"], dict(result, score=0.0))
+            entry["score"] += 1.0 / (constant + rank)
+    return sorted(fused.values(), key=lambda result: result["score"], reverse=True)[:k]
+
 
 class MemoryManager:
     """
     Manages long-term memory using ChromaDB and LangChain memory
+
+    The embedding model and vector store are shared process-wide through the
+    resource registry; only the conversation window belongs to this instance.
+    Everything is created on first use, so constructing a manager is cheap.
+    
+    Every stored chunk carries user_id, session_id and created_at metadata,
+    and searches only ever see this manager's user.
     """
     
-    def __init__(self, persist_directory: str = "./chroma_db"):
+    def __init__(self, persist_directory: str = "./chroma_db",
+                 registry: Optional[ResourceRegistry] = None,
+                 user_id: str = "default", session_id: Optional[str] = None):
         """
         Initialize memory manager with ChromaDB
         
         Args:
             persist_directory: Directory to store ChromaDB data
+            registry: Shared resource registry (defaults to the process-wide one)
+            user_id: Namespace the memories belong to
+            session_id: Conversation session (defaults to a new random id)
         """
         self.persist_directory = persist_directory
+        self.registry = registry or get_registry()
+        self.user_id = user_id
+        self.session_id = session_id or uuid.uuid4().hex
         
-        # Initialize embeddings (using Hugging Face embeddings)
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        # A known session gets its window back from the session log
+        self._restore_window = session_id is not None
+        self.search_mode = os.getenv("SEARCH_MODE", "hybrid")
+        self.hot_min_score = float(os.getenv("HOT_TIER_MIN_SCORE", "0.75"))
+        # Re-rank fetch_factor * k candidates for diversity (lambda 1, the default, disables it)
+        self.mmr_lambda = float(os.getenv("SEARCH_MMR_LAMBDA", "1"))
+        self.mmr_fetch_factor = int(os.getenv("SEARCH_MMR_FETCH", "4"))
         
-        # Initialize ChromaDB
-        self.vectorstore = Chroma(
-            persist_directory=persist_directory,
-            embedding_function=self.embeddings
-        )
+        # Remember our last queued write for read-your-writes
+        self._last_ticket = 0
         
-        # Initialize conversation memory (keeps last 10 exchanges)
-        self.conversation_memory = ConversationBufferWindowMemory(
-            k=10,
-            return_messages=True,
-            memory_key="chat_history"
-        )
+        # Conversation memory and text splitter are built on first use
+        self._conversation_memory = None
+        self._text_splitter = None
+    
+    @property
+    def embeddings(self):
+        """
+        Shared embeddings (using Hugging Face embeddings)
+        """
+        return self.registry.get_embeddings()
+    
+    @property
+    def vectorstore(self):
+        """
+        Shared ChromaDB vector store for this persist directory
+        """
+        return self.registry.get_vectorstore(self.persist_directory)
+    
+    @property
+    def lexical_index(self):
+        """
+        Shared BM25 index over this persist directory's chunks
+        """
+        return self.registry.get_lexical_index(self.persist_directory)
+    
+    @property
+    def hot_tier(self):
+        """
+        Shared in-memory tier of recently written chunks
+        """
+        return self.registry.get_hot_tier(self.persist_directory)
+    
+    @property
+    def archive(self):
+        """
+        Shared archive of chunks that were compacted into summaries
+        """
+        return self.registry.get_archive(self.persist_directory)
+    
+    @property
+    def compactor(self):
+        """
+        Shared background compaction job for this persist directory
+        """
+        return self.registry.get_compactor(self.persist_directory)
+    
+    @property
+    def retention(self):
+        """
+        Shared deletion and retention job for this persist directory
+        """
+        return self.registry.get_retention_sweeper(self.persist_directory)
+    
+    @property
+    def session_log(self):
+        """
+        Shared durable log of conversation exchanges
+        """
+        return self.registry.get_session_log(self.persist_directory)
+    
+    @property
+    def documents(self):
+        """
+        Shared long-document loader for this persist directory
+        """
+        return self.registry.get_document_ingestor(self.persist_directory)
+    
+    @property
+    def ingestion(self):
+        """
+        Shared write-behind queue for this persist directory
+        """
+        return self.registry.get_ingestion_queue(self.persist_directory)
+    
+    @property
+    def conversation_memory(self):
+        """
+        Conversation memory (keeps last 10 exchanges)
+        """
+        if self._conversation_memory is None:
+            with startup_span("import:langchain.memory"):
+                from langchain.memory import ConversationBufferWindowMemory
+            self._conversation_memory = ConversationBufferWindowMemory(
+                k=10,
+                return_messages=True,
+                memory_key="chat_history"
+            )
+            if self._restore_window:
+                with span("memory.restore"):
+                    for user_input, assistant_response in self.session_log.recent(
+                        self.session_id, self.user_id, self._conversation_memory.k
+                    ):
+                        self._conversation_memory.save_context(
+                            {"input": user_input}, {"output": assistant_response}
+                        )
+        return self._conversation_memory
+    
+    @property
+    def text_splitter(self):
+        """
+        Text splitter for processing long documents
+        """
+        if self._text_splitter is None:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1000,
+                chunk_overlap=200
+            )
+        return self._text_splitter
+    
+    def session_footprint(self) -> int:
+        """
+        Estimate memory held by this session's conversation window
         
-        # Text splitter for processing long documents
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
+        Returns:
+            Approximate size in bytes
+        """
+        if self._conversation_memory is None:
+            return 0
+        memory_variables = self.conversation_memory.load_memory_variables({})
+        return estimate_size(memory_variables.get("chat_history", []))
     
-    def add_conversation(self, user_input: str, assistant_response: str) -> None:
+    def add_conversation(self, user_input: str, assistant_response: str,
+                         long_term: bool = True) -> None:
         """
         Add a conversation exchange to memory
         
+        The vector store write happens in the background; search_memory
+        waits for this session's pending writes before searching.
+        
         Args:
             user_input: User's message
             assistant_response: Assistant's response
+            long_term: Also store the exchange in the vector store
         """
-        # Add to conversation memory
-        self.conversation_memory.save_context(
-            {"input": user_input},
-            {"output": assistant_response}
-        )
+        with span("memory.add"):
+            # Add to conversation memory
+            self.conversation_memory.save_context(
+                {"input": user_input},
+                {"output": assistant_response}
+            )
+            
+            # Durable copy so the window and transcript survive restarts
+            self.session_log.append(self.session_id, self.user_id, user_input, assistant_response)
+            if not long_term:
+                return
+            
+            # Cached answers to related questions may now be stale
+            self._notify_change(user_input)
+            
+            # Create document for vector storage
+            from langchain.schema import Document
+            conversation_text = f"User: {user_input}\nAssistant: {assistant_response}"
+            document = Document(
+                page_content=conversation_text,
+                metadata={"user_id": self.user_id, "session_id": self.session_id,
+                          "created_at": time.time()}
+            )
+            
+            # Split and queue for batched insertion into the vector store
+            texts = self.text_splitter.split_documents([document])
+            self._last_ticket = self.ingestion.submit(texts)
+            
+            # Old chunks are rolled up and expired in the background
+            self.compactor.start()
+            self.retention.note_write(self.user_id)
+            self.retention.start()
+    
+    def ingest_document(self, source: Union[str, BinaryIO], name: Optional[str] = None,
+                        progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Store a text document (e.g. a manual or meeting notes) as long-term memory
         
-        # Create document for vector storage
-        conversation_text = f"User: {user_input}\nAssistant: {assistant_response}"
-        document = Document(page_content=conversation_text)
+        The file is streamed, so its size does not affect peak memory. Each
+        chunk records its source, document id, chunk index and character
+        offset, and belongs to this user and session.
         
-        # Split and add to vector store
-        texts = self.text_splitter.split_documents([document])
-        self.vectorstore.add_documents(texts)
+        Args:
+            source: File path or binary file object
+            name: Source name recorded on each chunk (defaults to the file name)
+            progress: Called after each written batch with the running stats
+            
+        Returns:
+            Dictionary of document id, chunks, bytes, seconds and throughput
+        """
+        with span("memory.ingest_document"):
+            stats = self.documents.ingest(
+                source,
+                metadata={"user_id": self.user_id, "session_id": self.session_id,
+                          "created_at": time.time()},
+                name=name, progress=progress
+            )
+        # Cached answers may predate what the document says
+        self._notify_change()
+        self.retention.start()
+        return stats
     
-    def search_memory(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def search_memory(self, query: str, k: int = 5, session_id: Optional[str] = None,
+                      since: Optional[float] = None, until: Optional[float] = None,
+                      mode: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Search for relevant past conversations
         
+        "vector" ranks by embedding similarity, "lexical" by BM25 over exact
+        terms (no embedding at all) and "hybrid" fuses both rankings with
+        reciprocal rank fusion. Filters are evaluated by the stores, so only
+        this user's chunks are ranked.
+        
+        Outside lexical mode, more candidates than k are fetched and
+        re-ranked by maximal marginal relevance, so near-duplicate chunks
+        do not crowd out other relevant ones. The candidates' stored
+        embeddings are reused; nothing is embedded again.
+        
         Args:
             query: Search query
             k: Number of results to return
+            session_id: Only search this session
+            since: Only chunks created at or after this Unix time
+            until: Only chunks created before this Unix time
+            mode: "hybrid", "vector" or "lexical" (defaults to SEARCH_MODE)
             
         Returns:
             List of relevant conversation chunks
         """
+        mode = mode or self.search_mode
         try:
-            docs = self.vectorstore.similarity_search(query, k=k)
-            return [{"content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+            with span("memory.search"):
+                # Read-your-writes: make this session's latest turns searchable
+                with span("memory.flush_wait"):
+                    if not self.ingestion.flush(self._last_ticket):
+                        print("Warning: the latest conversation turns could not be saved to memory")
+                scope = {"user_id": self.user_id, "session_id": session_id,
+                         "since": since, "until": until}
+                
+                if mode == "lexical":
+                    with span("memory.lexical_search"):
+                        results = self.lexical_index.search(query, k, **scope)
+                else:
+                    diversify = self.mmr_lambda < 1
+                    fetch_k = k * self.mmr_fetch_factor if diversify else k
+                    results = self._vector_search(query, k, scope, fetch_k, with_vectors=diversify)
+                    if mode == "hybrid":
+                        with span("memory.lexical_search"):
+                            lexical_results = self.lexical_index.search(query, fetch_k, **scope)
+                        results = reciprocal_rank_fusion([results, lexical_results], fetch_k)
+                    if diversify and len(results) > k:
+                        with span("memory.rerank"):
+                            results = self._rerank(results, k, fused=mode == "hybrid")
+                    results = results[:k]
+            return [{"id": result["id"], "content": result["content"], "metadata": result["metadata"]}
+                    for result in results]
         except Exception as e:
             print(f"Error searching memory: {e}")
             return []
     
+    def _vector_search(self, query: str, k: int, scope: Dict[str, Any],
+                       fetch_k: Optional[int] = None, with_vectors: bool = False) -> List[Dict[str, Any]]:
+        """
+        Rank chunks by embedding similarity, drilling into compacted ones
+        
+        Recent chunks are searched in memory first. Only when fewer than k
+        of them score at least hot_min_score is the persistent store queried
+        and merged in. It holds recent chunks and summaries of older ones;
+        when a summary ranks among the results, the archived chunks it was
+        built from are searched too and may replace it.
+        
+        Args:
+            query: Search query
+            k: Number of results that must score well to skip the store
+            scope: Filter arguments for metadata_filter()
+            fetch_k: Number of results to return (defaults to k)
+            with_vectors: Also fetch the stored vectors (needed for re-ranking)
+            
+        Returns:
+            Results with id, content, metadata, score and vector (None for
+            store results unless with_vectors), best first
+        """
+        if k < 1:
+            return []
+        fetch_k = fetch_k or k
+        query_vector = self.embeddings.embed_query(query)
+        with span("memory.hot_search"):
+            hot_results = self.hot_tier.search(query_vector, fetch_k, **scope)
+        strong = len(hot_results) >= k and hot_results[k - 1]["score"] >= self.hot_min_score
+        self.hot_tier.record(strong)
+        if strong:
+            return hot_results
+        
+        results = self._query(self.vectorstore, query_vector, fetch_k, metadata_filter(**scope), with_vectors)
+        seen = {result["id"] for result in results}
+        results += [result for result in hot_results if result["id"] not in seen]
+        
+        summary_ids = [result["id"] for result in results
+                       if result["metadata"].get("tier") == SUMMARY_TIER]
+        archive_filter = None
+        if scope.get("session_id") is not None:
+            # Summaries can span sessions, so search the session's
+            # archived chunks directly
+            archive_filter = metadata_filter(**scope)
+        elif summary_ids:
+            archive_filter = metadata_filter(summary_id={"$in": summary_ids}, **scope)
+        if archive_filter is not None:
+            with span("memory.drill_down"):
+                results += self._query(self.archive, query_vector, fetch_k, archive_filter, with_vectors)
+        results.sort(key=lambda result: result["score"], reverse=True)
+        
+        selected = []
+        for result in results:
+            # A summary adds nothing once one of its own chunks ranks above it
+            if any(chosen["metadata"].get("summary_id") == result["id"] for chosen in selected):
+                continue
+            selected.append(result)
+            if len(selected) == fetch_k:
+                break
+        return selected
+    
+    def _rerank(self, results: List[Dict[str, Any]], k: int, fused: bool = False) -> List[Dict[str, Any]]:
+        """
+        Pick k diverse results by maximal marginal relevance
+        
+        Cosine scores are used as relevance directly. Fused scores are
+        scaled so the best is 1, putting them on the same footing as the
+        cosine similarities between candidates. Results without a vector
+        (lexical-only hits) get theirs from the stores.
+        
+        Args:
+            results: Candidates, best first
+            k: Number of results to keep
+            fused: Whether scores come from reciprocal_rank_fusion()
+            
+        Returns:
+            The picked results in pick order
+        """
+        missing = [result["id"] for result in results if result.get("vector") is None]
+        if missing:
+            vectors = self._fetch_vectors(missing)
+            for result in results:
+                if result.get("vector") is None:
+                    result["vector"] = vectors.get(result["id"])
+        # A candidate without a stored vector cannot be compared, so keep the order
+        if any(result["vector"] is None for result in results):
+            return results[:k]
+        
+        relevance = np.array([result["score"] for result in results], dtype=np.float32)
+        if fused and relevance.max() > 0:
+            relevance /= relevance.max()
+        vectors = np.array([result["vector"] for result in results], dtype=np.float32)
+        picked = maximal_marginal_relevance(relevance, vectors, k, self.mmr_lambda)
+        return [results[i] for i in picked]
+    
+    def _fetch_vectors(self, ids: List[str]) -> Dict[str, Any]:
+        """
+        Stored embeddings of chunks in the main collection or the archive
+        
+        Args:
+            ids: Chunk ids
+            
+        Returns:
+            Mapping of chunk id to embedding
+        """
+        vectors: Dict[str, Any] = {}
+        for vectorstore in (self.vectorstore, self.archive):
+            remaining = [doc_id for doc_id in ids if doc_id not in vectors]
+            if not remaining:
+                break
+            page = vectorstore._collection.get(ids=remaining, include=["embeddings"])
+            vectors.update(zip(page["ids"], page["embeddings"]))
+        return vectors
+    
+    def _query(self, vectorstore, query_vector: List[float], k: int,
+               where: Optional[Dict[str, Any]] = None, with_vectors: bool = False) -> List[Dict[str, Any]]:
+        """
+        Nearest-neighbour query with cosine similarity scores
+        
+        Args:
+            vectorstore: Chroma vector store to query
+            query_vector: Query embedding
+            k: Number of results
+            where: Optional metadata filter
+            with_vectors: Also return the stored embeddings
+            
+        Returns:
+            Results with id, content, metadata, score and vector (None unless with_vectors)
+        """
+        collection = vectorstore._collection
+        include = ["documents", "metadatas", "distances"] + (["embeddings"] if with_vectors else [])
+        result = collection.query(
+            query_embeddings=[query_vector],
+            n_results=k,
+            where=where,
+            include=include
+        )
+        scores = distance_to_similarity(result["distances"][0], distance_space(collection))
+        vectors = result["embeddings"][0] if with_vectors else [None] * len(scores)
+        return [
+            {"id": doc_id, "content": content, "metadata": metadata or {},
+             "score": float(score), "vector": vector}
+            for doc_id, content, metadata, score, vector in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], scores, vectors
+            )
+        ]
+    
+    def compact_memory(self) -> int:
+        """
+        Roll old chunks up into summaries now instead of waiting for the job
+        
+        Returns:
+            Number of summaries created
+        """
+        self.ingestion.flush()
+        return self.compactor.run_once()
+    
     def get_conversation_history(self) -> List[Dict[str, str]]:
         """
         Get recent conversation history
@@ -100,7 +530,11 @@ class MemoryManager:
         Returns:
             List of recent conversation exchanges
         """
-        memory_variables = self.conversation_memory.load_memory_variables({})
+        if self._conversation_memory is None and not self._restore_window:
+            return []
+        
+        with span("memory.history"):
+            memory_variables = self.conversation_memory.load_memory_variables({})
         chat_history = memory_variables.get("chat_history", [])
         
         history = []
@@ -113,24 +547,82 @@ class MemoryManager:
         
         return history
     
+    def get_transcript(self, limit: int = 100) -> List[Dict[str, str]]:
+        """
+        Get this session's chat messages from the session log
+        
+        Args:
+            limit: Maximum exchanges (the most recent are kept)
+            
+        Returns:
+            Messages with role and content, oldest first
+        """
+        return self.session_log.transcript(self.session_id, self.user_id, limit)
+    
+    def new_session(self) -> str:
+        """
+        Start a fresh conversation (stored memories are kept)
+        
+        Returns:
+            The new session id
+        """
+        if self._conversation_memory is not None:
+            self._conversation_memory.clear()
+        self.session_id = uuid.uuid4().hex
+        self._restore_window = False
+        return self.session_id
+    
+    def delete_memories(self, ids: Optional[List[str]] = None, session_id: Optional[str] = None,
+                        since: Optional[float] = None, until: Optional[float] = None) -> int:
+        """
+        Delete this user's stored memories
+        
+        Deletes are batched and only touch matching chunks, so other users
+        and sessions keep working against the same store meanwhile. Deleting
+        a whole session (or everything) also removes it from the session log.
+        
+        Args:
+            ids: Only these chunk ids (as returned by search_memory)
+            session_id: Only chunks from this session
+            since: Only chunks created at or after this Unix time
+            until: Only chunks created before this Unix time
+            
+        Returns:
+            Number of chunks deleted
+        """
+        # Queued writes must land first or they would outlive the delete
+        self.ingestion.flush()
+        deleted = self.retention.delete(
+            metadata_filter(user_id=self.user_id, session_id=session_id, since=since, until=until),
+            ids=ids
+        )
+        if ids is None and since is None and until is None:
+            if session_id is None:
+                self.session_log.delete_user(self.user_id)
+            else:
+                self.session_log.delete_session(session_id, self.user_id)
+        # The sweeper has already invalidated cached answers of affected users
+        return deleted
+    
     def clear_memory(self) -> None:
         """
-        Clear all stored memory
+        Clear all of this user's stored memory
         """
         # Clear conversation memory
-        self.conversation_memory.clear()
+        if self._conversation_memory is not None:
+            self._conversation_memory.clear()
         
-        # Clear vector store
         try:
-            # Delete the persist directory to clear ChromaDB
-            import shutil
-            if os.path.exists(self.persist_directory):
-                shutil.rmtree(self.persist_directory)
-            
-            # Reinitialize vectorstore
-            self.vectorstore = Chroma(
-                persist_directory=self.persist_directory,
-                embedding_function=self.embeddings
-            )
+            with span("memory.clear"):
+                self.delete_memories()
         except Exception as e:
             print(f"Error clearing memory: {e}")
+    
+    def _notify_change(self, text: Optional[str] = None) -> None:
+        """
+        Invalidate this user's cached answers affected by a memory change
+        
+        Args:
+            text: Changed content; None means arbitrary content changed
+        """
+        self.registry.notify_memory_change(self.persist_directory, self.user_id, text)
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Memory Export and Import for AI Assistant
+Streams memory stores to and from a compact on-disk format
+
+The export directory holds:
+    manifest.json   format version, embedding model, dimensions and counts
+    memories.jsonl  one line per chunk: id, collection, content, metadata, row
+    vectors.f32     raw embeddings, row-major, memory-mappable
+                    (vectors.f16, or vectors.i8 plus scales.f32, when quantized)
+
+Usage:
+    python memory_transfer.py export backup/
+    python memory_transfer.py export backup/ --vector-dtype int8
+    python memory_transfer.py import backup/ --persist-directory ./chroma_db
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from compaction import CHUNK_TIER, SUMMARY_TIER
+from registry import ARCHIVE_COLLECTION, ResourceRegistry, get_registry
+from vectors import VECTOR_DTYPES, dequantize, quantize
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+MEMORIES_FILE = "memories.jsonl"
+VECTORS_FILES = {"float32": "vectors.f32", "float16": "vectors.f16", "int8": "vectors.i8"}
+SCALES_FILE = "scales.f32"
+MAIN_COLLECTION = "memories"
+
+
+def _collections(registry: ResourceRegistry, persist_directory: str) -> Dict[str, Any]:
+    """
+    Vector stores that make up a memory store
+
+    Args:
+        registry: Resource registry
+        persist_directory: Directory of the memory store
+
+    Returns:
+        Mapping of export collection name to Chroma vector store
+    """
+    return {
+        MAIN_COLLECTION: registry.get_vectorstore(persist_directory),
+        ARCHIVE_COLLECTION: registry.get_archive(persist_directory),
+    }
+
+
+def export_memories(output_directory: str, persist_directory: str = "./chroma_db",
+                    registry: Optional[ResourceRegistry] = None, include_embeddings: bool = True,
+                    batch_size: int = 1000, vector_dtype: str = "float32") -> Dict[str, Any]:
+    """
+    Export every stored chunk page by page
+
+    Only one page is held in memory at a time.
+
+    Args:
+        output_directory: Directory to write (created if missing)
+        persist_directory: Directory of the memory store
+        registry: Resource registry (defaults to the process-wide one)
+        include_embeddings: Also write the vectors file
+        batch_size: Chunks read per page
+        vector_dtype: "float32", "float16" or "int8" (2x and ~4x smaller)
+
+    Returns:
+        The manifest
+    """
+    registry = registry or get_registry()
+    ingestion = registry.get_loaded(f"ingestion:{os.path.abspath(persist_directory)}")
+    if ingestion is not None:
+        ingestion.flush()
+
+    os.makedirs(output_directory, exist_ok=True)
+    include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+    counts: Dict[str, int] = {}
+    rows, dimensions = 0, None
+
+    vectors_path = os.path.join(output_directory, VECTORS_FILES[vector_dtype])
+    scales_path = os.path.join(output_directory, SCALES_FILE)
+    with open(os.path.join(output_directory, MEMORIES_FILE), "w", encoding="utf-8") as memories_file, \
+            open(vectors_path, "wb") as vectors_file, open(scales_path, "wb") as scales_file:
+        for name, vectorstore in _collections(registry, persist_directory).items():
+            collection = vectorstore._collection
+            counts[name] = 0
+            offset = 0
+            while True:
+                page = collection.get(limit=batch_size, offset=offset, include=include)
+                if not page["ids"]:
+                    break
+                if include_embeddings:
+                    codes, scales = quantize(page["embeddings"], vector_dtype)
+                    dimensions = codes.shape[1]
+                    vectors_file.write(codes.tobytes())
+                    if scales is not None:
+                        scales_file.write(scales.tobytes())
+                for i, doc_id in enumerate(page["ids"]):
+                    record = {"id": doc_id, "collection": name, "content": page["documents"][i],
+                              "metadata": page["metadatas"][i] or {}}
+                    if include_embeddings:
+                        record["row"] = rows + i
+                    memories_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                rows += len(page["ids"])
+                counts[name] += len(page["ids"])
+                offset += len(page["ids"])
+
+    if not include_embeddings:
+        os.remove(vectors_path)
+    if not include_embeddings or vector_dtype != "int8":
+        os.remove(scales_path)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "exported_at": time.time(),
+        "embedding_model": registry.get_embeddings().model_name,
+        "dimensions": dimensions,
+        "vector_dtype": vector_dtype,
+        "rows": rows if include_embeddings else 0,
+        "counts": counts,
+    }
+    with open(os.path.join(output_directory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _read_batches(path: str, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Read JSONL records in batches
+
+    Args:
+        path: memories.jsonl path
+        batch_size: Records per batch
+
+    Yields:
+        Lists of records
+    """
+    batch = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def import_memories(input_directory: str, persist_directory: str = "./chroma_db",
+                    registry: Optional[ResourceRegistry] = None, user_id: Optional[str] = None,
+                    batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Import an export in batches, reusing stored vectors when possible
+
+    Vectors are memory-mapped and reused when the export was made with the
+    current embedding model. Otherwise each batch is re-embedded. Existing
+    ids are overwritten, so importing twice is safe. Writes still queued in
+    this process are flushed first, imported raw chunks go into a loaded hot
+    tier (replacing stale copies of overwritten ids), and cached answers of
+    the imported users are invalidated.
+
+    Args:
+        input_directory: Directory written by export_memories
+        persist_directory: Directory of the memory store to fill
+        registry: Resource registry (defaults to the process-wide one)
+        user_id: Assign every imported chunk to this user
+        batch_size: Chunks written per call
+
+    Returns:
+        Number of chunks imported per collection, plus "reembedded"
+    """
+    registry = registry or get_registry()
+    # Queued writes must land first, or they could overwrite imported chunks
+    ingestion = registry.get_loaded(f"ingestion:{os.path.abspath(persist_directory)}")
+    if ingestion is not None:
+        ingestion.flush()
+    with open(os.path.join(input_directory, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported export format: {manifest.get('format_version')}")
+
+    embeddings = registry.get_embeddings()
+    codes, scales = None, None
+    if manifest.get("rows") and manifest.get("embedding_model") == embeddings.model_name:
+        vector_dtype = manifest.get("vector_dtype", "float32")
+        codes = np.memmap(os.path.join(input_directory, VECTORS_FILES[vector_dtype]), dtype=vector_dtype,
+                          mode="r", shape=(manifest["rows"], manifest["dimensions"]))
+        if vector_dtype == "int8":
+            scales = np.memmap(os.path.join(input_directory, SCALES_FILE), dtype=np.float32, mode="r",
+                               shape=(manifest["rows"],))
+
+    collections = _collections(registry, persist_directory)
+    lexical_index = registry.get_lexical_index(persist_directory)
+    # Only a hot tier this process already serves searches from needs updating
+    hot_tier = registry.get_loaded(f"hot_tier:{os.path.abspath(persist_directory)}")
+    counts = {name: 0 for name in collections}
+    counts["reembedded"] = 0
+    users = set()
+
+    for batch in _read_batches(os.path.join(input_directory, MEMORIES_FILE), batch_size):
+        by_collection: Dict[str, List[Dict[str, Any]]] = {}
+        for record in batch:
+            if user_id is not None:
+                record["metadata"]["user_id"] = user_id
+            users.add(record["metadata"].get("user_id"))
+            by_collection.setdefault(record["collection"], []).append(record)
+
+        for name, records in by_collection.items():
+            vectorstore = collections[name]
+            ids = [record["id"] for record in records]
+            texts = [record["content"] for record in records]
+            metadatas = [record["metadata"] for record in records]
+            if codes is not None and all("row" in record for record in records):
+                rows = [record["row"] for record in records]
+                vectors = dequantize(codes[rows], scales[rows] if scales is not None else None)
+            else:
+                vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+                counts["reembedded"] += len(records)
+            vectorstore._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+
+            # The lexical index covers live and archived chunks, not summaries
+            chunks = [i for i, metadata in enumerate(metadatas) if metadata.get("tier") != SUMMARY_TIER]
+            if chunks:
+                lexical_index.add([ids[i] for i in chunks], [texts[i] for i in chunks],
+                                  [metadatas[i] for i in chunks])
+            if hot_tier is not None:
+                # The hot tier holds raw chunks of the main collection only
+                raw = [i for i, metadata in enumerate(metadatas)
+                       if name == MAIN_COLLECTION and metadata.get("tier", CHUNK_TIER) == CHUNK_TIER]
+                hot_tier.remove([doc_id for i, doc_id in enumerate(ids) if i not in raw])
+                if raw:
+                    hot_tier.add([ids[i] for i in raw], vectors[raw], [texts[i] for i in raw],
+                                 [metadatas[i] for i in raw])
+            counts[name] += len(records)
+
+    # Cached answers may predate what was imported
+    for changed_user in users:
+        registry.notify_memory_change(persist_directory, changed_user)
+    return counts
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Export or import AI Assistant memories")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("directory", help="Export directory")
+    parser.add_argument("--persist-directory", default="./chroma_db", help="Memory store directory")
+    parser.add_argument("--no-embeddings", action="store_true", help="Export text and metadata only")
+    parser.add_argument("--vector-dtype", choices=VECTOR_DTYPES, default="float32",
+                        help="Storage type of exported vectors")
+    parser.add_argument("--user-id", help="Import every memory for this user")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Chunks per batch")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    if args.action == "export":
+        manifest = export_memories(args.directory, args.persist_directory,
+                                   include_embeddings=not args.no_embeddings,
+                                   batch_size=args.batch_size, vector_dtype=args.vector_dtype)
+        print(f"✅ Exported {sum(manifest['counts'].values())} memories to {args.directory}")
+    else:
+        counts = import_memories(args.directory, args.persist_directory, user_id=args.user_id,
+                                 batch_size=args.batch_size)
+        imported = sum(count for name, count in counts.items() if name != "reembedded")
+        print(f"✅ Imported {imported} memories ({counts['reembedded']} re-embedded)")
+    print(f"   took {time.perf_counter() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Metrics Module for AI Assistant
+Lightweight timing spans, rolling latency percentiles and Prometheus export
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+LATENCY_METRIC = "assistant_stage_latency_seconds"
+ERROR_METRIC = "assistant_errors_total"
+STARTUP_METRIC = "assistant_startup_seconds"
+QUANTILES = (50, 95, 99)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of a list of values
+
+    Args:
+        values: Samples
+        pct: Percentile between 0 and 100
+
+    Returns:
+        The percentile, or 0.0 for an empty list
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class RollingHistogram:
+    """
+    Latency samples over a sliding window plus lifetime count and sum
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        Initialize the histogram
+
+        Args:
+            window: Number of most recent samples used for percentiles
+        """
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Record one sample
+
+        Args:
+            value: Observed value (seconds)
+        """
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Summarize the window
+
+        Returns:
+            Count, sum and p50/p95/p99 of recent samples
+        """
+        samples = list(self.samples)
+        result = {"count": self.count, "sum": self.total}
+        for pct in QUANTILES:
+            result[f"p{pct}"] = percentile(samples, pct)
+        return result
+
+
+class MetricsRegistry:
+    """
+    Thread-safe collection of per-stage latency histograms and error counters
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        Initialize an empty registry
+
+        Args:
+            window: Samples kept per stage for percentiles
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, RollingHistogram] = {}
+        self._counters: Dict[Tuple[str, str], float] = {}
+        self._startup: Dict[str, float] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """
+        Record a latency sample for a stage
+
+        Args:
+            stage: Stage name, e.g. "generate_content"
+            seconds: Duration in seconds
+        """
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = RollingHistogram(self.window)
+            histogram.observe(seconds)
+
+    def increment(self, name: str, stage: str, value: float = 1) -> None:
+        """
+        Increase a counter
+
+        Args:
+            name: Counter name
+            stage: Stage label
+            value: Amount to add
+        """
+        with self._lock:
+            self._counters[(name, stage)] = self._counters.get((name, stage), 0) + value
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """
+        Time a block of code; exceptions are counted and re-raised
+
+        Args:
+            stage: Stage name
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.increment(ERROR_METRIC, stage)
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start_time)
+
+    def record_startup(self, component: str, seconds: float) -> None:
+        """
+        Record a one-off startup cost (only the first measurement is kept)
+
+        Args:
+            component: Component name, e.g. "import:whisper"
+            seconds: Duration in seconds
+        """
+        with self._lock:
+            self._startup.setdefault(component, seconds)
+
+    @contextmanager
+    def startup_span(self, component: str) -> Iterator[None]:
+        """
+        Time an import or model load for the startup report
+
+        Args:
+            component: Component name
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_startup(component, time.perf_counter() - start_time)
+
+    def startup_report(self) -> Dict[str, float]:
+        """
+        Import and load times per component, slowest first
+
+        Returns:
+            Mapping of component name to seconds
+        """
+        with self._lock:
+            return dict(sorted(self._startup.items(), key=lambda item: -item[1]))
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summaries for every stage
+
+        Returns:
+            Mapping of stage name to count, sum and percentiles (seconds)
+        """
+        with self._lock:
+            return {stage: histogram.summary() for stage, histogram in sorted(self._histograms.items())}
+
+    def counters(self, name: Optional[str] = None) -> Dict[str, float]:
+        """
+        Current counter values by stage
+
+        Args:
+            name: Only return this counter (default: errors)
+
+        Returns:
+            Mapping of stage name to value
+        """
+        name = name or ERROR_METRIC
+        with self._lock:
+            return {stage: value for (counter, stage), value in sorted(self._counters.items())
+                    if counter == name}
+
+    def render_prometheus(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format
+
+        Returns:
+            Exposition text
+        """
+        lines = [
+            f"# HELP {LATENCY_METRIC} Latency of assistant stages over a rolling window",
+            f"# TYPE {LATENCY_METRIC} summary",
+        ]
+        for stage, summary in self.snapshot().items():
+            for pct in QUANTILES:
+                lines.append(
+                    f'{LATENCY_METRIC}{{stage="{stage}",quantile="{pct / 100}"}} {summary[f"p{pct}"]:.6f}'
+                )
+            lines.append(f'{LATENCY_METRIC}_sum{{stage="{stage}"}} {summary["sum"]:.6f}')
+            lines.append(f'{LATENCY_METRIC}_count{{stage="{stage}"}} {summary["count"]}')
+
+        startup = self.startup_report()
+        if startup:
+            lines.append(f"# HELP {STARTUP_METRIC} Import and load time of lazily loaded components")
+            lines.append(f"# TYPE {STARTUP_METRIC} gauge")
+            for component, seconds in startup.items():
+                lines.append(f'{STARTUP_METRIC}{{component="{component}"}} {seconds:.6f}')
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+        seen = set()
+        for (name, stage), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f'{name}{{stage="{stage}"}} {value:g}')
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Atomically write the exposition text to a file (for node_exporter's
+        textfile collector or similar)
+
+        Args:
+            path: Destination file
+        """
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(temp_path, path)
+
+    def reset(self) -> None:
+        """
+        Drop all samples and counters
+        """
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._startup.clear()
+
+
+_metrics = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """
+    Get the process-wide metrics registry
+
+    Returns:
+        Shared MetricsRegistry instance
+    """
+    return _metrics
+
+
+def span(stage: str):
+    """
+    Time a block of code on the process-wide metrics registry
+
+    Args:
+        stage: Stage name
+    """
+    return _metrics.span(stage)
+
+
+def startup_span(component: str):
+    """
+    Time an import or model load on the process-wide metrics registry
+
+    Args:
+        component: Component name
+    """
+    return _metrics.startup_span(component)
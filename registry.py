@@ -0,0 +1,741 @@
+"""
+Shared Resource Registry for AI Assistant
+Loads heavy models and clients once per process and shares them across sessions
+"""
+
+import atexit
+import os
+import sys
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from metrics import startup_span
+
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_LLM_MODEL = "gemini-2.0-flash-exp"
+DEFAULT_WHISPER_MODEL = "base"
+ARCHIVE_COLLECTION = "conversation_archive"
+DEFAULT_USER_ID = "default"
+# Written once chunks from before per-user memories have been given a user_id
+LEGACY_BACKFILL_MARKER = "legacy_backfill.done"
+
+
+def current_rss() -> int:
+    """
+    Get the resident set size of this process
+
+    Returns:
+        RSS in bytes, or 0 if it cannot be determined
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return 0
+
+
+def estimate_size(obj: Any) -> int:
+    """
+    Estimate the deep in-memory size of a Python object graph
+
+    Args:
+        obj: Object to measure
+
+    Returns:
+        Approximate size in bytes
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current, 0)
+
+        if isinstance(current, (str, bytes, bytearray, int, float, bool)) or current is None:
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif hasattr(current, "__dict__"):
+            stack.append(vars(current))
+
+    return total
+
+
+class ResourceRegistry:
+    """
+    Thread-safe, process-wide cache of expensive resources
+
+    Embeddings, vector store clients, LLM clients and Whisper models are
+    created on first use and then reused by every session in the process.
+    Their libraries are imported only then too, so importing this module
+    (and the app) stays fast; import and load times go to the startup report.
+    """
+
+    def __init__(self, embedding_factory: Optional[Callable[[], Any]] = None,
+                 llm_factory: Optional[Callable[[str], Any]] = None):
+        """
+        Initialize an empty registry
+
+        Args:
+            embedding_factory: Builds the base embedding model instead of
+                HuggingFaceEmbeddings (e.g. an offline stub)
+            llm_factory: Builds an LLM client from a model name instead of
+                Gemini (e.g. an offline stub)
+        """
+        self.embedding_factory = embedding_factory
+        self.llm_factory = llm_factory
+        self._lock = threading.Lock()
+        self._resources: Dict[str, Any] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._footprints: Dict[str, int] = {}
+        self._sessions = weakref.WeakSet()
+        self._genai_configured = False
+        self._warm_up_started = False
+
+    def _get_or_create(self, key: str, factory: Callable[[], Any]) -> Any:
+        """
+        Return the resource stored under key, creating it once if needed
+
+        Each key has its own lock so loading a slow resource (e.g. Whisper)
+        does not block sessions that only need an already-loaded one.
+
+        Args:
+            key: Resource key
+            factory: Callable that builds the resource
+
+        Returns:
+            The shared resource
+        """
+        resource = self._resources.get(key)
+        if resource is not None:
+            return resource
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            resource = self._resources.get(key)
+            if resource is None:
+                rss_before = current_rss()
+                with startup_span(f"load:{key}"):
+                    resource = factory()
+                self._footprints[key] = max(0, current_rss() - rss_before)
+                self._resources[key] = resource
+
+        return resource
+
+    def get_loaded(self, key: str) -> Optional[Any]:
+        """
+        Return a resource only if it has already been created
+
+        Args:
+            key: Resource key, e.g. "embeddings"
+
+        Returns:
+            The resource, or None if it has not been loaded yet
+        """
+        return self._resources.get(key)
+
+    def get_embeddings(self):
+        """
+        Get the shared sentence embedding model
+
+        The backend is chosen with EMBEDDING_BACKEND ("huggingface" or the
+        deterministic "hash" model) and tuned with EMBEDDING_MODEL,
+        EMBEDDING_BATCH_SIZE, EMBEDDING_THREADS and EMBEDDING_DEVICE. The
+        model sits behind a content-hash cache so each text is embedded
+        once. Set EMBEDDING_CACHE_PATH to keep cached vectors on disk.
+
+        Returns:
+            CachedEmbeddings wrapping the configured backend
+        """
+        def create_embeddings():
+            from embedding_backends import create_embeddings as create_backend
+            from embedding_cache import CachedEmbeddings
+
+            if self.embedding_factory is not None:
+                base = self.embedding_factory()
+            else:
+                threads = os.getenv("EMBEDDING_THREADS")
+                base = create_backend(
+                    os.getenv("EMBEDDING_BACKEND", "huggingface"),
+                    model_name=os.getenv("EMBEDDING_MODEL", EMBEDDING_MODEL_NAME),
+                    batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+                    threads=int(threads) if threads else None,
+                    device=os.getenv("EMBEDDING_DEVICE", "cpu")
+                )
+            return CachedEmbeddings(
+                base,
+                model_name=getattr(base, "model_name", EMBEDDING_MODEL_NAME),
+                max_entries=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+                persist_path=os.getenv("EMBEDDING_CACHE_PATH") or None
+            )
+
+        return self._get_or_create("embeddings", create_embeddings)
+
+    def get_vectorstore(self, persist_directory: str = "./chroma_db",
+                        collection_name: Optional[str] = None):
+        """
+        Get the shared Chroma client for a persist directory
+
+        Args:
+            persist_directory: Directory to store ChromaDB data
+            collection_name: Collection to open (defaults to the main one)
+
+        Returns:
+            Chroma vector store
+        """
+        def create_vectorstore():
+            vectorstore = self._open_vectorstore(persist_directory, collection_name)
+            if collection_name is None:
+                self._backfill_legacy_chunks(vectorstore, persist_directory)
+            return vectorstore
+
+        return self._get_or_create(_vectorstore_key(persist_directory, collection_name), create_vectorstore)
+
+    def _open_vectorstore(self, persist_directory: str, collection_name: Optional[str]):
+        """
+        Create a Chroma vector store over the shared embeddings
+
+        Args:
+            persist_directory: Directory to store ChromaDB data
+            collection_name: Collection to open (None: the Chroma default)
+
+        Returns:
+            Chroma vector store
+        """
+        kwargs = {"collection_name": collection_name} if collection_name else {}
+        return _chroma_class()(
+            persist_directory=persist_directory,
+            embedding_function=self.get_embeddings(),
+            **kwargs
+        )
+
+    def _backfill_legacy_chunks(self, vectorstore, persist_directory: str, page_size: int = 1000) -> int:
+        """
+        Tag chunks stored before per-user memories with the default user
+
+        Chunks written by older versions have no metadata, so user-filtered
+        searches would never return them. They are given user_id "default",
+        tier "chunk" and the current time as created_at, and added to the
+        lexical index. Runs once per store; a marker file records it.
+
+        Args:
+            vectorstore: Main Chroma vector store
+            persist_directory: Directory holding the store
+            page_size: Rows read per call
+
+        Returns:
+            Number of chunks updated
+        """
+        from compaction import CHUNK_TIER
+
+        marker = os.path.join(persist_directory, LEGACY_BACKFILL_MARKER)
+        if os.path.exists(marker):
+            return 0
+
+        collection = vectorstore._collection
+        now = time.time()
+        updated = 0
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+            legacy = [i for i, metadata in enumerate(page["metadatas"]) if not (metadata or {}).get("user_id")]
+            if legacy:
+                ids = [page["ids"][i] for i in legacy]
+                texts = [page["documents"][i] for i in legacy]
+                metadatas = [dict(page["metadatas"][i] or {}, user_id=DEFAULT_USER_ID) for i in legacy]
+                for metadata in metadatas:
+                    metadata.setdefault("tier", CHUNK_TIER)
+                    metadata.setdefault("created_at", now)
+                collection.update(ids=ids, metadatas=metadatas)
+                self.get_lexical_index(persist_directory).add(ids, texts, metadatas)
+                updated += len(ids)
+            if len(page["ids"]) < page_size:
+                break
+            offset += page_size
+
+        if updated:
+            print(f"Assigned {updated} chunks from an older memory store to user '{DEFAULT_USER_ID}'")
+        with open(marker, "w") as f:
+            f.write(f"{updated}\n")
+        return updated
+
+    def get_archive(self, persist_directory: str = "./chroma_db"):
+        """
+        Get the archive collection holding compacted original chunks
+
+        Args:
+            persist_directory: Directory to store ChromaDB data
+
+        Returns:
+            Chroma vector store
+        """
+        return self.get_vectorstore(persist_directory, ARCHIVE_COLLECTION)
+
+    def get_ingestion_queue(self, persist_directory: str = "./chroma_db"):
+        """
+        Get the shared write-behind queue for a persist directory
+
+        Args:
+            persist_directory: Directory to store ChromaDB data
+
+        Returns:
+            IngestionQueue writing to that directory's vector store
+        """
+        from ingestion import IngestionQueue
+
+        key = f"ingestion:{os.path.abspath(persist_directory)}"
+        return self._get_or_create(key, lambda: IngestionQueue(
+            lambda: self.get_vectorstore(persist_directory),
+            lexical_index=self.get_lexical_index(persist_directory),
+            hot_tier=self.get_hot_tier(persist_directory),
+            batch_size=int(os.getenv("INGESTION_BATCH_SIZE", "32")),
+            max_wait=float(os.getenv("INGESTION_MAX_WAIT", "0.5")),
+            dedup_threshold=float(os.getenv("MEMORY_DEDUP_THRESHOLD", "0.97")) or None
+        ))
+
+    def get_lexical_index(self, persist_directory: str = "./chroma_db"):
+        """
+        Get the shared BM25 index stored next to a vector store
+
+        Args:
+            persist_directory: Directory to store ChromaDB data
+
+        Returns:
+            LexicalIndex kept in persist_directory/lexical_index.sqlite3
+        """
+        from lexical import LexicalIndex
+
+        return self._get_or_create(
+            f"lexical:{os.path.abspath(persist_directory)}",
+            lambda: LexicalIndex(os.path.join(persist_directory, "lexical_index.sqlite3"))
+        )
+
+    def get_hot_tier(self, persist_directory: str = "./chroma_db"):
+        """
+        Get the shared in-memory tier of recent chunks for a vector store
+
+        Sized by HOT_TIER_SIZE (0 disables it) and HOT_TIER_MAX_MB. With
+        HOT_TIER_DTYPE set to float16 or int8 the tier stores and scores
+        quantized vectors; the Chroma store keeps float32.
+
+        Args:
+            persist_directory: Directory to store ChromaDB data
+
+        Returns:
+            HotTier instance
+        """
+        from hot_tier import HotTier
+
+        max_mb = os.getenv("HOT_TIER_MAX_MB")
+        return self._get_or_create(f"hot_tier:{os.path.abspath(persist_directory)}", lambda: HotTier(
+            max_entries=int(os.getenv("HOT_TIER_SIZE", "2000")),
+            max_bytes=int(float(max_mb) * 2**20) if max_mb else None,
+            dtype=os.getenv("HOT_TIER_DTYPE", "float32")
+        ))
+
+    def get_session_log(self, persist_directory: str = "./chroma_db"):
+        """
+        Get the shared durable log of conversation exchanges
+
+        Args:
+            persist_directory: Directory to store ChromaDB data
+
+        Returns:
+            SessionLog kept in persist_directory/sessions.sqlite3
+        """
+        from session_log import SessionLog
+
+        return self._get_or_create(
+            f"session_log:{os.path.abspath(persist_directory)}",
+            lambda: SessionLog(os.path.join(persist_directory, "sessions.sqlite3"))
+        )
+
+    def get_compactor(self, persist_directory: str = "./chroma_db"):
+        """
+        Get the shared memory compaction job for a persist directory
+
+        Configured with COMPACTION_INTERVAL (0 disables the background
+        job), COMPACTION_MIN_AGE, COMPACTION_GROUP_SIZE and
+        COMPACTION_SUMMARIZER ("llm" or "extractive").
+
+        Args:
+            persist_directory: Directory to store ChromaDB data
+
+        Returns:
+            MemoryCompactor for that directory's vector store
+        """
+        from compaction import LLMSummarizer, MemoryCompactor, extractive_summary
+        from llm_scheduler import BACKGROUND
+
+        def create_compactor():
+            if os.getenv("COMPACTION_SUMMARIZER", "llm") == "extractive":
+                summarizer = extractive_summary
+            else:
+                # Summaries yield to interactive turns for the shared LLM quota
+                summarizer = LLMSummarizer(lambda: self.get_llm_scheduler().client(BACKGROUND))
+            return MemoryCompactor(
+                lambda: self.get_vectorstore(persist_directory),
+                lambda: self.get_archive(persist_directory),
+                summarizer,
+                hot_tier=self.get_hot_tier(persist_directory),
+                lexical_index=self.get_lexical_index(persist_directory),
+                on_change=lambda user_id: self.notify_memory_change(persist_directory, user_id),
+                min_age=float(os.getenv("COMPACTION_MIN_AGE", "86400")),
+                group_size=int(os.getenv("COMPACTION_GROUP_SIZE", "8")),
+                interval=float(os.getenv("COMPACTION_INTERVAL", "0"))
+            )
+
+        return self._get_or_create(f"compaction:{os.path.abspath(persist_directory)}", create_compactor)
+
+    def get_retention_sweeper(self, persist_directory: str = "./chroma_db"):
+        """
+        Get the shared deletion and retention job for a persist directory
+
+        Configured with RETENTION_MAX_AGE_DAYS, RETENTION_MAX_CHUNKS_PER_USER
+        and RETENTION_SWEEP_INTERVAL; without a limit nothing is swept.
+
+        Args:
+            persist_directory: Directory to store ChromaDB data
+
+        Returns:
+            RetentionSweeper for that directory's stores
+        """
+        from retention import RetentionPolicy, RetentionSweeper
+
+        def create_sweeper():
+            max_age_days = os.getenv("RETENTION_MAX_AGE_DAYS")
+            max_chunks = os.getenv("RETENTION_MAX_CHUNKS_PER_USER")
+            policy = RetentionPolicy(
+                max_age=float(max_age_days) * 86400 if max_age_days else None,
+                max_chunks_per_user=int(max_chunks) if max_chunks else None
+            )
+            return RetentionSweeper(
+                lambda: self.get_vectorstore(persist_directory),
+                lambda: self.get_archive(persist_directory),
+                policy,
+                lexical_index=self.get_lexical_index(persist_directory),
+                hot_tier=self.get_hot_tier(persist_directory),
+                session_log=self.get_session_log(persist_directory),
+                on_change=lambda user_id: self.notify_memory_change(persist_directory, user_id),
+                interval=float(os.getenv("RETENTION_SWEEP_INTERVAL", "3600"))
+            )
+
+        return self._get_or_create(f"retention:{os.path.abspath(persist_directory)}", create_sweeper)
+
+    def get_document_ingestor(self, persist_directory: str = "./chroma_db"):
+        """
+        Get the shared long-document loader for a vector store
+
+        Tuned with DOCUMENT_BATCH_SIZE and DOCUMENT_WORKERS.
+
+        Args:
+            persist_directory: Directory to store ChromaDB data
+
+        Returns:
+            DocumentIngestor writing to that directory's vector store
+        """
+        from documents import DocumentIngestor
+
+        key = f"documents:{os.path.abspath(persist_directory)}"
+        return self._get_or_create(key, lambda: DocumentIngestor(
+            lambda: self.get_vectorstore(persist_directory),
+            self.get_embeddings(),
+            lexical_index=self.get_lexical_index(persist_directory),
+            batch_size=int(os.getenv("DOCUMENT_BATCH_SIZE", "64")),
+            workers=int(os.getenv("DOCUMENT_WORKERS", "4"))
+        ))
+
+    def get_response_cache(self, persist_directory: str = "./chroma_db"):
+        """
+        Get the shared semantic answer cache for a memory store
+
+        Configured with RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_TTL and
+        RESPONSE_CACHE_SIZE.
+
+        Args:
+            persist_directory: Directory of the memory store the answers use
+
+        Returns:
+            SemanticResponseCache instance
+        """
+        from response_cache import SemanticResponseCache
+
+        key = f"response_cache:{os.path.abspath(persist_directory)}"
+        return self._get_or_create(key, lambda: SemanticResponseCache(
+            similarity_threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95")),
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+            max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+        ))
+
+    def notify_memory_change(self, persist_directory: str = "./chroma_db", user_id: Optional[str] = None,
+                             text: Optional[str] = None) -> None:
+        """
+        Invalidate cached answers affected by a change to a memory store
+
+        Every path that writes to or deletes from the store (conversation
+        turns, documents, deletions, retention, compaction and imports)
+        reports through here.
+
+        Args:
+            persist_directory: Directory of the memory store that changed
+            user_id: User whose memories changed (None: any user)
+            text: Changed content; None means arbitrary content changed
+        """
+        cache = self.get_loaded(f"response_cache:{os.path.abspath(persist_directory)}")
+        if cache is None:
+            return
+        if text is None:
+            cache.clear(namespace=user_id)
+        else:
+            cache.invalidate_similar(self.get_embeddings().embed_query(text), namespace=user_id)
+
+    def get_model(self, model_name: str = DEFAULT_LLM_MODEL):
+        """
+        Get a shared Gemini model client
+
+        Args:
+            model_name: Gemini model name
+
+        Returns:
+            GenerativeModel instance
+        """
+        def create_model():
+            if self.llm_factory is not None:
+                return self.llm_factory(model_name)
+            with startup_span("import:google.generativeai"):
+                import google.generativeai as genai
+            with self._lock:
+                if not self._genai_configured:
+                    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+                    self._genai_configured = True
+            return genai.GenerativeModel(model_name)
+
+        return self._get_or_create(f"llm:{model_name}", create_model)
+
+    def get_llm_scheduler(self, model_name: str = DEFAULT_LLM_MODEL):
+        """
+        Get the shared request scheduler for a Gemini model
+
+        Configured with LLM_MAX_CONCURRENCY, LLM_BACKGROUND_CONCURRENCY,
+        LLM_REQUESTS_PER_MINUTE (empty for no limit), LLM_MAX_RETRIES and
+        LLM_TIMEOUT (seconds, 0 for no deadline).
+
+        Args:
+            model_name: Gemini model name
+
+        Returns:
+            LLMScheduler wrapping the shared model client
+        """
+        from llm_scheduler import LLMScheduler
+
+        def create_scheduler():
+            background = os.getenv("LLM_BACKGROUND_CONCURRENCY")
+            per_minute = os.getenv("LLM_REQUESTS_PER_MINUTE")
+            timeout = float(os.getenv("LLM_TIMEOUT", "60"))
+            return LLMScheduler(
+                self.get_model(model_name),
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+                max_background=int(background) if background else None,
+                requests_per_second=float(per_minute) / 60 if per_minute else None,
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+                timeout=timeout or None
+            )
+
+        return self._get_or_create(f"llm_scheduler:{model_name}", create_scheduler)
+
+    def get_whisper_model(self, model_size: str = DEFAULT_WHISPER_MODEL):
+        """
+        Get a shared Whisper model (downloaded on first use)
+
+        Args:
+            model_size: Whisper model size, e.g. "base"
+
+        Returns:
+            Loaded Whisper model
+        """
+        def load_whisper():
+            with startup_span("import:whisper"):
+                import whisper
+            return whisper.load_model(model_size)
+
+        return self._get_or_create(f"whisper:{model_size}", load_whisper)
+
+    def get_transcription_service(self, model_size: str = DEFAULT_WHISPER_MODEL):
+        """
+        Get the shared background transcription service
+
+        Args:
+            model_size: Whisper model size, e.g. "base"
+
+        Returns:
+            TranscriptionService whose worker reuses the shared Whisper model
+        """
+        from transcription import TranscriptionService
+
+        return self._get_or_create(
+            f"transcription:{model_size}",
+            lambda: TranscriptionService(lambda: self.get_whisper_model(model_size),
+                                         workers=int(os.getenv("TRANSCRIPTION_WORKERS", "1")))
+        )
+
+    def warm_up(self, components: Iterable[str] = ("embeddings", "vectorstore", "llm"),
+                persist_directory: str = "./chroma_db",
+                background: bool = True) -> Optional[threading.Thread]:
+        """
+        Load resources ahead of the first request
+
+        Only the first call per registry does anything. A request that needs
+        a resource still being warmed up waits for that load instead of
+        starting a second one.
+
+        Args:
+            components: Any of "embeddings", "vectorstore", "llm", "whisper"
+            persist_directory: Directory whose vector store to open
+            background: Load in a daemon thread instead of blocking
+
+        Returns:
+            The warm-up thread when running in the background
+        """
+        with self._lock:
+            if self._warm_up_started:
+                return None
+            self._warm_up_started = True
+
+        loaders = {
+            "embeddings": self.get_embeddings,
+            "vectorstore": lambda: self.get_vectorstore(persist_directory),
+            "llm": self.get_model,
+            "whisper": self.get_whisper_model,
+        }
+
+        def run():
+            for component in components:
+                try:
+                    loaders[component]()
+                except Exception as e:
+                    print(f"Error warming up {component}: {e}")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="resource-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self, timeout: Optional[float] = 10.0) -> None:
+        """
+        Flush and stop background workers (ingestion, compaction, retention, transcription)
+
+        Args:
+            timeout: Seconds to wait for each worker
+        """
+        for key, resource in list(self._resources.items()):
+            close = getattr(resource, "close", None)
+            if key.startswith(("ingestion:", "compaction:", "retention:", "transcription:")) and close is not None:
+                try:
+                    close(timeout)
+                except Exception as e:
+                    print(f"Error shutting down {key}: {e}")
+
+    def register_session(self, session: Any) -> None:
+        """
+        Track a live session so its footprint shows up in memory reports
+
+        Args:
+            session: Object exposing session_footprint()
+        """
+        self._sessions.add(session)
+
+    def memory_report(self, sessions: Optional[Iterable[Any]] = None) -> Dict[str, Any]:
+        """
+        Report memory used by shared resources and per-session state
+
+        Shared sizes are the RSS growth observed while each resource loaded,
+        so they are approximate if two resources loaded concurrently.
+
+        Args:
+            sessions: Sessions to measure (defaults to all registered ones)
+
+        Returns:
+            Dictionary with shared and per-session byte counts
+        """
+        sessions = list(self._sessions if sessions is None else sessions)
+        session_sizes = [session.session_footprint() for session in sessions]
+        per_session_total = sum(session_sizes)
+
+        return {
+            "process_rss": current_rss(),
+            "shared": dict(self._footprints),
+            "shared_total": sum(self._footprints.values()),
+            "sessions": len(sessions),
+            "per_session_total": per_session_total,
+            "per_session_avg": per_session_total // len(sessions) if sessions else 0,
+        }
+
+
+def _vectorstore_key(persist_directory: str, collection_name: Optional[str] = None) -> str:
+    """
+    Registry key of a vector store
+
+    Args:
+        persist_directory: Directory to store ChromaDB data
+        collection_name: Collection name (None: the main collection)
+
+    Returns:
+        Resource key
+    """
+    key = f"vectorstore:{os.path.abspath(persist_directory)}"
+    return f"{key}:{collection_name}" if collection_name else key
+
+
+def _chroma_class():
+    """
+    Import the Chroma vector store class on first use
+
+    Returns:
+        langchain_chroma.Chroma
+    """
+    with startup_span("import:langchain_chroma"):
+        from langchain_chroma import Chroma
+    return Chroma
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ResourceRegistry:
+    """
+    Get the process-wide resource registry
+
+    Returns:
+        Shared ResourceRegistry instance
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ResourceRegistry()
+                atexit.register(_registry.shutdown)
+    return _registry
@@ -0,0 +1,199 @@
+"""
+Semantic Response Cache for AI Assistant
+Reuses answers to repeated questions, matched by query embedding similarity
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class CacheEntry:
+    """
+    A cached answer and the query it was generated for
+    """
+
+    def __init__(self, vector: np.ndarray, answer: str, namespace: str,
+                 generation_seconds: float):
+        """
+        Args:
+            vector: Normalized query embedding
+            answer: Generated answer
+            namespace: Scope the answer belongs to (e.g. a user id)
+            generation_seconds: How long the answer took to generate
+        """
+        self.vector = vector
+        self.answer = answer
+        self.namespace = namespace
+        self.generation_seconds = generation_seconds
+        self.created_at = time.monotonic()
+
+
+class SemanticResponseCache:
+    """
+    Answer cache keyed by query embedding
+
+    A lookup hits when a live entry in the same namespace has cosine
+    similarity of at least similarity_threshold with the query. Entries
+    expire after ttl seconds and the least recently used are evicted beyond
+    max_entries. When memories change, entries for queries similar to the
+    new content (invalidation_threshold) are dropped; clear() drops all.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, ttl: float = 3600.0,
+                 max_entries: int = 1000, invalidation_threshold: float = 0.8):
+        """
+        Initialize the cache
+
+        Args:
+            similarity_threshold: Minimum cosine similarity for a hit
+            ttl: Seconds an answer stays valid
+            max_entries: Maximum cached answers
+            invalidation_threshold: Similarity above which a memory change
+                invalidates a cached answer
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.invalidation_threshold = invalidation_threshold
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, CacheEntry]" = OrderedDict()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    def _expire(self) -> None:
+        """
+        Drop entries older than the TTL (caller holds the lock)
+        """
+        cutoff = time.monotonic() - self.ttl
+        expired = [entry_id for entry_id, entry in self._entries.items() if entry.created_at < cutoff]
+        for entry_id in expired:
+            del self._entries[entry_id]
+
+    def _similarities(self, vector: np.ndarray, namespace: Optional[str]) -> List[tuple]:
+        """
+        Cosine similarity of every live entry to a vector (caller holds the lock)
+
+        Args:
+            vector: Normalized query embedding
+            namespace: Only consider this namespace (None: all)
+
+        Returns:
+            (entry id, similarity) pairs
+        """
+        candidates = [(entry_id, entry) for entry_id, entry in self._entries.items()
+                      if namespace is None or entry.namespace == namespace]
+        if not candidates:
+            return []
+        matrix = np.stack([entry.vector for _, entry in candidates])
+        scores = matrix @ vector
+        return [(entry_id, float(score)) for (entry_id, _), score in zip(candidates, scores)]
+
+    def lookup(self, query_vector: List[float], namespace: str = "") -> Optional[str]:
+        """
+        Find a cached answer for a similar query
+
+        Args:
+            query_vector: Normalized query embedding
+            namespace: Scope to search in
+
+        Returns:
+            The cached answer, or None on a miss
+        """
+        vector = np.asarray(query_vector, dtype=np.float32)
+        with self._lock:
+            self._expire()
+            best_id, best_score = None, self.similarity_threshold
+            for entry_id, score in self._similarities(vector, namespace):
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            entry = self._entries[best_id]
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            self.saved_seconds += entry.generation_seconds
+            return entry.answer
+
+    def store(self, query_vector: List[float], answer: str, generation_seconds: float = 0.0,
+              namespace: str = "") -> None:
+        """
+        Cache an answer
+
+        Args:
+            query_vector: Normalized query embedding
+            answer: Generated answer
+            generation_seconds: Time the answer took (reported as saved on hits)
+            namespace: Scope the answer belongs to
+        """
+        vector = np.asarray(query_vector, dtype=np.float32)
+        with self._lock:
+            self._entries[self._next_id] = CacheEntry(vector, answer, namespace, generation_seconds)
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_similar(self, vector: List[float], namespace: Optional[str] = None) -> int:
+        """
+        Drop answers to queries related to changed memory content
+
+        Args:
+            vector: Embedding of the new or changed content
+            namespace: Only invalidate in this namespace (None: all)
+
+        Returns:
+            Number of entries dropped
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            stale = [entry_id for entry_id, score in self._similarities(vector, namespace)
+                     if score >= self.invalidation_threshold]
+            for entry_id in stale:
+                del self._entries[entry_id]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """
+        Drop cached answers
+
+        Args:
+            namespace: Only clear this namespace (None: everything)
+        """
+        with self._lock:
+            if namespace is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                return
+            stale = [entry_id for entry_id, entry in self._entries.items() if entry.namespace == namespace]
+            for entry_id in stale:
+                del self._entries[entry_id]
+            self.invalidations += len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report cache effectiveness
+
+        Returns:
+            Dictionary of hits, misses, size and latency saved
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "invalidations": self.invalidations,
+                "saved_seconds": self.saved_seconds,
+            }
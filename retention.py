@@ -0,0 +1,326 @@
+"""
+Memory Retention for AI Assistant
+Targeted deletion and a background sweeper enforcing a retention policy
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from compaction import ARCHIVE_TIER, CHUNK_TIER, SUMMARY_TIER
+from metrics import get_metrics, span
+
+DELETED_METRIC = "assistant_memory_chunks_deleted_total"
+# Conversation memory the policy applies to; ingested documents are kept
+# until deleted explicitly
+CONVERSATION_TIERS = [CHUNK_TIER, SUMMARY_TIER, ARCHIVE_TIER]
+
+
+class RetentionPolicy:
+    """
+    How long and how much memory each user keeps
+    """
+
+    def __init__(self, max_age: Optional[float] = None, max_chunks_per_user: Optional[int] = None):
+        """
+        Both limits apply to conversation memory only; ingested documents
+        are never expired or counted.
+
+        Args:
+            max_age: Seconds after which conversation chunks, summaries and
+                archived chunks are deleted (None keeps them)
+            max_chunks_per_user: Newest conversation chunks and summaries kept
+                per user in the main collection (None keeps all)
+        """
+        self.max_age = max_age
+        self.max_chunks_per_user = max_chunks_per_user
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether the policy limits anything
+        """
+        return self.max_age is not None or self.max_chunks_per_user is not None
+
+
+class RetentionSweeper:
+    """
+    Deletes memories in small batches across every store that holds them
+
+    A chunk can live in the main collection, the archive, the lexical index
+    and the hot tier; deletions remove it from all of them. Deleting a
+    summary also deletes the archived chunks it was built from. max_age
+    also expires the session log's exchanges, and every user who lost
+    memories is reported to on_change so cached answers built from them
+    are dropped. Work is done
+    batch_size ids at a time, so other sessions keep reading and writing
+    throughout.
+
+    The chunk cap scans the whole collection once; later sweeps only
+    recount users reported through note_write(), since only new writes can
+    push a user over the cap.
+    """
+
+    def __init__(self, vectorstore_getter: Callable[[], Any], archive_getter: Callable[[], Any],
+                 policy: RetentionPolicy, lexical_index: Optional[Any] = None,
+                 hot_tier: Optional[Any] = None, session_log: Optional[Any] = None,
+                 on_change: Optional[Callable[[Optional[str]], None]] = None,
+                 interval: float = 3600.0, batch_size: int = 500):
+        """
+        Initialize the sweeper (the background thread starts on start())
+
+        Args:
+            vectorstore_getter: Callable returning the main vector store
+            archive_getter: Callable returning the archive vector store
+            policy: Retention policy enforced by sweep()
+            lexical_index: LexicalIndex to keep in step
+            hot_tier: HotTier to keep in step
+            session_log: SessionLog whose exchanges expire with max_age
+            on_change: Called with each user id whose chunks were deleted
+            interval: Seconds between background sweeps (0 disables them)
+            batch_size: Ids deleted per call
+        """
+        self.vectorstore_getter = vectorstore_getter
+        self.archive_getter = archive_getter
+        self.policy = policy
+        self.lexical_index = lexical_index
+        self.hot_tier = hot_tier
+        self.session_log = session_log
+        self.on_change = on_change
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        # Users written to since the last cap check (None: check everyone)
+        self._dirty_users: Optional[Set[Any]] = None
+        self.sweeps = 0
+        self.chunks_deleted = 0
+        self.exchanges_deleted = 0
+        self.last_sweep: Optional[float] = None
+
+    def start(self) -> None:
+        """
+        Start the background thread if a policy is set and it is not running yet
+        """
+        if self.interval <= 0 or not self.policy.enabled:
+            return
+        with self._lock:
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(target=self._run, name="memory-retention", daemon=True)
+            self._worker.start()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the background thread
+
+        Args:
+            timeout: Seconds to wait for a sweep in progress
+        """
+        self._stop.set()
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def _run(self) -> None:
+        """
+        Worker loop: sweep every interval seconds until closed
+        """
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error enforcing memory retention: {e}")
+
+    def note_write(self, user_id: Optional[str]) -> None:
+        """
+        Record that a user stored new conversation chunks
+
+        Args:
+            user_id: User whose chunk count may have grown
+        """
+        with self._lock:
+            if self._dirty_users is not None:
+                self._dirty_users.add(user_id)
+
+    def delete(self, where: Optional[Dict[str, Any]] = None, ids: Optional[List[str]] = None) -> int:
+        """
+        Delete matching chunks from the main collection and the archive
+
+        Args:
+            where: Chroma metadata filter
+            ids: Only these chunk ids (still subject to where)
+
+        Returns:
+            Number of chunks deleted
+        """
+        if where is None and ids is None:
+            raise ValueError("Refusing to delete without a filter")
+        with span("memory.delete"):
+            deleted = self._delete_from(self.vectorstore_getter()._collection, where, ids, main=True)
+            deleted += self._delete_from(self.archive_getter()._collection, where, ids, main=False)
+        self._record(deleted)
+        return deleted
+
+    def _delete_from(self, collection, where: Optional[Dict[str, Any]], ids: Optional[List[str]],
+                     main: bool) -> int:
+        """
+        Delete matching chunks from one collection, batch by batch
+
+        Args:
+            collection: chromadb Collection
+            where: Chroma metadata filter
+            ids: Only these chunk ids
+            main: Whether this is the main collection (summaries live there)
+
+        Returns:
+            Number of chunks deleted
+        """
+        deleted = 0
+        while True:
+            page = collection.get(ids=ids, where=where, limit=self.batch_size, include=["metadatas"])
+            if not page["ids"]:
+                return deleted
+            self._delete_ids(collection, page["ids"])
+            deleted += len(page["ids"])
+            if self.on_change is not None:
+                for user_id in {(metadata or {}).get("user_id") for metadata in page["metadatas"]}:
+                    self.on_change(user_id)
+
+            summary_ids = [doc_id for doc_id, metadata in zip(page["ids"], page["metadatas"])
+                           if (metadata or {}).get("tier") == SUMMARY_TIER]
+            if main and summary_ids:
+                deleted += self._delete_from(self.archive_getter()._collection,
+                                             {"summary_id": {"$in": summary_ids}}, None, main=False)
+
+    def _delete_ids(self, collection, ids: List[str]) -> None:
+        """
+        Remove ids from a collection and the in-process indexes
+
+        Args:
+            collection: chromadb Collection
+            ids: Chunk ids
+        """
+        collection.delete(ids=ids)
+        if self.lexical_index is not None:
+            self.lexical_index.delete(ids)
+        if self.hot_tier is not None:
+            self.hot_tier.remove(ids)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Enforce the retention policy once
+
+        Args:
+            now: Reference time (defaults to the current time)
+
+        Returns:
+            Number of chunks deleted
+        """
+        now = time.time() if now is None else now
+        deleted = 0
+        with span("memory.retention_sweep"):
+            if self.policy.max_age is not None:
+                cutoff = now - self.policy.max_age
+                deleted += self.delete({"$and": [{"created_at": {"$lt": cutoff}},
+                                                 {"tier": {"$in": CONVERSATION_TIERS}}]})
+                self._expire_session_log(cutoff)
+            if self.policy.max_chunks_per_user is not None:
+                deleted += self._enforce_chunk_cap()
+        with self._lock:
+            self.sweeps += 1
+            self.last_sweep = now
+        return deleted
+
+    def _expire_session_log(self, cutoff: float) -> None:
+        """
+        Delete logged exchanges older than the cutoff
+
+        Args:
+            cutoff: Unix time; older exchanges are deleted
+        """
+        if self.session_log is None:
+            return
+        removed = self.session_log.delete_before(cutoff, self.batch_size)
+        if not removed:
+            return
+        with self._lock:
+            self.exchanges_deleted += sum(removed.values())
+        if self.on_change is not None:
+            for user_id in removed:
+                self.on_change(user_id)
+
+    def _enforce_chunk_cap(self) -> int:
+        """
+        Delete each user's oldest chunks beyond max_chunks_per_user
+
+        Only users written to since the last check are counted, except on
+        the first sweep, which scans every conversation chunk once.
+
+        Returns:
+            Number of chunks deleted
+        """
+        collection = self.vectorstore_getter()._collection
+        with self._lock:
+            users, self._dirty_users = self._dirty_users, set()
+        in_cap = {"tier": {"$in": [CHUNK_TIER, SUMMARY_TIER]}}
+        if users is None:
+            wheres = [in_cap]
+        else:
+            wheres = [{"$and": [in_cap, {"user_id": user_id}]} for user_id in users if user_id is not None]
+
+        by_user: Dict[Any, List[tuple]] = {}
+        for where in wheres:
+            offset = 0
+            while True:
+                page = collection.get(where=where, limit=5000, offset=offset, include=["metadatas"])
+                if not page["ids"]:
+                    break
+                for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                    metadata = metadata or {}
+                    by_user.setdefault(metadata.get("user_id"), []).append(
+                        (metadata.get("created_at", 0.0), doc_id)
+                    )
+                offset += len(page["ids"])
+
+        deleted = 0
+        for entries in by_user.values():
+            excess = len(entries) - self.policy.max_chunks_per_user
+            if excess <= 0:
+                continue
+            oldest = [doc_id for _, doc_id in sorted(entries)[:excess]]
+            for start in range(0, len(oldest), self.batch_size):
+                deleted += self.delete(ids=oldest[start:start + self.batch_size])
+        return deleted
+
+    def _record(self, deleted: int) -> None:
+        """
+        Count deleted chunks
+
+        Args:
+            deleted: Number of chunks deleted
+        """
+        if not deleted:
+            return
+        with self._lock:
+            self.chunks_deleted += deleted
+        get_metrics().increment(DELETED_METRIC, "retention", deleted)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report retention activity
+
+        Returns:
+            Dictionary of sweeps, chunks and exchanges deleted and the last sweep time
+        """
+        with self._lock:
+            return {
+                "sweeps": self.sweeps,
+                "chunks_deleted": self.chunks_deleted,
+                "exchanges_deleted": self.exchanges_deleted,
+                "last_sweep": self.last_sweep,
+                "max_age": self.policy.max_age,
+                "max_chunks_per_user": self.policy.max_chunks_per_user,
+            }
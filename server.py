@@ -0,0 +1,722 @@
+#!/usr/bin/env python3
+"""
+Headless HTTP Server for AI Assistant
+Serves chat, search, history and transcription as JSON without a browser
+
+Endpoints:
+    POST /chat        {"message", "user_id", "session_id"} -> {"response", "session_id", "timings"}
+    GET  /search      ?q=&user_id=&session_id=&k=&mode= -> {"results"}
+    GET  /history     ?user_id=&session_id=&limit= -> {"messages"}
+    POST /transcribe  raw audio bytes -> {"text", "segments"}
+    POST /documents   ?user_id=&session_id=&filename=, raw text body -> ingestion stats
+    GET  /metrics     Prometheus text format
+    GET  /health      {"status", "in_flight", "capacity", ...}
+
+Usage:
+    python server.py                     # Gemini and the configured embeddings
+    python server.py --stub --port 8080  # offline stub LLM and hash embeddings, for load tests
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from dotenv import load_dotenv
+
+from assistant import AIAssistant
+from audio import AudioDecodeError
+from llm_scheduler import LLMDeadlineExceeded, is_retryable
+from memory import MemoryManager
+from metrics import get_metrics, span
+from registry import ResourceRegistry, get_registry
+
+REJECTED_METRIC = "assistant_http_rejected_total"
+MAX_BODY_BYTES = 25 * 2**20
+# Seconds clients are asked to wait when the model is overloaded or slow
+LLM_RETRY_AFTER = 5
+
+
+class HTTPError(Exception):
+    """
+    Error returned to the client with a status code
+    """
+
+    def __init__(self, status: int, message: str):
+        """
+        Args:
+            status: HTTP status code
+            message: Error message
+        """
+        super().__init__(message)
+        self.status = status
+
+
+class AssistantService:
+    """
+    The operations behind the endpoints, shared by every connection
+
+    Each (user, session) pair gets one AIAssistant, kept in a bounded LRU so
+    its conversation window stays warm. Requests for the same session are
+    serialized; different sessions run in parallel on the job pool.
+    """
+
+    def __init__(self, registry: Optional[ResourceRegistry] = None,
+                 persist_directory: str = "./chroma_db", workers: int = 8,
+                 max_sessions: int = 1000, request_timeout: float = 60.0):
+        """
+        Initialize the service
+
+        Args:
+            registry: Shared resource registry (defaults to the process-wide one)
+            persist_directory: Directory of the memory store
+            workers: Jobs run at once
+            max_sessions: Assistants kept in memory
+            request_timeout: Seconds a request may take before it fails with 504
+        """
+        self.registry = registry or get_registry()
+        self.persist_directory = persist_directory
+        self.max_sessions = max_sessions
+        self.request_timeout = request_timeout
+        self._jobs = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assistant-job")
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[Tuple[str, str], Tuple[AIAssistant, threading.Lock]]" = OrderedDict()
+
+    def run(self, job: Callable[[], Any], stage: str) -> Any:
+        """
+        Run a job on the pool and wait at most request_timeout for it
+
+        A job that times out is cancelled if it has not started; one that
+        has keeps its worker until it finishes.
+
+        Args:
+            job: Callable doing the work
+            stage: Span name for latency metrics
+
+        Returns:
+            The job's result
+        """
+        def timed():
+            with span(stage):
+                return job()
+
+        future = self._jobs.submit(timed)
+        try:
+            return future.result(timeout=self.request_timeout)
+        except LLMDeadlineExceeded:
+            # Also a TimeoutError, but raised by the job rather than the wait
+            raise
+        except FutureTimeoutError:
+            future.cancel()
+            get_metrics().increment(REJECTED_METRIC, "timeout")
+            raise HTTPError(504, f"Request took longer than {self.request_timeout:g}s")
+
+    def _session(self, user_id: str, session_id: Optional[str]) -> Tuple[AIAssistant, threading.Lock]:
+        """
+        Assistant and lock for a session, created on first use
+
+        Args:
+            user_id: Memory namespace
+            session_id: Conversation session (None starts a new one)
+
+        Returns:
+            The session's assistant and the lock serializing its requests
+        """
+        with self._lock:
+            if session_id is not None and (user_id, session_id) in self._sessions:
+                self._sessions.move_to_end((user_id, session_id))
+                return self._sessions[(user_id, session_id)]
+
+        assistant = AIAssistant(registry=self.registry, persist_directory=self.persist_directory,
+                                user_id=user_id, session_id=session_id)
+        key = (user_id, assistant.memory_manager.session_id)
+        with self._lock:
+            entry = self._sessions.setdefault(key, (assistant, threading.Lock()))
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return entry
+
+    def chat(self, message: str, user_id: str = "default",
+             session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Answer a message within a session
+
+        Args:
+            message: User's message
+            user_id: Memory namespace
+            session_id: Conversation session (None starts a new one)
+
+        Returns:
+            Response, session id and timings
+        """
+        assistant, session_lock = self._session(user_id, session_id)
+        with session_lock:
+            # Failures are raised so the client gets a 5xx, not an apology
+            response = assistant.generate_response(message)
+            timings = dict(assistant.last_timings)
+        return {"response": response, "session_id": assistant.memory_manager.session_id,
+                "timings": timings}
+
+    def search(self, query: str, user_id: str = "default", session_id: Optional[str] = None,
+               k: int = 5, mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Search a user's memories
+
+        Args:
+            query: Search query
+            user_id: Memory namespace
+            session_id: Only search this session
+            k: Number of results
+            mode: "hybrid", "vector" or "lexical"
+
+        Returns:
+            Matching memories
+        """
+        memory_manager = MemoryManager(self.persist_directory, registry=self.registry, user_id=user_id)
+        return {"results": memory_manager.search_memory(query, k=k, session_id=session_id, mode=mode)}
+
+    def history(self, user_id: str, session_id: str, limit: int = 100) -> Dict[str, Any]:
+        """
+        Transcript of a session
+
+        Args:
+            user_id: Owner of the session
+            session_id: Conversation session
+            limit: Maximum exchanges
+
+        Returns:
+            Chat messages, oldest first
+        """
+        memory_manager = MemoryManager(self.persist_directory, registry=self.registry,
+                                       user_id=user_id, session_id=session_id)
+        return {"messages": memory_manager.get_transcript(limit)}
+
+    def ingest_document(self, stream: BinaryIO, name: str, user_id: str = "default",
+                        session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Store an uploaded text document as long-term memory
+
+        Args:
+            stream: Request body, read as it arrives
+            name: Source name recorded on each chunk
+            user_id: Memory namespace
+            session_id: Session the document is attributed to
+
+        Returns:
+            Ingestion stats
+        """
+        memory_manager = MemoryManager(self.persist_directory, registry=self.registry,
+                                       user_id=user_id, session_id=session_id)
+        with span("http.documents"):
+            return memory_manager.ingest_document(stream, name=name)
+
+    def transcribe(self, audio: bytes) -> Dict[str, Any]:
+        """
+        Transcribe uploaded audio with the shared Whisper service
+
+        Args:
+            audio: Encoded audio file contents (decoded in memory)
+
+        Returns:
+            Transcribed text and its timed segments
+        """
+        service = self.registry.get_transcription_service()
+        segments = list(service.transcribe_stream(audio))
+        return {"text": " ".join(segment["text"] for segment in segments if segment["text"]),
+                "segments": segments}
+
+    def close(self) -> None:
+        """
+        Stop the job pool and the registry's background workers
+        """
+        self._jobs.shutdown(wait=True, cancel_futures=True)
+        self.registry.shutdown()
+
+
+class BodyReader:
+    """
+    File-like view of a request body that stops at Content-Length
+    """
+
+    def __init__(self, rfile: BinaryIO, length: int):
+        """
+        Args:
+            rfile: Connection input stream
+            length: Body size in bytes
+        """
+        self.rfile = rfile
+        self.size = length
+        self._remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Read up to size bytes of the body
+
+        Args:
+            size: Maximum bytes (-1 for the rest of the body)
+
+        Returns:
+            Body bytes, empty at the end
+        """
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self.rfile.read(size) if size else b""
+        self._remaining -= len(data)
+        return data
+
+
+class AssistantRequestHandler(BaseHTTPRequestHandler):
+    """
+    Routes requests to the AssistantService on self.server.service
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Seconds a client may stall while sending a request
+    timeout = 30
+
+    def do_GET(self):
+        """Handle GET requests"""
+        url = urlparse(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        service = self.server.service
+        if url.path == "/health":
+            self._send_json(200, dict(self.server.load(), status="ok"))
+        elif url.path == "/metrics":
+            self._send(200, get_metrics().render_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        elif url.path == "/search":
+            self._handle(lambda: service.search(
+                self._require(params, "q"), user_id=params.get("user_id", "default"),
+                session_id=params.get("session_id"), k=self._int(params, "k", 5, minimum=1),
+                mode=params.get("mode")
+            ), "http.search")
+        elif url.path == "/history":
+            self._handle(lambda: service.history(
+                params.get("user_id", "default"), self._require(params, "session_id"),
+                limit=self._int(params, "limit", 100, minimum=1)
+            ), "http.history")
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint {url.path}"})
+
+    def do_POST(self):
+        """Handle POST requests"""
+        url = urlparse(self.path)
+        service = self.server.service
+        if url.path == "/documents":
+            self._ingest_document(url)
+            return
+        if url.path not in ("/chat", "/transcribe"):
+            self._send_json(404, {"error": f"Unknown endpoint {url.path}"})
+            return
+        try:
+            body = self._read_body()
+        except HTTPError as e:
+            self.close_connection = True
+            self._send_json(e.status, {"error": str(e)})
+            return
+
+        if url.path == "/chat":
+            def chat():
+                try:
+                    payload = json.loads(body or b"{}")
+                except ValueError as e:
+                    raise HTTPError(400, f"Invalid JSON: {e}")
+                if not isinstance(payload, dict):
+                    raise HTTPError(400, "Expected a JSON object")
+                for name in ("message", "user_id", "session_id"):
+                    if payload.get(name) is not None and not isinstance(payload[name], str):
+                        raise HTTPError(400, f"Parameter {name} must be a string")
+                return service.chat(self._require(payload, "message"),
+                                    user_id=payload.get("user_id") or "default",
+                                    session_id=payload.get("session_id") or None)
+            self._handle(chat, "http.chat")
+        else:
+            self._transcribe(body)
+
+    def _transcribe(self, body: bytes) -> None:
+        """
+        Transcribe the uploaded audio
+
+        Like document uploads, this runs on the connection's thread rather
+        than under the request timeout: a long recording takes as long as
+        its segments do, and the Whisper queue already bounds the work.
+
+        Args:
+            body: Encoded audio file contents
+        """
+        try:
+            if not body:
+                raise HTTPError(400, "Empty audio upload")
+            with span("http.transcribe"):
+                result = self.server.service.transcribe(body)
+            self._send_json(200, result)
+        except HTTPError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except AudioDecodeError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            print(f"Error transcribing audio: {e}")
+            get_metrics().increment(REJECTED_METRIC, "error")
+            self._send_json(500, {"error": str(e)})
+
+    def _ingest_document(self, url) -> None:
+        """
+        Stream the request body into memory as a document
+
+        Runs on the connection's thread rather than the job pool: its
+        duration grows with the upload, so it is bounded by the connection
+        limit and the socket timeout instead of the request timeout.
+
+        Args:
+            url: Parsed request URL
+        """
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        body = BodyReader(self.rfile, int(self.headers.get("Content-Length") or 0))
+        try:
+            stats = self.server.service.ingest_document(
+                body, params.get("filename", "upload.txt"), user_id=params.get("user_id", "default"),
+                session_id=params.get("session_id")
+            )
+            self._send_json(200, stats)
+        except Exception as e:
+            print(f"Error ingesting document: {e}")
+            get_metrics().increment(REJECTED_METRIC, "error")
+            self.close_connection = True
+            self._send_json(500, {"error": str(e)})
+
+    def _handle(self, job: Callable[[], Dict[str, Any]], stage: str) -> None:
+        """
+        Run a job on the service's pool and send its result as JSON
+
+        Args:
+            job: Callable returning the response body
+            stage: Span name for latency metrics
+        """
+        retry_after = {"Retry-After": str(LLM_RETRY_AFTER)}
+        try:
+            self._send_json(200, self.server.service.run(job, stage))
+        except HTTPError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except LLMDeadlineExceeded as e:
+            get_metrics().increment(REJECTED_METRIC, "llm_deadline")
+            self._send_json(504, {"error": str(e)}, retry_after)
+        except Exception as e:
+            if is_retryable(e):
+                # The scheduler already retried; the model is overloaded or unreachable
+                get_metrics().increment(REJECTED_METRIC, "llm_unavailable")
+                self._send_json(503, {"error": str(e)}, retry_after)
+                return
+            print(f"Error handling {self.command} {self.path}: {e}")
+            get_metrics().increment(REJECTED_METRIC, "error")
+            self._send_json(500, {"error": str(e)})
+
+    def _read_body(self) -> bytes:
+        """
+        Read the request body
+
+        Returns:
+            Body bytes
+        """
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+        return self.rfile.read(length)
+
+    @staticmethod
+    def _int(params: Dict[str, Any], name: str, default: int, minimum: Optional[int] = None) -> int:
+        """
+        Get an optional integer parameter
+
+        Args:
+            params: Query parameters
+            name: Parameter name
+            default: Value when the parameter is absent
+            minimum: Smallest accepted value
+
+        Returns:
+            The value
+        """
+        try:
+            value = int(params.get(name, default))
+        except ValueError:
+            raise HTTPError(400, f"Parameter {name} must be an integer")
+        if minimum is not None and value < minimum:
+            raise HTTPError(400, f"Parameter {name} must be at least {minimum}")
+        return value
+
+    @staticmethod
+    def _require(params: Dict[str, Any], name: str) -> Any:
+        """
+        Get a required parameter
+
+        Args:
+            params: Query or JSON parameters
+            name: Parameter name
+
+        Returns:
+            The value
+        """
+        value = params.get(name)
+        if value in (None, ""):
+            raise HTTPError(400, f"Missing parameter: {name}")
+        return value
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        """
+        Send a JSON response
+
+        Args:
+            status: HTTP status code
+            body: JSON-serializable body
+            headers: Extra response headers
+        """
+        self._send(status, json.dumps(body, ensure_ascii=False).encode("utf-8"), "application/json", headers)
+
+    def _send(self, status: int, body: bytes, content_type: str,
+              headers: Optional[Dict[str, str]] = None) -> None:
+        """
+        Send a response
+
+        Args:
+            status: HTTP status code
+            body: Response bytes
+            content_type: Content-Type header
+            headers: Extra response headers
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Keep per-request logging off the console unless verbose"""
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class AssistantHTTPServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server that sheds load instead of queueing without bound
+
+    At most max_connections connections are handled at once. Further ones
+    get an immediate 503 with Retry-After, so clients back off rather than
+    piling up behind a saturated job pool.
+    """
+
+    # Seconds in total a rejected client gets to finish sending its request
+    reject_timeout = 1.0
+    # Largest body read from a rejected client before the socket is closed anyway
+    max_reject_drain = 2**20
+    # Rejections read at once; beyond this the 503 is sent without reading
+    max_rejecting = 16
+
+    daemon_threads = True
+    # Listen backlog; bursts must reach process_request to get their 503
+    # instead of overflowing the kernel queue
+    request_queue_size = 128
+
+    def __init__(self, address: Tuple[str, int], service: AssistantService,
+                 max_connections: int = 64, verbose: bool = False):
+        """
+        Bind the server
+
+        Args:
+            address: (host, port) to listen on
+            service: Operations behind the endpoints
+            max_connections: Connections handled at once before rejecting
+            verbose: Log every request
+        """
+        super().__init__(address, AssistantRequestHandler)
+        self.service = service
+        self.max_connections = max_connections
+        self.verbose = verbose
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._rejecting = threading.BoundedSemaphore(self.max_rejecting)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+
+    def process_request(self, request, client_address):
+        """Hand the connection to a thread, or reject it when saturated"""
+        if not self._slots.acquire(blocking=False):
+            if self._rejecting.acquire(blocking=False):
+                # Reading the request takes time, so it happens off the accept() thread
+                threading.Thread(target=self._reject, args=(request, True), daemon=True).start()
+            else:
+                self._reject(request, drain=False)
+            return
+        with self._lock:
+            self._in_flight += 1
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        """Handle the connection, then free its slot"""
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def _reject(self, request, drain: bool) -> None:
+        """
+        Answer 503 without handling the request
+
+        When drain is set the request is read first (see _drain), since
+        closing a socket with unread data resets the connection and the
+        client would see a broken pipe instead of the 503. At most
+        max_rejecting rejections drain at once; the rest are answered
+        straight from the accept() thread without reading, so a connection
+        flood cannot pile up threads.
+
+        Args:
+            request: Client socket
+            drain: Read the request before answering (holds a _rejecting slot)
+        """
+        with self._lock:
+            self.rejected += 1
+        get_metrics().increment(REJECTED_METRIC, "backpressure")
+        body = b'{"error": "Server busy, retry later"}'
+        try:
+            if drain:
+                self._drain(request, time.monotonic() + self.reject_timeout)
+            else:
+                request.setblocking(False)
+            request.sendall(b"HTTP/1.1 503 Service Unavailable\r\n"
+                            b"Content-Type: application/json\r\nRetry-After: 1\r\n"
+                            b"Connection: close\r\nContent-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+        except (OSError, ValueError):
+            pass
+        finally:
+            if drain:
+                self._rejecting.release()
+        self.shutdown_request(request)
+
+    def _drain(self, request, deadline: float) -> None:
+        """
+        Read a request's headers and body, giving up at the deadline
+
+        Bodies larger than max_reject_drain are left unread.
+
+        Args:
+            request: Client socket
+            deadline: time.monotonic() value to stop reading at
+        """
+        head = b""
+        remaining_body = None
+        while remaining_body is None or remaining_body > 0:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return
+            request.settimeout(timeout)
+            chunk = request.recv(65536)
+            if not chunk:
+                return
+            if remaining_body is not None:
+                remaining_body -= len(chunk)
+                continue
+            head += chunk
+            end = head.find(b"\r\n\r\n")
+            if end < 0:
+                if len(head) > 65536:
+                    return
+                continue
+            length = 0
+            for line in head[:end].split(b"\r\n")[1:]:
+                name, _, value = line.partition(b":")
+                if name.strip().lower() == b"content-length":
+                    length = int(value.strip() or 0)
+            if length > self.max_reject_drain:
+                return
+            remaining_body = length - (len(head) - end - 4)
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Report current load
+
+        Returns:
+            Dictionary of connections in flight, capacity and rejections
+        """
+        with self._lock:
+            return {"in_flight": self._in_flight, "capacity": self.max_connections,
+                    "rejected": self.rejected}
+
+
+def make_stub_registry(llm_latency: float = 0.0, llm_chunk_latency: float = 0.0,
+                       llm_failure_rate: float = 0.0) -> ResourceRegistry:
+    """
+    Registry with the offline stub LLM and hash embeddings
+
+    Args:
+        llm_latency: Stub LLM time to first chunk
+        llm_chunk_latency: Stub LLM delay per chunk
+        llm_failure_rate: Share of stub LLM calls that fail with a simulated rate limit
+
+    Returns:
+        ResourceRegistry that needs no API key or model download
+    """
+    from stubs import FlakyLLM, HashEmbeddings, StubLLM
+
+    def create_llm(name):
+        if llm_failure_rate:
+            return FlakyLLM(failure_rate=llm_failure_rate, latency_jitter=llm_latency,
+                            first_chunk_latency=llm_latency, chunk_latency=llm_chunk_latency)
+        return StubLLM(first_chunk_latency=llm_latency, chunk_latency=llm_chunk_latency)
+
+    return ResourceRegistry(embedding_factory=HashEmbeddings, llm_factory=create_llm)
+
+
+def main():
+    """Command-line entry point"""
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Headless HTTP server for the AI Assistant")
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "127.0.0.1"), help="Address to bind")
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVER_PORT", "8080")), help="Port to bind")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", "8")),
+                        help="Requests processed at once")
+    parser.add_argument("--max-connections", type=int, default=int(os.getenv("SERVER_MAX_CONNECTIONS", "64")),
+                        help="Connections accepted at once before answering 503")
+    parser.add_argument("--timeout", type=float, default=float(os.getenv("SERVER_REQUEST_TIMEOUT", "60")),
+                        help="Seconds per request before answering 504")
+    parser.add_argument("--persist-directory",
+                        help="Memory store directory (default ./chroma_db, or a scratch directory with --stub)")
+    parser.add_argument("--stub", action="store_true", help="Use the offline stub LLM and hash embeddings")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Stub LLM time to first chunk")
+    parser.add_argument("--llm-chunk-latency", type=float, default=0.0, help="Stub LLM delay per chunk")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0,
+                        help="Share of stub LLM calls failing with a simulated 429")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    registry = make_stub_registry(args.llm_latency, args.llm_chunk_latency, args.llm_failure_rate) if args.stub else None
+    # Stub embeddings must never be written into the real memory store
+    persist_directory = args.persist_directory or (
+        tempfile.mkdtemp(prefix="assistant_stub_") if args.stub else "./chroma_db"
+    )
+    service = AssistantService(registry, persist_directory, workers=args.workers,
+                               request_timeout=args.timeout)
+    server = AssistantHTTPServer((args.host, args.port), service,
+                                 max_connections=args.max_connections, verbose=args.verbose)
+    print(f"🚀 Serving on http://{args.host}:{args.port} "
+          f"({args.workers} workers{', stub LLM' if args.stub else ''})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping server...")
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
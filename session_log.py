@@ -0,0 +1,160 @@
+"""
+Session Log for AI Assistant
+Append-only SQLite log of each session's exchanges for fast restore
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class SessionLog:
+    """
+    Durable record of every conversation exchange, keyed by session
+
+    Exchanges are appended and only removed when a user deletes their
+    memories or they expire under the retention policy. An index on
+    (session_id, seq) lets
+    the last n exchanges of a session be read without touching any other
+    session, so restoring a window costs O(window) whatever the log size.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open or create the log
+
+        Args:
+            path: SQLite file
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # WAL keeps appends cheap and lets readers run alongside the writer
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS exchanges (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, user_id TEXT,
+                user_input TEXT, assistant_response TEXT, created_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_exchanges_session ON exchanges (session_id, seq);
+            CREATE INDEX IF NOT EXISTS idx_exchanges_created ON exchanges (created_at);
+        """)
+        self._db.commit()
+
+    def append(self, session_id: str, user_id: str, user_input: str, assistant_response: str) -> None:
+        """
+        Record one exchange
+
+        Args:
+            session_id: Conversation session
+            user_id: Owner of the session
+            user_input: User's message
+            assistant_response: Assistant's response
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO exchanges (session_id, user_id, user_input, assistant_response, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, user_id, user_input, assistant_response, time.time())
+            )
+            self._db.commit()
+
+    def recent(self, session_id: str, user_id: str, limit: int) -> List[Tuple[str, str]]:
+        """
+        Last exchanges of a session, oldest first
+
+        Args:
+            session_id: Conversation session
+            user_id: Owner of the session (other users' sessions are never returned)
+            limit: Maximum exchanges
+
+        Returns:
+            (user input, assistant response) pairs
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT user_input, assistant_response FROM exchanges "
+                "WHERE session_id = ? AND user_id = ? ORDER BY seq DESC LIMIT ?",
+                (session_id, user_id, limit)
+            ).fetchall()
+        return rows[::-1]
+
+    def transcript(self, session_id: str, user_id: str, limit: int = 100) -> List[Dict[str, str]]:
+        """
+        Chat messages of a session's last exchanges, oldest first
+
+        Args:
+            session_id: Conversation session
+            user_id: Owner of the session
+            limit: Maximum exchanges
+
+        Returns:
+            Messages with role and content
+        """
+        messages = []
+        for user_input, assistant_response in self.recent(session_id, user_id, limit):
+            messages.append({"role": "user", "content": user_input})
+            messages.append({"role": "assistant", "content": assistant_response})
+        return messages
+
+    def delete_session(self, session_id: str, user_id: str) -> int:
+        """
+        Remove a session's exchanges
+
+        Args:
+            session_id: Conversation session
+            user_id: Owner of the session
+
+        Returns:
+            Number of exchanges removed
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM exchanges WHERE session_id = ? AND user_id = ?", (session_id, user_id)
+            )
+            self._db.commit()
+        return cursor.rowcount
+
+    def delete_user(self, user_id: str) -> int:
+        """
+        Remove all of a user's exchanges
+
+        Args:
+            user_id: Owner of the sessions
+
+        Returns:
+            Number of exchanges removed
+        """
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM exchanges WHERE user_id = ?", (user_id,))
+            self._db.commit()
+        return cursor.rowcount
+
+    def delete_before(self, cutoff: float, batch_size: int = 500) -> Dict[Optional[str], int]:
+        """
+        Remove exchanges older than a cutoff, oldest first and batch by batch
+
+        Args:
+            cutoff: Unix time; exchanges created before it are removed
+            batch_size: Exchanges removed per transaction
+
+        Returns:
+            Number of exchanges removed per user
+        """
+        removed: Dict[Optional[str], int] = {}
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT seq, user_id FROM exchanges WHERE created_at < ? ORDER BY created_at LIMIT ?",
+                    (cutoff, batch_size)
+                ).fetchall()
+                if not rows:
+                    return removed
+                self._db.executemany("DELETE FROM exchanges WHERE seq = ?", [(seq,) for seq, _ in rows])
+                self._db.commit()
+            for _, user_id in rows:
+                removed[user_id] = removed.get(user_id, 0) + 1
@@ -0,0 +1,275 @@
+"""
+Offline Stand-ins for AI Assistant
+Deterministic LLM and embedding stubs for benchmarks and local testing
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+from typing import Iterator, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embeddings using the hashing trick
+
+    Each token adds +1/-1 to a hashed dimension and vectors are L2
+    normalized, so texts sharing words have high cosine similarity. No model
+    download, no network, identical output on every run.
+    """
+
+    def __init__(self, dimensions: int = 384, latency: float = 0.0):
+        """
+        Initialize the stub
+
+        Args:
+            dimensions: Vector size (384 matches all-MiniLM-L6-v2)
+            latency: Artificial seconds of delay per embedded text
+        """
+        self.dimensions = dimensions
+        self.latency = latency
+        self.model_name = f"hash-embeddings-{dimensions}"
+
+    def _embed(self, text: str) -> np.ndarray:
+        """
+        Embed one text
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            Normalized float32 vector
+        """
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            digest = int.from_bytes(hashlib.md5(token.encode("utf-8")).digest()[:8], "little")
+            vector[digest % self.dimensions] += 1.0 if (digest >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0] = 1.0
+            return vector
+        return vector / norm
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts into a matrix
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            float32 matrix with one row per text
+        """
+        if self.latency:
+            time.sleep(self.latency * len(texts))
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        return np.stack([self._embed(text) for text in texts])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a list of documents
+
+        Args:
+            texts: Documents to embed
+
+        Returns:
+            One vector per document
+        """
+        return self.embed_array(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a search query
+
+        Args:
+            text: Query text
+
+        Returns:
+            Query vector
+        """
+        return self.embed_array([text])[0].tolist()
+
+
+class StubResponse:
+    """
+    Minimal stand-in for a Gemini GenerateContentResponse
+    """
+
+    def __init__(self, text: str):
+        """
+        Args:
+            text: Response text
+        """
+        self.text = text
+
+
+class StubLLM:
+    """
+    Deterministic stand-in for genai.GenerativeModel
+
+    The reply is derived from the prompt's current user message, so runs are
+    reproducible. Latency is simulated as a fixed time to first chunk plus a
+    per-chunk delay.
+    """
+
+    def __init__(self, model_name: str = "stub-llm", first_chunk_latency: float = 0.0,
+                 chunk_latency: float = 0.0, reply_words: int = 60, chunk_words: int = 8):
+        """
+        Initialize the stub
+
+        Args:
+            model_name: Name reported by the stub
+            first_chunk_latency: Seconds before the first chunk
+            chunk_latency: Seconds between subsequent chunks
+            reply_words: Number of words in every reply
+            chunk_words: Words per streamed chunk
+        """
+        self.model_name = model_name
+        self.first_chunk_latency = first_chunk_latency
+        self.chunk_latency = chunk_latency
+        self.reply_words = reply_words
+        self.chunk_words = chunk_words
+        self.calls = 0
+
+    def _reply(self, prompt: str) -> List[str]:
+        """
+        Build the deterministic reply for a prompt
+
+        Args:
+            prompt: Full prompt text
+
+        Returns:
+            Reply words
+        """
+        message = prompt.rsplit("Current user message:", 1)[-1]
+        seed = TOKEN_PATTERN.findall(message.lower()) or ["ok"]
+        return [seed[i % len(seed)] for i in range(self.reply_words)]
+
+    def _chunks(self, words: List[str]) -> Iterator[StubResponse]:
+        """
+        Yield the reply in chunks with simulated latency
+
+        Args:
+            words: Reply words
+
+        Yields:
+            Response chunks
+        """
+        time.sleep(self.first_chunk_latency)
+        for start in range(0, len(words), self.chunk_words):
+            if start:
+                time.sleep(self.chunk_latency)
+            yield StubResponse(" ".join(words[start:start + self.chunk_words]) + " ")
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        """
+        Generate a reply like genai.GenerativeModel.generate_content
+
+        Args:
+            prompt: Full prompt text
+            stream: Return an iterator of chunks instead of one response
+
+        Returns:
+            StubResponse, or an iterator of StubResponse chunks when streaming
+        """
+        self.calls += 1
+        chunks = self._chunks(self._reply(prompt))
+        if stream:
+            return chunks
+        return StubResponse("".join(chunk.text for chunk in chunks))
+
+
+class StubRateLimitError(Exception):
+    """
+    Stand-in for a provider's 429 quota error
+    """
+
+    code = 429
+
+
+class FlakyLLM(StubLLM):
+    """
+    StubLLM that fails and stalls like a busy remote API
+
+    A share of calls raise StubRateLimitError before producing anything, and
+    every call gets random extra latency, so retry, backoff and deadline
+    handling can be exercised offline. Failures are seeded for reproducible
+    runs.
+    """
+
+    def __init__(self, failure_rate: float = 0.2, latency_jitter: float = 0.0, seed: int = 0,
+                 **kwargs):
+        """
+        Initialize the stub
+
+        Args:
+            failure_rate: Probability that a call raises StubRateLimitError
+            latency_jitter: Maximum extra seconds before the first chunk
+            seed: Random seed for failures and latency
+            **kwargs: StubLLM options
+        """
+        super().__init__(**kwargs)
+        self.failure_rate = failure_rate
+        self.latency_jitter = latency_jitter
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        """
+        Generate a reply, or fail with a simulated rate limit
+
+        Args:
+            prompt: Full prompt text
+            stream: Return an iterator of chunks instead of one response
+
+        Returns:
+            StubResponse, or an iterator of StubResponse chunks when streaming
+        """
+        with self._lock:
+            fail = self._random.random() < self.failure_rate
+            delay = self._random.uniform(0, self.latency_jitter)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(delay)
+            if fail:
+                with self._lock:
+                    self.failures += 1
+                raise StubRateLimitError("429 Resource has been exhausted (simulated)")
+            if stream:
+                return self._tracked(super().generate_content(prompt, stream=True))
+            return super().generate_content(prompt)
+        finally:
+            if not stream or fail:
+                self._done()
+
+    def _tracked(self, chunks: Iterator[StubResponse]) -> Iterator[StubResponse]:
+        """
+        Count a stream as in flight until it is consumed
+
+        Args:
+            chunks: Stream from StubLLM
+
+        Yields:
+            The same chunks
+        """
+        try:
+            yield from chunks
+        finally:
+            self._done()
+
+    def _done(self) -> None:
+        """Mark one call as finished"""
+        with self._lock:
+            self.in_flight -= 1
@@ -0,0 +1,89 @@
+"""
+Tests for the Ingestion Queue
+Runs offline against an in-memory Chroma collection and hash embeddings
+"""
+
+import uuid
+from types import SimpleNamespace
+
+import chromadb
+import pytest
+
+from hot_tier import HotTier
+from ingestion import IngestionQueue
+from stubs import HashEmbeddings
+
+
+def make_document(text: str, user_id: str, session_id: str) -> SimpleNamespace:
+    """
+    Build a chunk like the ones MemoryManager submits
+
+    Args:
+        text: Chunk text
+        user_id: Owner of the chunk
+        session_id: Conversation session
+
+    Returns:
+        Object with page_content and metadata
+    """
+    return SimpleNamespace(page_content=text, metadata={"user_id": user_id, "session_id": session_id,
+                                                        "created_at": 1000.0})
+
+
+@pytest.fixture
+def vectorstore():
+    """Vector store stand-in with the attributes IngestionQueue uses"""
+    collection = chromadb.EphemeralClient().create_collection(
+        f"test-{uuid.uuid4().hex}", metadata={"hnsw:space": "cosine"}
+    )
+    return SimpleNamespace(_collection=collection, embeddings=HashEmbeddings())
+
+
+def test_dedup_merges_repeats_across_sessions_of_one_user(vectorstore):
+    queue = IngestionQueue(lambda: vectorstore, max_wait=0.01, dedup_threshold=0.97)
+    text = "User: good morning, what is on my calendar today?"
+    try:
+        assert queue.flush(queue.submit([make_document(text, "alice", "monday")]))
+        assert queue.flush(queue.submit([make_document(text, "alice", "tuesday")]))
+        assert queue.flush(queue.submit([make_document(text, "bob", "tuesday")]))
+    finally:
+        queue.close()
+
+    stored = vectorstore._collection.get(include=["metadatas"])
+    by_user = {metadata["user_id"]: metadata for metadata in stored["metadatas"]}
+    assert len(stored["ids"]) == 2
+    assert by_user["alice"]["session_id"] == "monday"
+    assert by_user["alice"]["hit_count"] == 2
+    assert by_user["bob"]["hit_count"] == 1
+    assert queue.stats()["documents_deduplicated"] == 1
+
+
+class FlakyLexicalIndex:
+    """Lexical index stand-in whose first add() fails"""
+
+    def __init__(self):
+        self.calls = 0
+        self.ids = set()
+
+    def add(self, ids, texts, metadatas):
+        self.calls += 1
+        if self.calls == 1:
+            raise OSError("disk full")
+        self.ids.update(ids)
+
+
+def test_retry_after_a_failed_index_update_completes_the_write(vectorstore):
+    lexical_index, hot_tier = FlakyLexicalIndex(), HotTier()
+    queue = IngestionQueue(lambda: vectorstore, max_wait=0.01, dedup_threshold=0.97,
+                           lexical_index=lexical_index, hot_tier=hot_tier, retry_delay=0.01)
+    try:
+        assert queue.flush(queue.submit([make_document("User: remember that my dog is called Rex",
+                                                       "alice", "monday")]))
+    finally:
+        queue.close()
+
+    stored = vectorstore._collection.get()["ids"]
+    assert len(stored) == 1
+    assert lexical_index.ids == set(stored)
+    assert hot_tier.stats()["entries"] == 1
+    assert queue.stats()["documents_deduplicated"] == 0
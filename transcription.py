@@ -0,0 +1,342 @@
+"""
+Transcription Service for AI Assistant
+Long-lived Whisper worker that keeps the model loaded and serves queued jobs
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Dict, Iterator, List, Optional
+
+from audio import decode_audio, split_on_silence
+from metrics import ERROR_METRIC, get_metrics, percentile, span
+
+# Whisper decodes fixed 30 second windows; shorter clips can share one batch
+WHISPER_SAMPLE_RATE = 16000
+WHISPER_WINDOW_SECONDS = 30
+
+# Whisper installs kv-cache hooks on the model for every decode, so two
+# decodes on one model at once corrupt each other's output. Keyed by id():
+# models are loaded once per process and never freed.
+_model_locks: Dict[int, threading.Lock] = {}
+_model_locks_guard = threading.Lock()
+
+
+def model_lock(model: Any) -> threading.Lock:
+    """
+    Lock serializing inference on one Whisper model
+
+    Args:
+        model: Loaded Whisper model
+
+    Returns:
+        The model's lock, created on first use
+    """
+    with _model_locks_guard:
+        return _model_locks.setdefault(id(model), threading.Lock())
+
+
+class TranscriptionJob:
+    """
+    A queued transcription request
+    """
+
+    def __init__(self, audio: Any):
+        """
+        Create a job
+
+        Args:
+            audio: Path to an audio file or a 16 kHz float32 waveform
+        """
+        self.audio = audio
+        self.future: Future = Future()
+        self.submitted_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+
+
+class TranscriptionService:
+    """
+    Background Whisper workers shared by every session
+
+    Jobs from all sessions go into one queue. Each worker drains up to
+    max_batch_size jobs at a time and decodes clips that fit in a single 30
+    second window as one batched forward pass. Workers share the loaded
+    model, and Whisper is not safe to run concurrently on one model, so
+    model calls take turns under model_lock(); extra workers only overlap
+    audio loading and spectrograms with inference. Long recordings go
+    through transcribe_stream(), which decodes and cuts them into such clips
+    while earlier clips are being transcribed.
+    """
+
+    def __init__(self, model_loader, max_batch_size: int = 4, history_size: int = 200,
+                 workers: int = 1):
+        """
+        Initialize the service (the workers start on first submit)
+
+        Args:
+            model_loader: Callable returning a loaded Whisper model
+            max_batch_size: Maximum number of jobs taken from the queue at once
+            history_size: Number of recent jobs kept for latency statistics
+            workers: Worker threads taking batches from the queue (model
+                calls are still serialized)
+        """
+        self.model_loader = model_loader
+        self.max_batch_size = max_batch_size
+        self.workers = workers
+
+        self._queue: "queue.Queue[Optional[TranscriptionJob]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._wait_times = deque(maxlen=history_size)
+        self._latencies = deque(maxlen=history_size)
+
+    def start(self) -> None:
+        """
+        Start any worker thread that is not running
+        """
+        with self._lock:
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            while len(self._workers) < self.workers:
+                worker = threading.Thread(
+                    target=self._run, name=f"whisper-worker-{len(self._workers)}", daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, audio: Any) -> Future:
+        """
+        Queue audio for transcription
+
+        Args:
+            audio: Path to an audio file or a 16 kHz float32 waveform
+
+        Returns:
+            Future resolving to the transcribed text
+        """
+        self.start()
+        job = TranscriptionJob(audio)
+        self._queue.put(job)
+        return job.future
+
+    def transcribe(self, audio: Any, timeout: Optional[float] = None) -> str:
+        """
+        Queue audio and wait for the transcript
+
+        Args:
+            audio: Path to an audio file or a 16 kHz float32 waveform
+            timeout: Seconds to wait before giving up
+
+        Returns:
+            Transcribed text
+        """
+        return self.submit(audio).result(timeout=timeout)
+
+    def transcribe_stream(self, data: bytes, max_pending: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Transcribe an encoded recording of any length, segment by segment
+
+        The upload is decoded in memory and cut at quiet points into clips
+        of at most 30 seconds. Clips are queued as they are cut, so they are
+        transcribed while decoding continues. At most
+        max_pending clips are held at once, keeping memory flat for long
+        recordings.
+
+        Args:
+            data: Encoded audio file contents
+            max_pending: Clips queued before waiting for the oldest
+                (defaults to two batches per worker)
+
+        Yields:
+            Segments in order, with index, start and end (seconds) and text
+        """
+        max_pending = max_pending or 2 * self.max_batch_size * self.workers
+        pending = deque()
+        with span("transcription.stream"):
+            segments = split_on_silence(decode_audio(data, WHISPER_SAMPLE_RATE), WHISPER_SAMPLE_RATE,
+                                        max_seconds=WHISPER_WINDOW_SECONDS)
+            for index, (start, samples) in enumerate(segments):
+                pending.append((index, start, len(samples), self.submit(samples)))
+                if len(pending) >= max_pending:
+                    yield self._segment_result(*pending.popleft())
+            while pending:
+                yield self._segment_result(*pending.popleft())
+
+    @staticmethod
+    def _segment_result(index: int, start: int, length: int, future: Future) -> Dict[str, Any]:
+        """
+        Wait for one segment's transcript
+
+        Args:
+            index: Segment number
+            start: First sample of the segment
+            length: Samples in the segment
+            future: Pending transcription
+
+        Returns:
+            Segment with index, start and end (seconds) and text
+        """
+        return {"index": index, "start": start / WHISPER_SAMPLE_RATE,
+                "end": (start + length) / WHISPER_SAMPLE_RATE, "text": future.result().strip()}
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the workers after the jobs already queued have finished
+
+        Args:
+            timeout: Seconds to wait for each worker to exit
+        """
+        workers = [worker for worker in self._workers if worker.is_alive()]
+        for _ in workers:
+            self._queue.put(None)
+        for worker in workers:
+            worker.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report queue depth and per-job latency
+
+        Returns:
+            Dictionary of queue and latency statistics (seconds)
+        """
+        with self._lock:
+            wait_times = list(self._wait_times)
+            latencies = list(self._latencies)
+            in_flight = self._in_flight
+            completed = self._completed
+            failed = self._failed
+
+        return {
+            "queue_depth": self._queue.qsize(),
+            "in_flight": in_flight,
+            "completed": completed,
+            "failed": failed,
+            "wait_p50": percentile(wait_times, 50),
+            "wait_p95": percentile(wait_times, 95),
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "latency_max": max(latencies) if latencies else 0.0,
+        }
+
+    def _run(self) -> None:
+        """
+        Worker loop: take a batch of jobs and transcribe them
+        """
+        model = None
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            batch = [job]
+            stop = False
+            while len(batch) < self.max_batch_size:
+                try:
+                    extra = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if extra is None:
+                    stop = True
+                    break
+                batch.append(extra)
+
+            started_at = time.perf_counter()
+            with self._lock:
+                self._in_flight += len(batch)
+            for item in batch:
+                item.started_at = started_at
+
+            try:
+                if model is None:
+                    model = self.model_loader()
+                self._process_batch(model, batch)
+            except Exception as e:
+                print(f"Error in transcription worker: {e}")
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+
+            self._record(batch)
+            if stop:
+                return
+
+    def _process_batch(self, model, batch: List[TranscriptionJob]) -> None:
+        """
+        Transcribe a batch, decoding short clips together
+
+        Args:
+            model: Loaded Whisper model
+            batch: Jobs to transcribe
+        """
+        import torch
+        import whisper
+
+        lock = model_lock(model)
+        short_jobs, short_audio = [], []
+        for job in batch:
+            try:
+                audio = job.audio
+                if isinstance(audio, str):
+                    audio = whisper.load_audio(audio)
+                if len(audio) <= WHISPER_SAMPLE_RATE * WHISPER_WINDOW_SECONDS and len(batch) > 1:
+                    short_jobs.append(job)
+                    short_audio.append(audio)
+                else:
+                    with lock:
+                        text = model.transcribe(audio)["text"]
+                    job.future.set_result(text)
+            except Exception as e:
+                job.future.set_exception(e)
+
+        if not short_jobs:
+            return
+
+        try:
+            # Spectrograms are computed outside the lock, only decoding takes turns
+            mels = torch.stack([
+                whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=model.dims.n_mels)
+                for audio in short_audio
+            ])
+            options = whisper.DecodingOptions(fp16=model.device.type != "cpu")
+            with lock:
+                results = whisper.decode(model, mels.to(model.device), options)
+            for job, result in zip(short_jobs, results):
+                job.future.set_result(result.text)
+        except Exception as e:
+            # Fall back to one-by-one transcription if batched decoding fails
+            print(f"Batched transcription failed, retrying individually: {e}")
+            for job, audio in zip(short_jobs, short_audio):
+                try:
+                    with lock:
+                        text = model.transcribe(audio)["text"]
+                    job.future.set_result(text)
+                except Exception as job_error:
+                    job.future.set_exception(job_error)
+
+    def _record(self, batch: List[TranscriptionJob]) -> None:
+        """
+        Record wait time and end-to-end latency for finished jobs
+
+        Args:
+            batch: Jobs that just finished
+        """
+        finished_at = time.perf_counter()
+        metrics = get_metrics()
+        with self._lock:
+            self._in_flight -= len(batch)
+            for job in batch:
+                wait_time = job.started_at - job.submitted_at
+                latency = finished_at - job.submitted_at
+                self._wait_times.append(wait_time)
+                self._latencies.append(latency)
+                metrics.observe("transcription.queue_wait", wait_time)
+                metrics.observe("transcription.job", latency)
+                if job.future.exception() is None:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                    metrics.increment(ERROR_METRIC, "transcription.job")
@@ -0,0 +1,124 @@
+"""
+Vector Utilities for AI Assistant
+Helpers shared by components that work with stored embeddings
+"""
+
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+
+def distance_space(collection: Any) -> str:
+    """
+    Distance function a Chroma collection was created with
+
+    Args:
+        collection: chromadb Collection
+
+    Returns:
+        "l2", "cosine" or "ip"
+    """
+    return (collection.metadata or {}).get("hnsw:space", "l2")
+
+
+def distance_to_similarity(distances: Any, space: str = "l2") -> np.ndarray:
+    """
+    Convert Chroma distances between normalized vectors to cosine similarity
+
+    Args:
+        distances: Distances returned by a Chroma query
+        space: Collection distance function
+
+    Returns:
+        Cosine similarities
+    """
+    distances = np.asarray(distances, dtype=np.float32)
+    if space == "l2":
+        # Chroma reports squared L2; for unit vectors |a-b|^2 = 2 - 2cos
+        return 1.0 - distances / 2.0
+    # Both "cosine" and "ip" report 1 - dot product
+    return 1.0 - distances
+
+
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+
+def quantize(vectors: Any, dtype: str = "int8") -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Compress embeddings for storage
+
+    int8 uses one symmetric scale per row (max |value| maps to 127), which
+    keeps cosine rankings nearly intact at a quarter of the size.
+
+    Args:
+        vectors: Matrix with one embedding per row
+        dtype: "float32", "float16" or "int8"
+
+    Returns:
+        Tuple of (codes, per-row scales or None)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float32":
+        return vectors, None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype != "int8":
+        raise ValueError(f"Unsupported vector dtype {dtype!r}; choose one of {', '.join(VECTOR_DTYPES)}")
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Expand quantized embeddings back to float32
+
+    Args:
+        codes: Matrix returned by quantize()
+        scales: Per-row scales for int8 codes
+
+    Returns:
+        float32 matrix
+    """
+    vectors = np.asarray(codes).astype(np.float32)
+    if scales is not None:
+        vectors *= np.asarray(scales, dtype=np.float32)[:, None]
+    return vectors
+
+
+def maximal_marginal_relevance(relevance: Any, vectors: Any, k: int,
+                               lambda_mult: float = 0.5) -> List[int]:
+    """
+    Pick a relevant but diverse subset of candidates
+
+    Greedily takes the candidate maximizing
+    lambda_mult * relevance - (1 - lambda_mult) * max cosine to those
+    already picked. Pairwise similarities come from one matrix product
+    over the candidates' existing embeddings.
+
+    Args:
+        relevance: Relevance of each candidate, higher is better
+        vectors: Normalized candidate embeddings, one row per candidate
+        k: Number of candidates to pick
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only
+
+    Returns:
+        Indices of the picked candidates in pick order
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    count = min(k, len(relevance))
+    if count == 0:
+        return []
+
+    similarities = vectors @ vectors.T
+    redundancy = np.full(len(relevance), -np.inf, dtype=np.float32)
+    available = np.ones(len(relevance), dtype=bool)
+    picked = [int(np.argmax(relevance))]
+    for _ in range(count - 1):
+        available[picked[-1]] = False
+        redundancy = np.maximum(redundancy, similarities[:, picked[-1]])
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        picked.append(int(np.argmax(np.where(available, scores, -np.inf))))
+    return picked